@@ -0,0 +1,126 @@
+"""
+Frames of an animation, e.g. a walk cycle
+"""
+from Autosave import Autosave
+from History import History, HistoryBudget
+from Layers import LayerStack
+
+
+class Timeline:
+    """
+    Frames of an animation in order, one of which is shown and edited
+
+    Every frame is a stack of layers of palette indices, one byte per cell and layer, so long
+    animations stay small. Each frame keeps its own undo history, so flipping between frames
+    does not mix up their changes. The histories share one memory cap, and the oldest changes
+    of any frame are forgotten first
+    """
+    def __init__(self, frames: list[LayerStack], current: int = 0, history_max_bytes: int = 8 * 1024 * 1024,
+                 journal: Autosave | None = None) -> None:
+        if not frames:
+            raise ValueError('A timeline needs at least one frame')
+        if len({frame.size for frame in frames}) != 1:
+            raise ValueError('All frames of a timeline must have the same size')
+        self.frames = frames
+        self.budget = HistoryBudget(history_max_bytes)
+        self.histories = [History(journal=journal, budget=self.budget) for _ in frames]
+        self._journal = journal
+        self.current = min(max(current, 0), len(frames) - 1)
+
+    @property
+    def size(self) -> int:
+        """
+        Number of cells on one side of every frame
+        """
+        return self.frames[0].size
+
+    @property
+    def layers(self) -> LayerStack:
+        """
+        Layers of the current frame
+        """
+        return self.frames[self.current]
+
+    @layers.setter
+    def layers(self, layers: LayerStack) -> None:
+        if len(self.frames) > 1 and layers.size != self.size:
+            raise ValueError(f'Frame size {layers.size} does not match the other frames of size {self.size}')
+        self.frames[self.current] = layers
+        self._changed()
+
+    @property
+    def journal(self) -> Autosave | None:
+        """
+        Autosave journal the frame histories report changes to
+        """
+        return self._journal
+
+    @journal.setter
+    def journal(self, journal: Autosave | None) -> None:
+        self._journal = journal
+        for history in self.histories:
+            history.journal = journal
+
+    @property
+    def history(self) -> History:
+        """
+        Undo history of the current frame
+        """
+        return self.histories[self.current]
+
+    def add_frame(self) -> LayerStack:
+        """
+        Add a copy of the current frame after it and make it current, the usual start of the next pose
+
+        Returns:
+            the new frame as *LayerStack*
+        """
+        self.history.end_stroke()
+        frame = self.layers.copy()
+        self.frames.insert(self.current + 1, frame)
+        self.histories.insert(self.current + 1, History(journal=self.journal, budget=self.budget))
+        self.current += 1
+        self._changed()
+        return frame
+
+    def remove_frame(self) -> LayerStack | None:
+        """
+        Remove the current frame with its history, the one before it becomes current
+
+        Returns:
+            the removed frame as *LayerStack*, or *None* if it is the only frame
+        """
+        if len(self.frames) == 1:
+            return None
+        frame = self.frames.pop(self.current)
+        self.budget.histories.remove(self.histories.pop(self.current))
+        self.current = max(0, self.current - 1)
+        self._changed()
+        return frame
+
+    def select(self, index: int) -> bool:
+        """
+        Make another frame current, wrapping around at either end like a looping animation
+
+        Arguments:
+            index -- position of the frame
+
+        Returns:
+            *True* if the current frame changed
+        """
+        index %= len(self.frames)
+        if index == self.current:
+            return False
+        self.history.end_stroke()
+        self.current = index
+        return True
+
+    def _changed(self) -> None:
+        if self._journal is not None:
+            self._journal.changed()
+
+    def snapshot(self) -> list[LayerStack]:
+        """
+        Read only copies of the frames, safe to hand to a background thread
+        """
+        return [frame.snapshot() for frame in self.frames]
@@ -0,0 +1,246 @@
+"""
+Crash safe autosave as a snapshot of every frame plus an append only journal of painted cells
+
+Layout of the journal, little endian:
+    header  -- magic b'PXLJ', journal version, size and CRC-32 of the snapshot it applies to
+    records -- frame, layer position in the frame, number of cells, then the flat cell indices
+               as uint32, the new palette indices as uint8 and a CRC-32 of the record
+
+Painting only appends records, one write per main loop iteration. Changes to the layers or
+frames themselves, and a journal grown past a limit, are compacted into a new snapshot with an
+empty journal. A crash while writing leaves a torn record at the end, which replay ignores
+"""
+import os
+import struct
+import zlib
+
+import numpy as np
+
+from Layers import LayerStack
+from SaveFile import file_crc, read_frames, write_frames
+
+JOURNAL_MAGIC = b'PXLJ'
+JOURNAL_VERSION = 1
+JOURNAL_HEADER = struct.Struct('<4sBII')
+RECORD = struct.Struct('<HHI')
+CRC = struct.Struct('<I')
+
+SNAPSHOT_FILENAME = 'autosave.pxl'
+JOURNAL_FILENAME = 'autosave.journal'
+
+
+def encode_record(frame: int, layer: int, indices: np.ndarray, values: np.ndarray | int) -> bytes:
+    """
+    Journal record of cells painted on one layer
+
+    Arguments:
+        frame -- position of the frame in the timeline as *int*
+        layer -- position of the layer in the frame as *int*
+        indices -- flat cell indices as *np.ndarray*
+        values -- new palette indices, one per cell or one for all cells
+
+    Returns:
+        record as *bytes*
+    """
+    values = np.broadcast_to(np.asarray(values, dtype=np.uint8), indices.shape)
+    record = RECORD.pack(frame, layer, indices.size) + indices.astype('<u4').tobytes() + values.tobytes()
+    return record + CRC.pack(zlib.crc32(record))
+
+
+class Autosave:
+    """
+    Journals painted cells of the frames of a timeline and compacts them into snapshots
+
+    History reports cell changes with cells() and changes to the layers with changed(). Cell
+    changes are buffered and appended by flush(). Compaction takes a snapshot of the frames on
+    the main thread with start_compaction(), writes it in the background with compact() and
+    reopens the journal in compaction_done(). Cells painted meanwhile are written after it
+    """
+    def __init__(self, directory: str = '.', compact_bytes: int = 1024 * 1024) -> None:
+        self.snapshot_path = os.path.join(directory, SNAPSHOT_FILENAME)
+        self.journal_path = os.path.join(directory, JOURNAL_FILENAME)
+        self.compact_bytes = compact_bytes
+        self.frames: list[LayerStack] = []
+        self.needs_compaction = True # nothing saved yet
+        self.compacting = False
+        self.failed = False
+        self.journal_bytes = 0
+        self._records: list[bytes] = []
+        self._file = None
+
+    def cells(self, layers: LayerStack, layer_id: int, indices: np.ndarray, values: np.ndarray | int) -> None:
+        """
+        Record cells painted on a layer
+
+        Arguments:
+            layers -- frame holding the layer as *LayerStack*
+            layer_id -- id of the painted layer as *int*
+            indices -- flat cell indices as *np.ndarray*
+            values -- new palette indices, one per cell or one for all cells
+        """
+        if self.needs_compaction or self.failed:
+            return # the next snapshot holds the cells
+        frame = next((i for i, frame in enumerate(self.frames) if frame is layers), None)
+        layer = next((i for i, layer in enumerate(layers.layers) if layer.layer_id == layer_id), None)
+        if frame is None or layer is None:
+            self.needs_compaction = True
+            return
+        self._records.append(encode_record(frame, layer, indices, values))
+
+    def changed(self) -> None:
+        """
+        Record a change to the layers or frames that cell records cannot describe
+        """
+        self.needs_compaction = True
+
+    def flush(self) -> OSError | None:
+        """
+        Append the buffered records to the journal with a single write
+
+        A write that fails, e.g. on a full disk, stops autosaving like a failed compaction
+
+        Returns:
+            the error that stopped autosaving as *OSError*, or *None*
+        """
+        if not self._records or self.compacting or self.failed:
+            return None
+        data = b''.join(self._records)
+        self._records = []
+        try:
+            if self._file is None:
+                self._file = open(self.journal_path, 'ab') # pylint: disable=consider-using-with
+            self._file.write(data)
+            self._file.flush()
+        except OSError as e:
+            self.failed = True
+            self._close()
+            return e
+        self.journal_bytes += len(data)
+        if self.journal_bytes > self.compact_bytes:
+            self.needs_compaction = True
+        return None
+
+    def _close(self) -> None:
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass # the records a failed write left in the buffer are dropped with it
+            self._file = None
+
+    def start_compaction(self, frames: list[LayerStack], current: int) -> tuple[list[LayerStack], int]:
+        """
+        Take a snapshot of the frames to be written by compact(), on the main thread
+
+        Arguments:
+            frames -- frames of the timeline as *list[LayerStack]*, followed until the next compaction
+            current -- index of the frame being edited as *int*
+
+        Returns:
+            read only copies of the frames and current, the arguments of compact()
+        """
+        self._close()
+        self._records = []
+        self.frames = frames
+        self.needs_compaction = False
+        self.compacting = True
+        return [frame.snapshot() for frame in frames], current
+
+    def compact(self, frames: list[LayerStack], current: int) -> None:
+        """
+        Write a snapshot and start an empty journal for it, in the background
+
+        Arguments:
+            frames -- frames from start_compaction
+            current -- index of the frame being edited from start_compaction
+        """
+        write_frames(self.snapshot_path, frames, current)
+        size, crc = os.path.getsize(self.snapshot_path), file_crc(self.snapshot_path)
+        tmp_path = f'{self.journal_path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(JOURNAL_HEADER.pack(JOURNAL_MAGIC, JOURNAL_VERSION, size, crc))
+        os.replace(tmp_path, self.journal_path)
+
+    def compaction_done(self, error: Exception | None = None) -> None:
+        """
+        Resume appending after compact() finished, on the main thread
+
+        Keyword Arguments:
+            error -- exception raised by compact(), which stops autosaving (default: {None})
+        """
+        self.compacting = False
+        self.journal_bytes = 0
+        if error is not None:
+            self.failed = True
+            self._records = []
+
+    def discard(self) -> None:
+        """
+        Delete the snapshot and journal, e.g. when the app is closed normally
+        """
+        self._close()
+        for path in (self.snapshot_path, self.journal_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def replay_journal(path: str, frames: list[LayerStack], snapshot: tuple[int, int]) -> int:
+    """
+    Apply the records of a journal to the frames of its snapshot, up to the first torn or corrupt record
+
+    Arguments:
+        path -- path to the journal as *str*
+        frames -- frames read from the snapshot as *list[LayerStack]*
+        snapshot -- size and CRC-32 of the snapshot file
+
+    Returns:
+        number of records applied as *int*, 0 if the journal belongs to another snapshot
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if len(data) < JOURNAL_HEADER.size:
+        return 0
+    magic, version, size, crc = JOURNAL_HEADER.unpack_from(data)
+    if magic != JOURNAL_MAGIC or version != JOURNAL_VERSION or (size, crc) != snapshot:
+        return 0
+
+    n_records = 0
+    offset = JOURNAL_HEADER.size
+    while offset + RECORD.size <= len(data):
+        frame, layer, n_cells = RECORD.unpack_from(data, offset)
+        end = offset + RECORD.size + 5 * n_cells
+        if end + CRC.size > len(data) or CRC.unpack_from(data, end)[0] != zlib.crc32(data[offset:end]):
+            break
+        if frame >= len(frames) or layer >= len(frames[frame].layers):
+            break
+        canvas = frames[frame].layers[layer].canvas
+        indices = np.frombuffer(data, dtype='<u4', count=n_cells, offset=offset + RECORD.size)
+        values = np.frombuffer(data, dtype=np.uint8, count=n_cells, offset=offset + RECORD.size + 4 * n_cells)
+        if n_cells and indices.max() >= canvas.data.size:
+            break
+        np.put(canvas.data, indices, values)
+        n_records += 1
+        offset = end + CRC.size
+    return n_records
+
+
+def recover(directory: str = '.') -> tuple[list[LayerStack], int] | None:
+    """
+    Read the work autosaved before the app last stopped without closing normally
+
+    Arguments:
+        directory -- folder of the autosave files as *str* (default: {'.'})
+
+    Returns:
+        the frames as *list[LayerStack]* and the index of the frame being edited, or *None*
+        if there is nothing to recover
+    """
+    snapshot_path = os.path.join(directory, SNAPSHOT_FILENAME)
+    journal_path = os.path.join(directory, JOURNAL_FILENAME)
+    try:
+        frames, current = read_frames(snapshot_path)
+        if os.path.exists(journal_path):
+            replay_journal(journal_path, frames, (os.path.getsize(snapshot_path), file_crc(snapshot_path)))
+    except (OSError, ValueError):
+        return None
+    return frames, current
@@ -0,0 +1,154 @@
+"""
+Array backed model of the drawing board
+"""
+import numpy as np
+
+from Color import Color, PALETTE, PALETTE_INDEX, PALETTE_RGBA_LUT, TRANSPARENT_INDEX, WHITE_INDEX
+
+
+class Canvas:
+    """
+    Square drawing board stored as palette indices, one byte per cell
+
+    Cells are addressed as (x, y), i.e. column first, which matches both the
+    order tiles were laid out on the drawing board and pygame.surfarray
+
+    Cells holding TRANSPARENT_INDEX have nothing painted on them. Blank cells start out as
+    blank_index, white for the bottom layer and transparent for the layers above it
+    """
+    def __init__(self, size: int, data: np.ndarray | None = None, blank_index: int = WHITE_INDEX) -> None:
+        if data is None:
+            data = np.full((size, size), blank_index, dtype=np.uint8)
+        elif data.shape != (size, size):
+            raise ValueError(f'Canvas data must have shape {(size, size)}, got {data.shape}')
+        self.data: np.ndarray = data
+        self.blank_index = blank_index
+        self.dirty: list[tuple[int, int, int, int]] = [(0, 0, size, size)]
+
+    @property
+    def size(self) -> int:
+        """
+        Number of cells on one side of the canvas
+        """
+        return self.data.shape[0]
+
+    def __getitem__(self, cell: tuple[int, int]) -> Color | None:
+        index = self.data[cell]
+        return None if index == TRANSPARENT_INDEX else Color.from_index(index)
+
+    def __setitem__(self, cell: tuple[int, int], color: Color | None) -> None:
+        self.data[cell] = TRANSPARENT_INDEX if color is None else color.palette_index
+        self.mark_dirty((cell[0], cell[1], 1, 1))
+
+    def mark_dirty(self, rect: tuple[int, int, int, int] | None = None) -> None:
+        """
+        Record a region of the canvas that needs redrawing
+
+        Keyword Arguments:
+            rect -- region as (x, y, width, height) in cells, whole canvas if *None* (default: {None})
+        """
+        self.dirty.append(rect if rect is not None else (0, 0, self.size, self.size))
+
+    def mark_dirty_cells(self, xs: np.ndarray, ys: np.ndarray) -> None:
+        """
+        Record the bounding box of a set of cells as needing redrawing
+
+        Arguments:
+            xs -- columns of the cells as *np.ndarray*
+            ys -- rows of the cells as *np.ndarray*
+        """
+        if xs.size:
+            x, y = int(xs.min()), int(ys.min())
+            self.mark_dirty((x, y, int(xs.max()) - x + 1, int(ys.max()) - y + 1))
+
+    def pop_dirty(self) -> list[tuple[int, int, int, int]]:
+        """
+        Take the regions changed since the last call
+
+        Returns:
+            changed regions as (x, y, width, height) in cells
+        """
+        dirty, self.dirty = self.dirty, []
+        return dirty
+
+    def clear(self) -> None:
+        """
+        Reset every cell to blank_index
+        """
+        self.data[:] = self.blank_index
+        self.mark_dirty()
+
+    def fill(self, color: Color, rect: tuple[int, int, int, int] | None = None) -> None:
+        """
+        Fill the canvas, or a region of it, with a single color
+
+        Arguments:
+            color -- *Color* to fill with
+
+        Keyword Arguments:
+            rect -- region to fill as (x, y, width, height) in cells, whole canvas if *None* (default: {None})
+        """
+        if rect is None:
+            self.data[:] = color.palette_index
+        else:
+            x, y, width, height = rect
+            self.data[x:x + width, y:y + height] = color.palette_index
+        self.mark_dirty(rect)
+
+    def to_colors(self) -> list[Color]:
+        """
+        Flatten the canvas into a list of colors in drawing board order, transparent cells become white
+
+        Returns:
+            colors of all cells as *list[Color]*
+        """
+        colors = np.full(256, Color.WHITE, dtype=object)
+        colors[:len(PALETTE)] = PALETTE
+        return colors[self.data.ravel()].tolist()
+
+    def load_colors(self, colors: list[Color]) -> None:
+        """
+        Replace the canvas contents with a flat list of colors in drawing board order
+
+        Arguments:
+            colors -- colors of all cells as *list[Color]*
+
+        Raises:
+            ValueError: if the number of colors does not match the canvas size
+        """
+        if len(colors) != self.data.size:
+            raise ValueError(f'Expected {self.data.size} colors, got {len(colors)}')
+        indices = np.fromiter((PALETTE_INDEX[c] for c in colors), dtype=np.uint8, count=len(colors))
+        self.data[:] = indices.reshape(self.data.shape)
+        self.mark_dirty()
+
+    def to_rgba(self, scale: int = 1) -> np.ndarray:
+        """
+        Convert the canvas to an RGBA image array with white and transparent cells made transparent
+
+        Keyword Arguments:
+            scale -- width and height of each cell in pixels as *int* (default: {1})
+
+        Returns:
+            image as *np.ndarray* of shape (height, width, 4) and dtype uint8
+        """
+        indices = self.data.T
+        if scale > 1:
+            indices = indices.repeat(scale, axis=0).repeat(scale, axis=1)
+        rgba = PALETTE_RGBA_LUT[indices]
+        rgba[indices == WHITE_INDEX, 3] = 0
+        return rgba
+
+    def copy(self) -> 'Canvas':
+        """
+        Copy of the canvas that does not share data
+        """
+        return Canvas(self.size, self.data.copy(), self.blank_index)
+
+    def snapshot(self) -> 'Canvas':
+        """
+        Read only copy of the canvas, safe to hand to a background thread
+        """
+        data = self.data.copy()
+        data.flags.writeable = False
+        return Canvas(self.size, data, self.blank_index)
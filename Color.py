@@ -1,8 +1,12 @@
 from enum import StrEnum
 
+import numpy as np
+
 class Color(StrEnum):
     """
     Class that inherits StrEnum to hold colors used in the app
+
+    Each member also has a palette index and an RGB tuple, precomputed in the tables below
     """
 
     # Skin Tones
@@ -134,3 +138,86 @@ class Color(StrEnum):
 
     # eraser
     WHITE = '#FFFFFF'
+
+    @property
+    def palette_index(self) -> int:
+        """
+        Position of the color in the palette
+        """
+        return PALETTE_INDEX[self]
+
+    @property
+    def rgb(self) -> tuple[int, int, int]:
+        """
+        Color as an (r, g, b) tuple
+        """
+        return PALETTE_RGB[PALETTE_INDEX[self]]
+
+    def mapped(self, surface) -> int:
+        """
+        Color as an integer in the pixel format of a surface, which pygame draws without converting
+
+        Arguments:
+            surface -- *pygame.Surface* whose pixel format is used
+
+        Returns:
+            mapped color as *int*
+        """
+        return int(mapped_palette(surface)[PALETTE_INDEX[self]])
+
+    @classmethod
+    def from_index(cls, index: int) -> 'Color':
+        """
+        Get the color at a palette index
+
+        Arguments:
+            index -- palette index as *int*
+
+        Returns:
+            *Color*
+        """
+        return PALETTE[index]
+
+
+PALETTE: tuple[Color, ...] = tuple(Color)
+PALETTE_INDEX: dict[Color, int] = {color: i for i, color in enumerate(PALETTE)}
+PALETTE_RGB: tuple[tuple[int, int, int], ...] = tuple(
+    (int(color[1:3], 16), int(color[3:5], 16), int(color[5:7], 16)) for color in PALETTE)
+PALETTE_RGB_ARRAY: np.ndarray = np.array(PALETTE_RGB, dtype=np.uint8)
+PALETTE_RGB_ARRAY.flags.writeable = False
+WHITE_INDEX: int = PALETTE_INDEX[Color.WHITE]
+
+# index of a cell with nothing painted on it, e.g. on a layer above the bottom one or after erasing
+TRANSPARENT_INDEX: int = 255
+
+# RGBA of every possible cell value: the palette is opaque, anything else is transparent black
+PALETTE_RGBA_LUT: np.ndarray = np.zeros((256, 4), dtype=np.uint8)
+PALETTE_RGBA_LUT[:len(PALETTE), :3] = PALETTE_RGB_ARRAY
+PALETTE_RGBA_LUT[:len(PALETTE), 3] = 255
+PALETTE_RGBA_LUT.flags.writeable = False
+
+
+# mapped palettes by pixel format, a display uses only one or two
+_mapped_palettes: dict[tuple[int, tuple[int, int, int, int]], np.ndarray] = {}
+
+
+def mapped_palette(surface) -> np.ndarray:
+    """
+    Palette colors mapped to the pixel format of *surface*, computed once per format
+
+    The surface maps the colors itself, so this module does not need pygame
+
+    Arguments:
+        surface -- *pygame.Surface* whose pixel format is used
+
+    Returns:
+        mapped integer per palette index as read only *np.ndarray* of uint32
+    """
+    pixel_format = (surface.get_bitsize(), surface.get_masks())
+    mapped = _mapped_palettes.get(pixel_format)
+    if mapped is None:
+        # map_rgb is signed when the alpha byte sets the top bit
+        mapped = np.array([surface.map_rgb(rgb) & 0xFFFFFFFF for rgb in PALETTE_RGB], dtype=np.uint32)
+        mapped.flags.writeable = False
+        _mapped_palettes[pixel_format] = mapped
+    return mapped
@@ -0,0 +1,344 @@
+"""
+Export the drawing to image files, independent of the window size
+
+PNG files are encoded a band of rows at a time and animations a frame at a time, so memory
+use stays bounded however large the scaled image is or however many frames there are
+"""
+import os
+import struct
+import zlib
+from collections.abc import Iterable, Iterator
+
+import numpy as np
+
+from Canvas import Canvas
+from Color import PALETTE_RGB_ARRAY, PALETTE_RGBA_LUT, TRANSPARENT_INDEX, WHITE_INDEX
+from Layers import LayerStack
+
+MIN_SCALE = 1
+MAX_SCALE = 32
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+PNG_COLOR_TYPES = {'indexed': 3, 'rgb': 2, 'rgba': 6}
+PNG_FILTER_NONE = 0
+PNG_FILTER_UP = 2
+
+# the smallest GIF colour table holding the palette, 2 ** (bits + 1) entries
+GIF_COLOR_TABLE_BITS = 6
+GIF_COLOR_TABLE_SIZE = 2 ** (GIF_COLOR_TABLE_BITS + 1)
+
+
+def png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    """
+    Frame data as a PNG chunk
+
+    Arguments:
+        chunk_type -- four letter chunk type, e.g. b'IHDR'
+        data -- chunk payload as *bytes*
+
+    Returns:
+        length, type, data and crc as *bytes*
+    """
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data))
+
+
+def palette_pixels(mode: str) -> np.ndarray:
+    """
+    Pixel value of every cell value for a PNG colour mode
+
+    White and transparent cells are transparent in rgba, transparent cells become white in the
+    other modes, which is transparent in indexed images with a tRNS chunk
+
+    Arguments:
+        mode -- 'indexed', 'rgb' or 'rgba'
+
+    Returns:
+        *np.ndarray* of uint8 with one row of channel values per cell value 0 to 255
+    """
+    if mode == 'indexed':
+        pixels = np.arange(256, dtype=np.uint8)[:, None]
+        pixels[TRANSPARENT_INDEX] = WHITE_INDEX
+        return pixels
+    pixels = PALETTE_RGBA_LUT.copy()
+    pixels[WHITE_INDEX, 3] = 0
+    if mode == 'rgb':
+        pixels[TRANSPARENT_INDEX] = PALETTE_RGBA_LUT[WHITE_INDEX]
+        return pixels[:, :3]
+    return pixels
+
+
+def png_scanlines(data: np.ndarray, scale: int, pixels: np.ndarray | None, band_bytes: int) -> Iterator[bytes]:
+    """
+    Filtered PNG scanlines of the scaled cells, a band of rows at a time
+
+    The first image row of each cell row is stored unfiltered. The rows repeating it use the
+    Up filter, so they are all zeros and compress to almost nothing
+
+    Arguments:
+        data -- cells indexed [x, y], palette indices or pixel values indexed [x, y, channel]
+        scale -- width and height of each cell in pixels as *int*
+        pixels -- channel values per palette index from palette_pixels, *None* if data holds pixel values
+        band_bytes -- rough size of each band in bytes
+
+    Returns:
+        raw scanline data as an iterator of *bytes*
+    """
+    width, height = data.shape[:2]
+    row_bytes = 1 + width * scale * (pixels.shape[1] if pixels is not None else data.shape[2])
+    cell_rows_per_band = max(1, band_bytes // (row_bytes * scale))
+    repeated_rows = bytes([PNG_FILTER_UP]) + bytes(row_bytes - 1)
+
+    for top in range(0, height, cell_rows_per_band):
+        cells = data[:, top:top + cell_rows_per_band].swapaxes(0, 1) # one image row per cell row
+        values = pixels[cells] if pixels is not None else cells
+        band = np.empty((cells.shape[0], row_bytes), dtype=np.uint8)
+        band[:, 0] = PNG_FILTER_NONE
+        band[:, 1:] = values.repeat(scale, axis=1).reshape(cells.shape[0], -1)
+        if scale == 1:
+            yield band.tobytes()
+        else:
+            yield b''.join(row.tobytes() + repeated_rows * (scale - 1) for row in band)
+
+
+def export_png(image: Canvas | LayerStack, path: str, scale: int = 1, indexed: bool = False, transparent: bool = True,
+               compress_level: int = 6, band_bytes: int = 4 * 1024 * 1024) -> str:
+    """
+    Save the drawing as a PNG image, each cell scaled up to scale x scale pixels
+
+    Layers are flattened when every visible layer is opaque. Partly transparent layers blend
+    into colours outside the palette, so such stacks are always saved as RGB(A)
+
+    Arguments:
+        image -- the drawing as *Canvas* or *LayerStack*
+        path -- file path as *str* including file name and extension (png)
+
+    Keyword Arguments:
+        scale -- width and height of each cell in pixels, 1 to 32 (default: {1})
+        indexed -- store palette indices with the palette instead of RGB values, which makes
+                   much smaller files (default: {False})
+        transparent -- make white and unpainted cells transparent (default: {True})
+        compress_level -- zlib level, 0 to 9 (default: {6})
+        band_bytes -- rough size of the rows encoded at a time in bytes (default: {4 MiB})
+
+    Raises:
+        ValueError: if scale is out of range
+
+    Returns:
+        path of the saved image as *str*
+    """
+    check_scale(scale)
+    canvas = image.flatten() if isinstance(image, LayerStack) else image
+    if canvas is None:
+        data, pixels = image.blend(transparent), None
+        mode = 'rgba' if transparent else 'rgb'
+    else:
+        mode = 'indexed' if indexed else 'rgba' if transparent else 'rgb'
+        data, pixels = canvas.data, palette_pixels(mode)
+    size = data.shape[0] * scale
+    return write_png(path, size, size, mode, png_scanlines(data, scale, pixels, band_bytes), transparent, compress_level)
+
+
+def check_scale(scale: int) -> None:
+    """
+    Raise ValueError if scale is out of range
+    """
+    if not MIN_SCALE <= scale <= MAX_SCALE:
+        raise ValueError(f'scale must be between {MIN_SCALE} and {MAX_SCALE}, not {scale}')
+
+
+def write_png(path: str, width: int, height: int, mode: str, scanlines: Iterable[bytes], transparent: bool = True,
+              compress_level: int = 6) -> str:
+    """
+    Write a PNG file from filtered scanlines, compressing them as they come
+
+    Arguments:
+        path -- file path as *str* including file name and extension (png)
+        width -- image width in pixels as *int*
+        height -- image height in pixels as *int*
+        mode -- 'indexed', 'rgb' or 'rgba'
+        scanlines -- raw scanline data, e.g. from png_scanlines
+
+    Keyword Arguments:
+        transparent -- make white transparent in indexed images (default: {True})
+        compress_level -- zlib level, 0 to 9 (default: {6})
+
+    Returns:
+        path of the saved image as *str*
+    """
+    compressor = zlib.compressobj(compress_level)
+    with open(path, 'wb') as f:
+        f.write(PNG_SIGNATURE)
+        f.write(png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, PNG_COLOR_TYPES[mode], 0, 0, 0)))
+        if mode == 'indexed':
+            f.write(png_chunk(b'PLTE', PALETTE_RGB_ARRAY.tobytes()))
+            if transparent: # alpha of the palette entries up to white, the ones after are opaque
+                f.write(png_chunk(b'tRNS', bytes([255] * WHITE_INDEX + [0])))
+
+        for band in scanlines:
+            if data := compressor.compress(band):
+                f.write(png_chunk(b'IDAT', data))
+        f.write(png_chunk(b'IDAT', compressor.flush()))
+        f.write(png_chunk(b'IEND', b''))
+    return path
+
+
+def export_sprite_sheet(frames: list[LayerStack], path: str, scale: int = 1, columns: int | None = None,
+                        indexed: bool = False, transparent: bool = True, compress_level: int = 6,
+                        band_bytes: int = 4 * 1024 * 1024) -> str:
+    """
+    Save animation frames side by side as one PNG image, a band of rows at a time
+
+    Each frame is flattened or blended one band of its rows at a time, just before the band is
+    encoded, so memory use does not grow with the number of frames
+
+    Arguments:
+        frames -- frames of the animation in order as *list[LayerStack]*
+        path -- file path as *str* including file name and extension (png)
+
+    Keyword Arguments:
+        scale -- width and height of each cell in pixels, 1 to 32 (default: {1})
+        columns -- frames per row of the sheet, all frames in one row if *None* (default: {None})
+        indexed -- store palette indices, unless a frame has partly transparent layers (default: {False})
+        transparent -- make white and unpainted cells transparent (default: {True})
+        compress_level -- zlib level, 0 to 9 (default: {6})
+        band_bytes -- rough size of the rows encoded at a time in bytes (default: {4 MiB})
+
+    Raises:
+        ValueError: if scale is out of range or there are no frames
+
+    Returns:
+        path of the saved image as *str*
+    """
+    check_scale(scale)
+    if not frames:
+        raise ValueError('An animation needs at least one frame')
+    size = frames[0].size
+    columns = min(columns or len(frames), len(frames))
+    rows = -(-len(frames) // columns)
+
+    # palette indices when every frame flattens to them, otherwise pixel values
+    flat = all(frame.opaque for frame in frames)
+    mode = 'indexed' if indexed and flat else 'rgba' if transparent else 'rgb'
+    pixels = palette_pixels(mode)
+
+    # cell rows of the sheet encoded at a time, across every frame of the row
+    band_rows = max(1, band_bytes // (columns * size * scale * scale * pixels.shape[1]))
+
+    def frame_band(frame: LayerStack | None, region: tuple[slice, slice]) -> np.ndarray:
+        if frame is None: # the last row may not be full
+            indices = np.broadcast_to(np.uint8(TRANSPARENT_INDEX), (size, len(range(size)[region[1]])))
+        elif frame.opaque:
+            indices = frame.flat_indices(region)
+        else:
+            return frame.blend(transparent, region)
+        # palette indices are turned into pixel values a band at a time
+        return indices if flat else pixels[indices]
+
+    def sheet_scanlines() -> Iterator[bytes]:
+        for row in range(rows):
+            row_frames = frames[row * columns:(row + 1) * columns]
+            row_frames += [None] * (columns - len(row_frames))
+            for top in range(0, size, band_rows):
+                region = (slice(None), slice(top, top + band_rows))
+                band = np.concatenate([frame_band(frame, region) for frame in row_frames])
+                yield from png_scanlines(band, scale, pixels if flat else None, band_bytes)
+
+    return write_png(path, columns * size * scale, rows * size * scale, mode, sheet_scanlines(), transparent, compress_level)
+
+
+def gif_indices(frame: LayerStack, transparent: bool = True) -> np.ndarray:
+    """
+    Palette indices of a frame for a GIF, which can only hold palette colours
+
+    Partly transparent layers are blended and mapped to the nearest palette colour. Unpainted
+    cells become white, which is the transparent colour of transparent GIFs
+
+    Arguments:
+        frame -- frame as *LayerStack*
+
+    Keyword Arguments:
+        transparent -- white and unpainted cells are transparent (default: {True})
+
+    Returns:
+        *np.ndarray* of uint8 indexed [x, y]
+    """
+    if frame.opaque:
+        indices = frame.flatten().data
+        return np.where(indices == TRANSPARENT_INDEX, np.uint8(WHITE_INDEX), indices)
+
+    image = frame.blend(transparent)
+    colors, inverse = np.unique(image[..., :3].reshape(-1, 3), axis=0, return_inverse=True)
+    distances = ((colors[:, None, :].astype(np.int32) - PALETTE_RGB_ARRAY[None, :, :]) ** 2).sum(axis=2)
+    indices = distances.argmin(axis=1).astype(np.uint8)[inverse.ravel()].reshape(frame.size, frame.size)
+    if transparent:
+        indices[image[..., 3] < 128] = WHITE_INDEX
+    return indices
+
+
+def export_gif(frames: Iterable[LayerStack], path: str, scale: int = 1, delay_ms: int = 125,
+               transparent: bool = True) -> str:
+    """
+    Save animation frames as a looping animated GIF, encoding one frame at a time
+
+    The palette is the global colour table, so each frame is written as its palette indices
+    straight away and no frame is kept in memory after it is encoded
+
+    Arguments:
+        frames -- frames of the animation in order, any iterable of *LayerStack*
+        path -- file path as *str* including file name and extension (gif)
+
+    Keyword Arguments:
+        scale -- width and height of each cell in pixels, 1 to 32 (default: {1})
+        delay_ms -- time each frame is shown in milliseconds, rounded to 10 ms (default: {125})
+        transparent -- make white and unpainted cells transparent (default: {True})
+
+    Raises:
+        ValueError: if scale is out of range or there are no frames
+
+    Returns:
+        path of the saved image as *str*
+    """
+    # Pillow is imported on first use, PNG files are written without it
+    from PIL import GifImagePlugin, Image # pylint: disable=import-outside-toplevel
+
+    check_scale(scale)
+    params = {'duration': delay_ms, 'disposal': 2} # clear each frame before the next one
+    if transparent:
+        params['transparency'] = WHITE_INDEX
+    color_table = np.zeros((GIF_COLOR_TABLE_SIZE, 3), dtype=np.uint8)
+    color_table[:len(PALETTE_RGB_ARRAY)] = PALETTE_RGB_ARRAY
+
+    n_frames = 0
+    with open(path, 'wb') as f:
+        for frame in frames:
+            indices = gif_indices(frame, transparent).T # rows of the image
+            if scale > 1:
+                indices = indices.repeat(scale, axis=0).repeat(scale, axis=1)
+            height, width = indices.shape
+            if not n_frames:
+                # header, screen size with the global colour table, and loop forever
+                f.write(b'GIF89a' + struct.pack('<HHBBB', width, height, 0xF0 | GIF_COLOR_TABLE_BITS, 0, 0))
+                f.write(color_table.tobytes())
+                f.write(b'!\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00')
+            image = Image.frombuffer('P', (width, height), np.ascontiguousarray(indices), 'raw', 'P', 0, 1)
+            f.writelines(GifImagePlugin.getdata(image, **params))
+            n_frames += 1
+        f.write(b';')
+    if not n_frames:
+        os.remove(path)
+        raise ValueError('An animation needs at least one frame')
+    return path
+
+
+def export_scale(canvas_size: int, target_size: int) -> int:
+    """
+    Scale that brings the canvas closest to target_size pixels without going over, within 1 to 32
+
+    Arguments:
+        canvas_size -- number of cells on one side as *int*
+        target_size -- wanted image width and height in pixels as *int*
+
+    Returns:
+        scale as *int*
+    """
+    return max(MIN_SCALE, min(MAX_SCALE, target_size // canvas_size))
@@ -0,0 +1,85 @@
+"""
+Process wide font registry and rendered text cache
+"""
+import threading
+from functools import lru_cache
+
+import pygame
+
+# resolves fonts in the background while the window opens, see prewarm_fonts
+_prewarming: threading.Thread | None = None
+
+
+@lru_cache(maxsize=None)
+def get_font(name: str | None, size: int) -> pygame.font.Font:
+    """
+    Resolve a system font once per (name, size)
+
+    Waits for fonts being resolved by prewarm_fonts instead of scanning the system fonts twice
+
+    Arguments:
+        name -- system font name as *str*, or *None* for the default font
+        size -- font size as *int*
+
+    Returns:
+        shared *pygame.font.Font*
+    """
+    if _prewarming is not None and _prewarming is not threading.current_thread():
+        _prewarming.join()
+    return pygame.font.SysFont(name, size)
+
+
+def prewarm_fonts(sizes: tuple[int, ...], name: str | None = None) -> None:
+    """
+    Resolve fonts in a background thread, e.g. while the window opens. The first SysFont call
+    lists every font installed, which can take a moment. Callers of get_font wait for it
+
+    Arguments:
+        sizes -- font sizes to resolve as *tuple[int, ...]*
+
+    Keyword Arguments:
+        name -- system font name, *None* for the default font (default: {None})
+    """
+    global _prewarming # pylint: disable=global-statement
+    if _prewarming is not None and _prewarming.is_alive():
+        return
+    pygame.font.init()
+    _prewarming = threading.Thread(target=lambda: [get_font(name, size) for size in sizes],
+                                   name='font-prewarm', daemon=True)
+    _prewarming.start()
+
+
+@lru_cache(maxsize=512)
+def render_text(text: str, size: int, color: tuple[int, int, int] | str, antialias: bool = True, name: str | None = None) -> pygame.Surface:
+    """
+    Render text once per (text, size, color, antialias), least recently used entries are evicted
+
+    The returned surface is shared between callers and must not be drawn on
+
+    Arguments:
+        text -- text to render as *str*
+        size -- font size as *int*
+        color -- text color as RGB *tuple* or *Color*
+
+    Keyword Arguments:
+        antialias -- render with antialiasing (default: {True})
+        name -- system font name, *None* for the default font (default: {None})
+
+    Returns:
+        rendered text as *pygame.Surface*
+    """
+    return get_font(name, size).render(text, antialias, color)
+
+
+def cache_stats() -> dict[str, dict[str, int]]:
+    """
+    Hit and miss counters of the font registry and the text cache
+
+    Returns:
+        counters as {'fonts': {...}, 'text': {...}}
+    """
+    stats = {}
+    for key, cache in (('fonts', get_font), ('text', render_text)):
+        info = cache.cache_info()
+        stats[key] = {'hits': info.hits, 'misses': info.misses, 'size': info.currsize}
+    return stats
@@ -0,0 +1,140 @@
+"""
+Per phase timing of main loop frames
+"""
+import csv
+import time
+
+import numpy as np
+
+
+class FrameTimer:
+    """
+    Records how long each phase of a frame takes in a ring buffer of the latest frames
+
+    A frame is start_frame() followed by mark(phase) at the end of each phase. When disabled
+    every call returns straight away, so the timer can stay in the main loop
+    """
+    def __init__(self, phases: tuple[str, ...], capacity: int = 600, enabled: bool = False) -> None:
+        self.phases = phases
+        self.capacity = capacity
+        self.enabled = False
+        self.n_frames = 0
+        # one row per frame, one column per phase, then the time from this frame's start to the next
+        self._times = np.zeros((capacity, len(phases) + 1))
+        self._columns = {phase: i for i, phase in enumerate(phases)}
+        self._row = self._times[0]
+        self._frame_start = 0.0
+        self._last_mark = 0.0
+        if enabled:
+            self.toggle()
+
+    def toggle(self) -> bool:
+        """
+        Switch timing on or off, starting from an empty buffer when switched on
+
+        Returns:
+            *True* if timing is now on
+        """
+        self.enabled = not self.enabled
+        self.n_frames = 0
+        self._frame_start = 0.0
+        return self.enabled
+
+    def start_frame(self) -> None:
+        """
+        Start timing a frame, closing the previous one
+        """
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self._frame_start:
+            self._row[-1] = now - self._frame_start
+        self._row = self._times[self.n_frames % self.capacity]
+        self._row[:] = 0
+        self.n_frames += 1
+        self._frame_start = self._last_mark = now
+
+    def mark(self, phase: str) -> None:
+        """
+        End a phase of the current frame, adding the time since the previous mark to it
+
+        Arguments:
+            phase -- one of phases as *str*
+        """
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self._row[self._columns[phase]] += now - self._last_mark
+        self._last_mark = now
+
+    def timings(self) -> np.ndarray:
+        """
+        Timings of the completed frames in the buffer, oldest first
+
+        Returns:
+            copy of the buffer as *np.ndarray*, one row per frame with the phase times and
+            the time to the next frame, in seconds
+        """
+        n = min(self.n_frames - 1, self.capacity - 1)
+        if n <= 0:
+            return np.zeros((0, len(self.phases) + 1))
+        rows = np.arange(self.n_frames - 1 - n, self.n_frames - 1) % self.capacity
+        return self._times[rows]
+
+    def stats(self) -> dict[str, float | str]:
+        """
+        Frame rate and frame time percentiles over the buffer
+
+        Returns:
+            fps, p50 and p99 of the time spent working per frame in seconds, and the phase
+            taking the most time on average, as *dict*, empty if no frame completed yet
+        """
+        timings = self.timings()
+        if not timings.size:
+            return {}
+        work = timings[:, :-1].sum(axis=1)
+        mean_phases = timings[:, :-1].mean(axis=0)
+        slowest = int(mean_phases.argmax())
+        return {
+            'fps': 1 / timings[:, -1].mean(),
+            'p50_s': float(np.percentile(work, 50)),
+            'p99_s': float(np.percentile(work, 99)),
+            'slowest_phase': self.phases[slowest],
+            'slowest_phase_s': float(mean_phases[slowest]),
+        }
+
+    def summary(self) -> list[str]:
+        """
+        Stats formatted for the on screen overlay
+
+        Returns:
+            lines of text as *list[str]*
+        """
+        stats = self.stats()
+        if not stats:
+            return ['Measuring frame times...']
+        return [
+            f'FPS: {stats["fps"]:.0f}',
+            f'Frame p50: {stats["p50_s"] * 1000:.2f} ms | p99: {stats["p99_s"] * 1000:.2f} ms',
+            f'Slowest: {stats["slowest_phase"]} {stats["slowest_phase_s"] * 1000:.2f} ms',
+        ]
+
+
+def write_timings_csv(path: str, phases: tuple[str, ...], timings: np.ndarray) -> str:
+    """
+    Write frame timings to a csv file, one row per frame in milliseconds
+
+    Arguments:
+        path -- file path as *str*
+        phases -- phase names, one per column of timings
+        timings -- rows returned by FrameTimer.timings
+
+    Returns:
+        path of the file written as *str*
+    """
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['frame', *(f'{phase}_ms' for phase in phases), 'frame_interval_ms'])
+        for i, row in enumerate(timings * 1000):
+            writer.writerow([i, *(f'{value:.3f}' for value in row)])
+    return path
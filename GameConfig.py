@@ -1,8 +1,7 @@
 """
 Prescribe, compute and stores game configuration and parameters
 """
-from dataclasses import dataclass, field
-from itertools import cycle
+from dataclasses import dataclass, field, fields
 from Color import Color
 
 @dataclass
@@ -14,15 +13,29 @@ class GameConfig:
 
     font_size: int = field(init=False) # 14
 
-    grid_size_options: tuple[int, int, int] = (16, 22, 8)
-    cycle_grid_sizes:  cycle = cycle(grid_size_options)
-    drawing_board_size: int = next(cycle_grid_sizes)
+    grid_size_options: tuple[int, ...] = (16, 22, 8, 32, 64, 128, 256, 512, 1024)
+    drawing_board_size: int = grid_size_options[0]
     drawing_tile_size: int = field(init=False) # 25
+    drawing_area_cells: int = 22 # cells of drawing_tile_size that fit on one side of the drawing area
+    drawing_area_size: int = field(init=False) # 550
+    drawing_area_x_pos: int = field(init=False)
+    drawing_area_y_pos: int = field(init=False)
     n_palette: int = len(list(Color))
     n_color_palette_rows: int = 3
     n_colors_in_a_row: int = n_palette // n_color_palette_rows
     margin: int = field(init=False)
     n_save_slots: int = 5
+    history_max_bytes: int = 8 * 1024 * 1024 # memory cap of the undo/redo journals of all frames together
+    idle_timeout_ms: int = 1000 # longest sleep waiting for events when nothing needs redrawing
+    resize_debounce_ms: int = 100 # window resizes are applied once no resize came in for this long
+    export_size: int = 512 # captures are scaled up by whole pixels to at most this size, if the grid allows
+    export_indexed: bool = False # capture as palette PNG instead of RGBA, for smaller files
+    animation_fps: int = 8 # playback and export speed of animations
+    onion_skin_alpha: int = 96 # opacity of the previous frame drawn over the current one, 0 to 255
+    cache_dir: str = '.pixlr_cache' # lookup tables and other files that only save time, safe to delete
+    thumbnail_size: int = 32 # largest side in pixels of the cached previews on the save slot buttons
+    autosave_dir: str = '.' # folder of the crash recovery snapshot and journal
+    autosave_compact_bytes: int = 1024 * 1024 # journal size compacted into a new snapshot
 
     color_tile_size: int = field(init=False)
     app_height: int = field(init=False)
@@ -36,8 +49,11 @@ class GameConfig:
 
     save_slot_height: int = field(init=False)
     save_slot_width: int = field(init=False)
+    save_slot_x_pos: list[int] = field(init=False)
+    save_slot_y_pos: int = field(init=False)
 
     _instance = None
+    _layouts = {} # layout fields computed per app_width and settings, shared by all instances
 
     def __new__(cls, *args, **kwargs):
         if cls._instance is None:
@@ -47,10 +63,26 @@ class GameConfig:
     def __post_init__(self):
         self.check_width_constraint(665, 1004)
 
+        # the layout only depends on the settings, not on the grid size
+        key = tuple(getattr(self, f.name) for f in fields(self) if f.init and f.name != 'drawing_board_size')
+        if key not in self._layouts:
+            self._layouts[key] = self.compute_layout()
+        self.__dict__.update(self._layouts[key])
+
+    def compute_layout(self) -> dict:
+        """
+        Compute every field that depends on app_width
+
+        Returns:
+            field names and values as *dict*, the lists in it must not be modified
+        """
         self.font_size = self.compute_font_size()
 
         self.drawing_tile_size = self.compute_drawing_tile_size()
 
+        self.drawing_area_size = self.drawing_area_cells * self.drawing_tile_size
+        self.drawing_area_x_pos, self.drawing_area_y_pos = self.compute_drawing_area_pos()
+
         self.margin = self.compute_margin()
 
         self.color_tile_size = self.compute_color_tile_size()
@@ -66,27 +98,40 @@ class GameConfig:
         self.save_slot_width, self.save_slot_height = self.compute_save_slot_dims()
         self.save_slot_x_pos, self.save_slot_y_pos = self.compute_save_slot_pos()
 
+        return {f.name: getattr(self, f.name) for f in fields(self) if not f.init}
 
     @classmethod
     def reset(cls, *args, **kwargs):
         """
         Reset GameConfig
 
+        Pass drawing_board_size to keep the grid size of the previous config, it is
+        back to the first of grid_size_options otherwise
+
         Returns:
-            _description_
+            new *GameConfig*
         """
         cls._instance = None
         return cls(*args, **kwargs)
 
     def next_grid_size(self) -> None:
         """
-        Get next grid size
+        Move on to the grid size after the current one in grid_size_options, wrapping around
 
-        Returns:
-            _description_
+        A grid size that is not one of the options, e.g. of a loaded drawing, moves on to the first option
+        """
+        options = self.grid_size_options
+        i = options.index(self.drawing_board_size) if self.drawing_board_size in options else -1
+        self.drawing_board_size = options[(i + 1) % len(options)]
+
+    def set_grid_size(self, size: int) -> None:
         """
-        self.drawing_board_size = next(self.cycle_grid_sizes)
+        Set the grid size, e.g. to match a loaded drawing
 
+        Arguments:
+            size -- number of cells on one side of the drawing board as *int*
+        """
+        self.drawing_board_size = size
 
     def check_width_constraint(self, min_width, max_width) -> None:
         """
@@ -123,6 +168,28 @@ class GameConfig:
         """
         return int(self.app_width / 32)
 
+    def compute_drawing_area_pos(self) -> tuple[int, int]:
+        """
+        Compute the top left corner of the drawing area, centred horizontally
+
+        Returns:
+            x, y position of the drawing area as *tuple[int, int]*
+        """
+        return (self.app_width - self.drawing_area_size) // 2, int(self.app_width / 5.5)
+
+    def compute_drawing_cell_size(self) -> int:
+        """
+        Compute the on screen size of a cell so that the drawing board fits the drawing area
+
+        Boards that fit at drawing_tile_size keep it, larger boards shrink down to one pixel per cell
+
+        Returns:
+            cell size in pixels as *int*
+        """
+        if self.drawing_board_size * self.drawing_tile_size <= self.drawing_area_size:
+            return self.drawing_tile_size
+        return max(1, self.drawing_area_size // self.drawing_board_size)
+
     def compute_save_slot_pos(self):
         """
         Compute save slot positions
@@ -181,7 +248,7 @@ class GameConfig:
         return (
             # palette space
             (self.n_palette // self.n_colors_in_a_row) * self.color_tile_size + self.margin * 2 +
-            max(self.grid_size_options) * self.drawing_tile_size + self.margin * 2 +  # drawing space
+            self.drawing_area_size + self.margin * 2 +  # drawing space
             200  # label space
         )
 
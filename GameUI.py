@@ -1,10 +1,19 @@
 """
 Manages and draws Game UI
 """
+from weakref import WeakKeyDictionary
+
+import numpy as np
 import pygame
 
+from Animation import Timeline
+from Canvas import Canvas
+from FontCache import get_font, prewarm_fonts, render_text
 from GameConfig import GameConfig
+from HitTest import GridHitTest
+from Layers import LayerStack
 from Tiles import ColorTile, DrawingTile, Button
+from Viewport import Viewport
 from Color import Color
 
 class GameUI:
@@ -14,14 +23,35 @@ class GameUI:
     def __init__(self, game_config: GameConfig) -> None:
         pygame.init()  # pylint: disable=no-member
         self.game_config = game_config
-        self.font = pygame.font.SysFont(None, game_config.font_size)
+        # fonts are resolved while the window opens, and the window shows before they are needed
+        prewarm_fonts((game_config.font_size, Button.font_size))
         self.screen: pygame.Surface = pygame.display.set_mode((game_config.app_width, game_config.app_height), pygame.RESIZABLE) # pylint: disable=no-member
+        self.screen.fill((255, 255, 255))
+        pygame.display.flip()
+        self.font = get_font(None, game_config.font_size)
+        self.dirty_rects: list[pygame.Rect] = [self.screen.get_rect()]
+        self.active_color: Color | None = None
+        # static parts of the screen and the grid lines, rendered again only when the layout changes
+        self.background: pygame.Surface | None = None
+        self.grid_lines: tuple[tuple, pygame.Surface] | None = None
+        self.timeline: Timeline = Timeline([LayerStack.from_canvas(Canvas(game_config.drawing_board_size))],
+                                           history_max_bytes=game_config.history_max_bytes)
+        # images of frames other than the current one, with the frame version they show
+        self.frame_surfaces: WeakKeyDictionary[LayerStack, tuple[int, pygame.Surface]] = WeakKeyDictionary()
+        self.onion_skin: bool = False
+        # frame shown instead of the current one while an animation plays
+        self.preview: LayerStack | None = None
         self.instruction_labels: list[tuple[pygame.Surface, pygame.Rect]] = self.reset_instruction_pane()
         self.change_grid_size_label: tuple[pygame.Surface, pygame.Rect] = self.reset_change_grid_size_label()
         self.color_label: tuple[pygame.Surface, pygame.Rect] = self.reset_color_label()
         self.msg_label: tuple[pygame.Surface, pygame.Rect] = self.reset_msg_label()
+        self.timeline_label: tuple[pygame.Surface, pygame.Rect] = self.reset_timeline_label()
+        self.overlay_labels: list[tuple[pygame.Surface, pygame.Rect]] = []
+        self.overlay_rect: pygame.Rect = pygame.Rect(0, 0, 0, 0)
         self.palette: list[ColorTile] = self.reset_palette()
-        self.drawing_board: list[DrawingTile] = self.reset_drawing_board()
+        self.board_surface: pygame.Surface = pygame.Surface((0, 0))
+        self.viewport: Viewport = Viewport(pygame.Rect(0, 0, 0, 0), 0, 1)
+        self.reset_drawing_board()
         self.save_slots: list[Button] = self.reset_save_slots()
 
     def reset_window(self, game_config: GameConfig) -> None:
@@ -32,9 +62,43 @@ class GameUI:
             game_config -- *GameConfig* object
         """
         self.game_config = game_config
-        self.font = pygame.font.SysFont(None, self.game_config.font_size)
+        self.font = get_font(None, self.game_config.font_size)
         self.screen = pygame.display.set_mode((self.game_config.app_width, self.game_config.app_height), pygame.RESIZABLE) # pylint: disable=no-member
+        self.background = None
+        self.invalidate()
+
+    @property
+    def needs_redraw(self) -> bool:
+        """
+        Whether anything changed since the last draw
+        """
+        return bool(self.dirty_rects or self.layers.dirty)
+
+    @property
+    def layers(self) -> LayerStack:
+        """
+        Layers of the current frame
+        """
+        return self.timeline.layers
 
+    @property
+    def canvas(self) -> Canvas:
+        """
+        Canvas of the active layer, the one painted on
+        """
+        return self.layers.canvas
+
+    def invalidate(self, *rects: pygame.Rect) -> None:
+        """
+        Mark screen regions to be redrawn on the next draw, the whole screen if no rect is given
+
+        Arguments:
+            rects -- regions of the screen as *pygame.Rect*
+        """
+        if rects:
+            self.dirty_rects.extend(pygame.Rect(r) for r in rects)
+        else:
+            self.dirty_rects.append(self.screen.get_rect())
 
     def reset_instruction_pane(self) -> list[tuple[pygame.Surface, pygame.Rect]]:
         """
@@ -44,20 +108,30 @@ class GameUI:
             --description
         """
         label_texts = {
-            'clear_label_text':         'Clear grid: Ctrl + Shift + K',
-            'load_label_text':          'Load: Ctrl + Shift + L',
-            'save_progress_label_text': 'Save: Ctrl + Shift + A',
-            'save_label_text':          'Capture: Ctrl + S',
+            'clear_label_text':         'Clear grid: Ctrl + Shift + K | Frame: Ctrl + F add | Ctrl + Shift + D delete',
+            'save_progress_label_text': 'Save: Ctrl + Shift + A | Load: Ctrl + Shift + L',
+            'save_label_text':          'Capture: Ctrl + S | Animation: Ctrl + E | Tool: Ctrl + B | Import: drop image',
+            'undo_label_text':          'Undo: Ctrl + Z | Redo: Ctrl + Y | Frames: Ctrl + Left/Right',
+            'zoom_label_text':          'Zoom: Wheel | Pan: Right drag | Play: Ctrl + Space | Onion: Ctrl + Shift + O',
         }
 
         instruction_labels = []
         for i, lt in enumerate(label_texts):
-            surf = self.font.render(label_texts[lt], True, (0, 0, 0))
+            surf = render_text(label_texts[lt], self.game_config.font_size, (0, 0, 0))
             y_offset = 2 + 2 * i
             rect = surf.get_rect(bottomleft=(self.game_config.app_width // 2, self.game_config.app_height - self.game_config.margin * y_offset))
             instruction_labels.append((surf,rect))
 
+        # layer shortcuts go in the left column, under the layer label
+        surf = render_text('Layer: Ctrl + L add | D delete | H hide | O opacity | Up/Down', self.game_config.font_size, (0, 0, 0))
+        rect = surf.get_rect(bottomleft=(self.game_config.margin * 3, self.game_config.app_height - self.game_config.margin * 10))
+        instruction_labels.append((surf, rect))
+
+        if hasattr(self, 'instruction_labels'):
+            self.invalidate(*(label[1] for label in self.instruction_labels))
+        self.invalidate(*(label[1] for label in instruction_labels))
         self.instruction_labels = instruction_labels # assign to self.instruction_label directly
+        self.background = None
 
         return instruction_labels
 
@@ -70,9 +144,12 @@ class GameUI:
             --description
         """
         change_grid_label_text = f'Ctrl + Shift + G: Change grid size | Current: {self.game_config.drawing_board_size}'
-        change_grid_label_surface = self.font.render(change_grid_label_text, True, (0, 0, 0))
+        change_grid_label_surface = render_text(change_grid_label_text, self.game_config.font_size, (0, 0, 0))
         change_grid_label_rect = change_grid_label_surface.get_rect(bottomleft=(self.game_config.margin * 3, self.game_config.app_height - self.game_config.margin * 4))
 
+        if hasattr(self, 'change_grid_size_label'):
+            self.invalidate(self.change_grid_size_label[1])
+        self.invalidate(change_grid_label_rect)
         self.change_grid_size_label = (change_grid_label_surface, change_grid_label_rect)
 
         return change_grid_label_surface, change_grid_label_rect
@@ -84,13 +161,22 @@ class GameUI:
         Returns:
             _description_
         """
-        if hover_tile:
+        if hover_tile and hover_tile.color is None:
+            color_label_text = 'Transparent'
+        elif hover_tile:
             color_label_text = f'{hover_tile.color.name}: {hover_tile.color}'
         else:
             color_label_text = 'Hover over a color to see its name and hex code'
-        color_label_surface = self.font.render(color_label_text, True, (0, 0, 0))
+        color_label_surface = render_text(color_label_text, self.game_config.font_size, (0, 0, 0))
         color_label_rect = color_label_surface.get_rect(bottomleft=(self.game_config.margin * 3, self.game_config.app_height - self.game_config.margin * 6))
 
+        # cached text is the same surface, nothing to redraw if the label did not change
+        if hasattr(self, 'color_label') and self.color_label == (color_label_surface, color_label_rect):
+            return self.color_label
+
+        if hasattr(self, 'color_label'):
+            self.invalidate(self.color_label[1])
+        self.invalidate(color_label_rect)
         self.color_label = (color_label_surface, color_label_rect)
 
         return color_label_surface, color_label_rect
@@ -109,13 +195,65 @@ class GameUI:
             msg_label_surface - *pygame.Surface* with the message text
             msg_label_rect - *pygame.Rect* object for msg_label_surface
         """
-        msg_label_surface = self.font.render(' '.join([msg_label_prompt, msg_label_text]), True, (0, 0, 0))
+        msg_label_surface = render_text(' '.join([msg_label_prompt, msg_label_text]), self.game_config.font_size, (0, 0, 0))
         msg_label_rect = msg_label_surface.get_rect(bottomleft=(self.game_config.margin * 3, self.game_config.app_height - self.game_config.margin * 2))
 
+        if hasattr(self, 'msg_label'):
+            self.invalidate(self.msg_label[1])
+        self.invalidate(msg_label_rect)
         self.msg_label = (msg_label_surface, msg_label_rect)
 
         return msg_label_surface, msg_label_rect
 
+    def reset_timeline_label(self) -> tuple[pygame.Surface, pygame.Rect]:
+        """
+        Reset the label showing the current frame, the active layer, its opacity and visibility
+
+        Returns:
+            timeline_label_surface - *pygame.Surface* with the label text
+            timeline_label_rect - *pygame.Rect* object for timeline_label_surface
+        """
+        layer = self.layers.active_layer
+        timeline_label_text = (f'Frame {self.timeline.current + 1}/{len(self.timeline.frames)} | '
+                               f'Layer {self.layers.active + 1}/{len(self.layers.layers)} | Opacity {round(layer.opacity * 100)}%')
+        if not layer.visible:
+            timeline_label_text += ' | Hidden'
+        if self.onion_skin:
+            timeline_label_text += ' | Onion skin'
+        timeline_label_surface = render_text(timeline_label_text, self.game_config.font_size, (0, 0, 0))
+        timeline_label_rect = timeline_label_surface.get_rect(bottomleft=(self.game_config.margin * 3, self.game_config.app_height - self.game_config.margin * 8))
+
+        if hasattr(self, 'timeline_label'):
+            self.invalidate(self.timeline_label[1])
+        self.invalidate(timeline_label_rect)
+        self.timeline_label = (timeline_label_surface, timeline_label_rect)
+
+        return timeline_label_surface, timeline_label_rect
+
+    def reset_overlay(self, lines: list[str] | None = None, padding: int = 4) -> pygame.Rect:
+        """
+        Set the text shown over the top left corner of the drawing area, e.g. frame timings
+
+        Keyword Arguments:
+            lines -- lines of text, hides the overlay if *None* (default: {None})
+            padding -- space around the text in pixels (default: {4})
+
+        Returns:
+            screen region covered by the overlay as *pygame.Rect*
+        """
+        self.invalidate(self.overlay_rect)
+        self.overlay_labels = []
+        self.overlay_rect = pygame.Rect(self.game_config.drawing_area_x_pos, self.game_config.drawing_area_y_pos, 0, 0)
+        y = self.overlay_rect.y + padding
+        for line in lines or []:
+            surf = render_text(line, self.game_config.font_size, (0, 0, 0))
+            rect = surf.get_rect(topleft=(self.overlay_rect.x + padding, y))
+            self.overlay_labels.append((surf, rect))
+            self.overlay_rect.union_ip(rect.inflate(padding * 2, padding * 2))
+            y = rect.bottom
+        self.invalidate(self.overlay_rect)
+        return self.overlay_rect
+
     def reset_palette(self, padding: int = 5) -> list[ColorTile]:
         """
         Create color palette
@@ -126,48 +264,289 @@ class GameUI:
         Returns:
             palette that makes up the palette as *list[ColorTile]*
         """
-        palette: list[ColorTile] = []
+        # on resize the existing tiles are moved instead of creating new ones
+        palette: list[ColorTile] = getattr(self, 'palette', [])
+        if palette:
+            self.invalidate(pygame.Rect.unionall(palette[0], palette[1:]).inflate(4, 4))
         for i, color in enumerate(Color):
-            tile = ColorTile(x=self.game_config.color_tile_x_pos[i],
-                            y=self.game_config.color_tile_y_pos[i],
-                            width=self.game_config.color_tile_size - padding,
-                            height=self.game_config.color_tile_size,
-                            color=color)
-            palette.append(tile)
+            x, y = self.game_config.color_tile_x_pos[i], self.game_config.color_tile_y_pos[i]
+            width, height = self.game_config.color_tile_size - padding, self.game_config.color_tile_size
+            if i < len(palette):
+                palette[i].update(x, y, width, height)
+            else:
+                palette.append(ColorTile(x=x, y=y, width=width, height=height, color=color))
 
+        self.invalidate(pygame.Rect.unionall(palette[0], palette[1:]).inflate(4, 4))
         self.palette = palette
+        self.background = None
+
+        x_pos, y_pos = self.game_config.color_tile_x_pos, self.game_config.color_tile_y_pos
+        n_columns = self.game_config.n_colors_in_a_row
+        self.palette_hit_test = GridHitTest(
+            x=x_pos[0],
+            y=y_pos[0],
+            tile_width=self.game_config.color_tile_size - padding,
+            tile_height=self.game_config.color_tile_size,
+            x_pitch=x_pos[1] - x_pos[0],
+            y_pitch=y_pos[n_columns] - y_pos[0],
+            n_columns=n_columns,
+            n_rows=-(-len(palette) // n_columns),
+            n_tiles=len(palette))
 
         return palette
 
-    def reset_drawing_board(self, drawing_board: list[DrawingTile] | None = None, tile_colors: list[Color] | None = None) -> list[DrawingTile]:
+    def reset_drawing_board(self, layers: LayerStack | None = None) -> LayerStack:
+        """
+        Resize the drawing according to drawing_board_size, or replace it with loaded layers
+
+        A new grid size starts a new drawing with a single layer
+
+        Keyword Arguments:
+            layers -- *LayerStack* to show, e.g. loaded from a save slot (default: {None})
+
+        Raises:
+            ValueError: if layers do not match the current drawing_board_size
+
+        Returns:
+            layers - *LayerStack* holding the drawing
+        """
+        if layers is not None:
+            if layers.size != self.game_config.drawing_board_size:
+                raise ValueError(f'Canvas size {layers.size} does not match grid size {self.game_config.drawing_board_size}')
+            self.timeline.layers = layers
+            self.layers.canvas.mark_dirty()
+            self.reset_timeline_label()
+        elif self.layers.size != self.game_config.drawing_board_size:
+            self.timeline.layers = LayerStack.from_canvas(Canvas(self.game_config.drawing_board_size))
+            self.reset_timeline_label()
+            self.invalidate()
+
+        # one pixel per cell, scaled onto the screen by the viewport
+        if self.board_surface.get_width() != self.layers.size:
+            self.board_surface = pygame.Surface((self.layers.size, self.layers.size)).convert(self.screen)
+            self.layers.canvas.mark_dirty()
+
+        area = pygame.Rect(self.game_config.drawing_area_x_pos, self.game_config.drawing_area_y_pos,
+                           self.game_config.drawing_area_size, self.game_config.drawing_area_size)
+        if self.viewport.canvas_size != self.layers.size:
+            self.viewport = Viewport(area, self.layers.size, self.game_config.compute_drawing_cell_size())
+            self.invalidate(area)
+        elif self.viewport.area != area: # window resized, keep the zoom and pan
+            self.invalidate(self.viewport.board_rect)
+            self.viewport.set_area(area, self.game_config.compute_drawing_cell_size())
+            self.invalidate(area)
+
+        return self.layers
+
+    def reset_timeline(self, timeline: Timeline) -> Timeline:
+        """
+        Replace the frames, e.g. with ones loaded from a save slot
+
+        Arguments:
+            timeline -- *Timeline* of the size of the current grid
+
+        Raises:
+            ValueError: if the frames do not match the current drawing_board_size
+
+        Returns:
+            timeline - *Timeline* holding the drawing
+        """
+        if timeline.size != self.game_config.drawing_board_size:
+            raise ValueError(f'Frame size {timeline.size} does not match grid size {self.game_config.drawing_board_size}')
+        self.timeline = timeline
+        self.frame_surfaces.clear()
+        self.preview = None
+        self.reset_drawing_board(timeline.layers)
+        self.invalidate(self.viewport.board_rect)
+        return timeline
+
+    def select_frame(self, index: int) -> bool:
         """
-        Redraw drawing tiles according to drawing_board_size
+        Show and edit another frame, wrapping around at either end
+
+        Arguments:
+            index -- position of the frame as *int*
 
         Returns:
-            drawing_board - *list[DrawingTile]* redraw drawing board if provided. e.g. used when resizing
-            tile_colors - *list[Color]* used to reload work saved
+            *True* if the current frame changed
         """
-        new_drawing_board = []
+        self.stash_frame()
+        if not self.timeline.select(index):
+            return False
+        self.show_frame()
+        return True
 
-        # Create DrawingTile
-        for i in range(self.game_config.drawing_board_size):
-            for j in range(self.game_config.drawing_board_size):
-                if tile_colors:
-                    color = tile_colors[i * self.game_config.drawing_board_size + j]
-                else:
-                    color = drawing_board[i * self.game_config.drawing_board_size + j].color if drawing_board else Color.WHITE
-                tile = DrawingTile(
-                    x = i * self.game_config.drawing_tile_size +
-                    int(self.game_config.app_width - self.game_config.drawing_board_size * self.game_config.drawing_tile_size) / 2,
-                    y = j * self.game_config.drawing_tile_size + int(self.game_config.app_width / 5.5),
-                    width = self.game_config.drawing_tile_size,
-                    height = self.game_config.drawing_tile_size,
-                    color = color)
-                new_drawing_board.append(tile)
+    def add_frame(self) -> LayerStack:
+        """
+        Add a copy of the current frame after it and show it
 
-        self.drawing_board = new_drawing_board
+        Returns:
+            the new frame as *LayerStack*
+        """
+        self.stash_frame()
+        frame = self.timeline.add_frame()
+        self.show_frame()
+        return frame
 
-        return new_drawing_board
+    def remove_frame(self) -> LayerStack | None:
+        """
+        Remove the current frame and show the one before it
+
+        Returns:
+            the removed frame as *LayerStack*, or *None* if it is the only frame
+        """
+        frame = self.timeline.remove_frame()
+        if frame is not None:
+            self.show_frame()
+        return frame
+
+    def stash_frame(self) -> None:
+        """
+        Keep the image of the current frame before another one is shown, so flipping back or
+        playing the animation does not composite it again, and free its compositing caches
+        """
+        if not self.layers.dirty:
+            self.frame_surfaces[self.layers] = (self.layers.version, self.board_surface.copy())
+        self.layers.release_caches()
+
+    def show_frame(self) -> None:
+        """
+        Copy the image of the current frame to the board surface, after switching frames
+        """
+        layers = self.layers
+        cached = self.frame_surfaces.get(layers)
+        if cached is not None and cached[0] == layers.version:
+            self.board_surface.blit(cached[1], (0, 0))
+        elif layers.composite is not None:
+            pygame.surfarray.blit_array(self.board_surface, layers.composite)
+        # a frame that was never composited is drawn in full by the next update
+        self.invalidate(self.viewport.board_rect)
+        self.reset_timeline_label()
+
+    def render_frame(self, layers: LayerStack) -> pygame.Surface:
+        """
+        Image of a frame with one pixel per cell, composited again only if the frame changed
+
+        Arguments:
+            layers -- frame of the timeline as *LayerStack*
+
+        Returns:
+            *pygame.Surface* to be scaled onto the board, not to be modified
+        """
+        if layers is self.layers:
+            return self.board_surface
+        if layers.dirty:
+            layers.update()
+            layers.release_caches()
+        cached = self.frame_surfaces.get(layers)
+        if cached is None or cached[0] != layers.version:
+            surface = pygame.Surface((layers.size, layers.size)).convert(self.screen)
+            pygame.surfarray.blit_array(surface, layers.composite)
+            cached = self.frame_surfaces[layers] = (layers.version, surface)
+        return cached[1]
+
+    def set_preview(self, layers: LayerStack | None) -> None:
+        """
+        Show a frame on the board instead of the current one, e.g. while playing the animation
+
+        Arguments:
+            layers -- frame to show as *LayerStack*, or *None* to show the current frame again
+        """
+        if layers is not self.preview:
+            self.preview = layers
+            self.invalidate(self.viewport.board_rect)
+
+    def toggle_onion_skin(self) -> bool:
+        """
+        Show or hide the previous frame faintly over the current one
+
+        Returns:
+            *True* if the onion skin is now shown
+        """
+        self.onion_skin = not self.onion_skin
+        self.invalidate(self.viewport.board_rect)
+        self.reset_timeline_label()
+        return self.onion_skin
+
+    def get_drawing_tile(self, x: int, y: int) -> DrawingTile:
+        """
+        Compute the geometry of a single drawing tile on demand
+
+        Arguments:
+            x -- column of the cell as *int*
+            y -- row of the cell as *int*
+
+        Returns:
+            *DrawingTile* positioned on screen with the color of the cell
+        """
+        return DrawingTile(
+            x = x * self.viewport.cell_size + self.viewport.origin[0],
+            y = y * self.viewport.cell_size + self.viewport.origin[1],
+            width = self.viewport.cell_size,
+            height = self.viewport.cell_size,
+            color = self.canvas[x, y], # of the active layer, None if transparent
+            cell = (x, y))
+
+    def zoom(self, steps: int, anchor: tuple[int, int]) -> None:
+        """
+        Zoom the drawing board around anchor
+
+        Arguments:
+            steps -- positive to zoom in, negative to zoom out
+            anchor -- screen position (x, y) to zoom around, e.g. the cursor
+        """
+        board_rect = self.viewport.board_rect
+        if self.viewport.zoom(steps, anchor):
+            self.invalidate(board_rect, self.viewport.board_rect)
+
+    def pan(self, dx: int, dy: int) -> None:
+        """
+        Move the view over the drawing board
+
+        Arguments:
+            dx -- screen pixels to move right as *int*
+            dy -- screen pixels to move down as *int*
+        """
+        if self.viewport.pan(dx, dy):
+            self.invalidate(self.viewport.board_rect)
+
+    def get_hover_color_tile(self, pos: tuple[float, float]) -> ColorTile | None:
+        """
+        Get the palette tile under pos
+
+        Arguments:
+            pos -- cursor position (x, y) as *tuple[float, float]*, e.g. event.pos
+
+        Returns:
+            *ColorTile* or *None*
+        """
+        index = self.palette_hit_test.index_at(pos)
+        return self.palette[index] if index is not None else None
+
+    def get_hover_drawing_tile(self, pos: tuple[float, float]) -> DrawingTile | None:
+        """
+        Get the drawing tile under pos
+
+        Arguments:
+            pos -- cursor position (x, y) as *tuple[float, float]*, e.g. event.pos
+
+        Returns:
+            *DrawingTile* or *None*
+        """
+        cell = self.viewport.cell_at(pos)
+        return self.get_drawing_tile(*cell) if cell is not None else None
+
+    def get_hover_save_slot(self, pos: tuple[float, float]) -> int | None:
+        """
+        Get the index of the save slot under pos
+
+        Arguments:
+            pos -- cursor position (x, y) as *tuple[float, float]*, e.g. event.pos
+
+        Returns:
+            save slot index as *int* or *None*
+        """
+        return self.save_slot_hit_test.index_at(pos)
 
     def reset_save_slots(self, active_save_slot: int = 0) -> list[Button]:
         """
@@ -179,44 +558,198 @@ class GameUI:
         Returns:
             save_slots - *list[Button]*
         """
-        save_slots: list[Button] = []
+        # existing buttons are moved and recoloured instead of creating new ones
+        save_slots: list[Button] = getattr(self, 'save_slots', [])
+        if save_slots:
+            self.invalidate(pygame.Rect.unionall(save_slots[0], save_slots[1:]))
         for i in range(self.game_config.n_save_slots):
             if i == active_save_slot:
                 save_slot_color = Color.RED
             else:
                 save_slot_color = Color.BLACK_L
-            slot = Button(x=self.game_config.save_slot_x_pos[i],
-                        y=self.game_config.save_slot_y_pos,
-                        width=self.game_config.save_slot_width,
-                        height=self.game_config.save_slot_height,
-                        color=save_slot_color,
-                        text_color=save_slot_color,
-                        text=f'Slot {i}')
-            save_slots.append(slot)
-
+            if i < len(save_slots):
+                slot = save_slots[i]
+                slot.update(self.game_config.save_slot_x_pos[i], self.game_config.save_slot_y_pos,
+                            self.game_config.save_slot_width, self.game_config.save_slot_height)
+                slot.color = slot.text_color = save_slot_color
+            else:
+                slot = Button(x=self.game_config.save_slot_x_pos[i],
+                            y=self.game_config.save_slot_y_pos,
+                            width=self.game_config.save_slot_width,
+                            height=self.game_config.save_slot_height,
+                            color=save_slot_color,
+                            text_color=save_slot_color,
+                            text=f'Slot {i}')
+                save_slots.append(slot)
+
+        self.invalidate(pygame.Rect.unionall(save_slots[0], save_slots[1:]))
         self.save_slots = save_slots
 
+        x_pos = self.game_config.save_slot_x_pos
+        self.save_slot_hit_test = GridHitTest(
+            x=x_pos[0],
+            y=self.game_config.save_slot_y_pos,
+            tile_width=self.game_config.save_slot_width,
+            tile_height=self.game_config.save_slot_height,
+            x_pitch=x_pos[1] - x_pos[0],
+            y_pitch=self.game_config.save_slot_height,
+            n_columns=len(save_slots),
+            n_rows=1)
+
         return save_slots
 
-    def draw(self, active_color: Color, capture_drawing: bool = False) -> None:
+    def set_save_slot_thumbnail(self, slot: int, pixels: np.ndarray | None) -> None:
         """
-        Update UI
+        Show a preview of the work saved in a slot on its button
+
+        Arguments:
+            slot -- index of save slot as *int*
+            pixels -- RGB *np.ndarray* indexed [x, y, channel], e.g. from load_thumbnail, or *None* to show none
+        """
+        if not 0 <= slot < len(self.save_slots):
+            return
+        button = self.save_slots[slot]
+        button.thumbnail = pygame.surfarray.make_surface(pixels) if pixels is not None else None
+        self.invalidate(button)
+
+    def render_background(self) -> pygame.Surface:
+        """
+        Render the parts of the screen that only change with the layout: the instruction labels and the palette
+
+        Returns:
+            screen sized *pygame.Surface*
         """
-        # instruction labels
+        background = pygame.Surface(self.screen.get_size()).convert(self.screen)
+        background.fill((255, 255, 255))
         for label in self.instruction_labels:
-            self.screen.blit(label[0], label[1])
+            background.blit(label[0], label[1])
+        for tile in self.palette:
+            tile.draw(background, None)
+        self.background = background
+        return background
 
-        self.screen.blit(self.change_grid_size_label[0], self.change_grid_size_label[1])
+    def render_grid_lines(self) -> pygame.Surface:
+        """
+        Render the cell borders over the visible board, for the current zoom and pan
 
-        self.screen.blit(self.color_label[0], self.color_label[1])
+        Returns:
+            *pygame.Surface* the size of the board_rect, transparent between the lines
+        """
+        board_rect, cell_size = self.viewport.board_rect, self.viewport.cell_size
+        key = (tuple(board_rect), self.viewport.origin, cell_size)
+        if self.grid_lines is not None and self.grid_lines[0] == key:
+            return self.grid_lines[1]
+
+        surface = pygame.Surface(board_rect.size).convert(self.screen)
+        surface.fill((255, 255, 255))
+        surface.set_colorkey((255, 255, 255))
+
+        # one pixel border on every side of each visible cell
+        x, y, width, height = self.viewport.visible_cells()
+        left = self.viewport.origin[0] + x * cell_size - board_rect.x
+        top = self.viewport.origin[1] + y * cell_size - board_rect.y
+        for i in range(width):
+            for line_x in (left + i * cell_size, left + (i + 1) * cell_size - 1):
+                pygame.draw.line(surface, Color.LIGHT_METAL.rgb, (line_x, 0), (line_x, board_rect.height - 1))
+        for j in range(height):
+            for line_y in (top + j * cell_size, top + (j + 1) * cell_size - 1):
+                pygame.draw.line(surface, Color.LIGHT_METAL.rgb, (0, line_y), (board_rect.width - 1, line_y))
+
+        self.grid_lines = (key, surface)
+        return surface
+
+    def draw(self, active_color: Color) -> list[pygame.Rect]:
+        """
+        Redraw the regions of the UI that changed since the last call
 
-        self.screen.blit(self.msg_label[0], self.msg_label[1])
+        Arguments:
+            active_color -- selected *Color* highlighted in the palette
 
-        for tile in self.palette:
-            tile.draw(self.screen, active_color)
+        Returns:
+            redrawn regions as *list[pygame.Rect]*, to be passed to pygame.display.update
+        """
+        if active_color != self.active_color:
+            self.invalidate(*(tile.inflate(4, 4) for tile in self.palette if tile.color in (self.active_color, active_color)))
+            self.active_color = active_color
+
+        # composite the layers where they changed, then copy those regions to the board surface
+        for x, y, width, height in self.layers.update():
+            pygame.surfarray.blit_array(self.board_surface.subsurface((x, y, width, height)),
+                                        self.layers.composite[x:x + width, y:y + height])
+            if rect := self.viewport.cells_rect(x, y, width, height):
+                self.invalidate(rect)
+
+        screen_rect = self.screen.get_rect()
+        dirty_rects = [screen_rect] if screen_rect in self.dirty_rects else self.dirty_rects
+        self.dirty_rects = []
+
+        background = self.background or self.render_background()
+        active_tile = next((tile for tile in self.palette if tile.color == active_color), None)
+
+        for dirty_rect in dirty_rects:
+            self.screen.set_clip(dirty_rect)
+
+            # background, instruction labels and palette
+            self.screen.blit(background, dirty_rect, dirty_rect)
+
+            for label in (self.change_grid_size_label, self.color_label, self.msg_label, self.timeline_label):
+                if label[1].colliderect(dirty_rect):
+                    self.screen.blit(label[0], label[1])
+
+            if active_tile is not None and active_tile.inflate(4, 4).colliderect(dirty_rect):
+                active_tile.draw_selection(self.screen)
+
+            self.draw_board(dirty_rect)
 
-        for tile in self.drawing_board:
-            tile.draw(self.screen, capture_drawing)
+            for sl in self.save_slots:
+                if sl.colliderect(dirty_rect):
+                    sl.draw(self.screen)
 
-        for sl in self.save_slots:
-            sl.draw(self.screen)
+            # overlay goes on top of the board
+            if self.overlay_labels and self.overlay_rect.colliderect(dirty_rect):
+                self.screen.fill((255, 255, 255), self.overlay_rect)
+                for label in self.overlay_labels:
+                    self.screen.blit(label[0], label[1])
+
+        self.screen.set_clip(None)
+
+        return dirty_rects
+
+    def draw_board(self, rect: pygame.Rect, grid_min_cell_size: int = 4) -> None:
+        """
+        Draw the visible cells of the drawing board overlapping rect by scaling board_surface
+
+        Arguments:
+            rect -- screen region to draw as *pygame.Rect*
+
+        Keyword Arguments:
+            grid_min_cell_size -- smallest cell size in pixels that still gets grid lines (default: {4})
+        """
+        x, y, width, height = self.viewport.visible_cells(rect)
+        if not width or not height:
+            return
+
+        cell_size = self.viewport.cell_size
+        frame = self.board_surface if self.preview is None else self.render_frame(self.preview)
+        cells = frame.subsurface((x, y, width, height))
+        left, top = self.viewport.origin[0] + x * cell_size, self.viewport.origin[1] + y * cell_size
+
+        # partially visible cells must not spill out of the board
+        clip = self.screen.get_clip()
+        self.screen.set_clip(clip.clip(self.viewport.board_rect))
+
+        self.screen.blit(pygame.transform.scale(cells, (width * cell_size, height * cell_size)), (left, top))
+
+        # painted cells of the previous frame shine through faintly, to line up the next pose
+        frames = self.timeline.frames
+        if self.onion_skin and self.preview is None and len(frames) > 1:
+            previous = self.render_frame(frames[self.timeline.current - 1]).subsurface((x, y, width, height))
+            onion = pygame.transform.scale(previous, (width * cell_size, height * cell_size))
+            onion.set_colorkey((255, 255, 255))
+            onion.set_alpha(self.game_config.onion_skin_alpha)
+            self.screen.blit(onion, (left, top))
+
+        if cell_size >= grid_min_cell_size:
+            self.screen.blit(self.render_grid_lines(), self.viewport.board_rect)
+
+        self.screen.set_clip(clip)
@@ -0,0 +1,292 @@
+"""
+Undo and redo journal of drawing changes
+"""
+from collections import deque
+from dataclasses import dataclass
+from itertools import count
+
+import numpy as np
+
+from Autosave import Autosave
+from Canvas import Canvas
+from Color import Color, TRANSPARENT_INDEX
+from Layers import Layer, LayerStack
+from SaveFile import rle_decode, rle_encode
+
+
+@dataclass(frozen=True)
+class CellsEntry:
+    """
+    Cells of one layer changed by one stroke, as flat cell indices with their old and new palette indices
+    """
+    layer_id: int
+    indices: np.ndarray # uint32
+    old: np.ndarray # uint8
+    new: np.ndarray # uint8
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Memory held by the entry
+        """
+        return self.indices.nbytes + self.old.nbytes + self.new.nbytes
+
+
+@dataclass(frozen=True)
+class LayersEntry:
+    """
+    Change to the whole layer stack, e.g. clear, load, grid size change or adding a layer
+
+    Each state is the size, the active layer and every layer as
+    (layer_id, visible, opacity, blank_index, run length encoded cells)
+    """
+    old: tuple[int, int, tuple[tuple[int, bool, float, int, bytes], ...]]
+    new: tuple[int, int, tuple[tuple[int, bool, float, int, bytes], ...]]
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Memory held by the entry
+        """
+        return sum(len(layer[-1]) for state in (self.old, self.new) for layer in state[2])
+
+
+def encode_layers(layers: LayerStack) -> tuple[int, int, tuple[tuple[int, bool, float, int, bytes], ...]]:
+    """
+    Run length encode a layer stack for a LayersEntry
+
+    Arguments:
+        layers -- *LayerStack* to encode
+
+    Returns:
+        size, active layer and encoded layers
+    """
+    return layers.size, layers.active, tuple(
+        (layer.layer_id, layer.visible, layer.opacity, layer.canvas.blank_index,
+         rle_encode(np.ascontiguousarray(layer.canvas.data).ravel()))
+        for layer in layers.layers)
+
+
+def decode_layers(state: tuple[int, int, tuple[tuple[int, bool, float, int, bytes], ...]]) -> LayerStack:
+    """
+    Rebuild a layer stack encoded by encode_layers, with the same layer ids
+
+    Arguments:
+        state -- encoded stack
+
+    Returns:
+        *LayerStack*
+    """
+    size, active, layers = state
+    return LayerStack([Layer(Canvas(size, rle_decode(data, size * size).reshape(size, size), blank_index), visible, opacity, layer_id)
+                       for layer_id, visible, opacity, blank_index, data in layers], active)
+
+
+class HistoryBudget:
+    """
+    Memory cap shared by histories, e.g. those of the frames of an animation
+
+    When the histories hold more than max_bytes together, the oldest undo entries of any of them
+    are dropped first
+    """
+    def __init__(self, max_bytes: int = 8 * 1024 * 1024) -> None:
+        self.max_bytes = max_bytes
+        self.histories: list['History'] = []
+        self._ages = count()
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Memory held by the undo and redo entries of all histories
+        """
+        return sum(history.nbytes for history in self.histories)
+
+    def next_age(self) -> int:
+        """
+        Age of a new entry, increasing across all histories
+        """
+        return next(self._ages)
+
+    def trim(self) -> None:
+        """
+        Drop the oldest undo entries of all histories until they fit in max_bytes
+        """
+        nbytes = self.nbytes
+        while nbytes > self.max_bytes:
+            holding = [history for history in self.histories if history.undo_entries]
+            if not holding:
+                break
+            nbytes -= min(holding, key=lambda history: history.undo_ages[0]).drop_oldest()
+
+
+class History:
+    """
+    Bounded undo/redo journal
+
+    Painting is recorded per stroke as cell deltas of the active layer, changes to the whole layer
+    stack as run length encoded before and after states. When the journal grows past max_bytes the oldest entries are dropped.
+    Every change, including undo and redo, is also reported to the autosave journal if there is one
+    """
+    def __init__(self, max_bytes: int = 8 * 1024 * 1024, journal: Autosave | None = None,
+                 budget: HistoryBudget | None = None) -> None:
+        # histories sharing a budget are capped together, max_bytes is then the cap of the budget
+        self.budget = budget if budget is not None else HistoryBudget(max_bytes)
+        self.budget.histories.append(self)
+        self.journal = journal
+        self.undo_entries: deque[CellsEntry | LayersEntry] = deque()
+        self.redo_entries: list[CellsEntry | LayersEntry] = []
+        # ages of the entries from the budget, to drop the oldest across histories first
+        self.undo_ages: deque[int] = deque()
+        self.redo_ages: list[int] = []
+        self.nbytes = 0
+        self._stroke: list[tuple[np.ndarray, np.ndarray, int]] = []
+        self._stroke_layer_id = -1
+
+    def paint_cells(self, layers: LayerStack, xs: np.ndarray, ys: np.ndarray, color: Color | None) -> None:
+        """
+        Paint cells of the active layer as part of the current stroke, recording what they were before
+
+        Arguments:
+            layers -- *LayerStack* to paint on
+            xs -- columns of the cells as *np.ndarray*
+            ys -- rows of the cells as *np.ndarray*
+            color -- *Color* to paint with, *None* to erase
+        """
+        layer_id = layers.active_layer.layer_id
+        if self._stroke and self._stroke_layer_id != layer_id:
+            self.end_stroke()
+        self._stroke_layer_id = layer_id
+
+        canvas = layers.canvas
+        index = TRANSPARENT_INDEX if color is None else color.palette_index
+        indices = np.ravel_multi_index((xs, ys), canvas.data.shape).astype(np.uint32)
+        old = canvas.data[xs, ys]
+        changed = old != index
+        if not changed.any():
+            return
+        self._stroke.append((indices[changed], old[changed], index))
+        if self.journal is not None:
+            self.journal.cells(layers, layer_id, indices[changed], index)
+
+        xs, ys = xs[changed], ys[changed]
+        canvas.data[xs, ys] = index
+        canvas.mark_dirty_cells(xs, ys)
+
+    def end_stroke(self) -> None:
+        """
+        Close the current stroke into a single undo entry
+        """
+        if not self._stroke:
+            return
+        indices = np.concatenate([chunk[0] for chunk in self._stroke])
+        old = np.concatenate([chunk[1] for chunk in self._stroke])
+        new = np.concatenate([np.full(chunk[0].size, chunk[2], dtype=np.uint8) for chunk in self._stroke])
+        self._stroke = []
+
+        # a cell painted several times keeps its first old and its last new value
+        unique, first = np.unique(indices, return_index=True)
+        _, last_reversed = np.unique(indices[::-1], return_index=True)
+        last = indices.size - 1 - last_reversed
+        keep = old[first] != new[last]
+        self._push(CellsEntry(self._stroke_layer_id, unique[keep], old[first][keep], new[last][keep]))
+
+    def commit_layers(self, before: LayerStack, after: LayerStack) -> None:
+        """
+        Record a change to the whole layer stack such as clear, load, grid size change or a new layer
+
+        Arguments:
+            before -- *LayerStack* before the change, e.g. a copy, must not be modified afterwards
+            after -- *LayerStack* after the change
+        """
+        self.end_stroke()
+        self._push(LayersEntry(encode_layers(before), encode_layers(after)))
+        if self.journal is not None:
+            self.journal.changed()
+
+    def _push(self, entry: CellsEntry | LayersEntry) -> None:
+        if isinstance(entry, CellsEntry) and not entry.indices.size:
+            return
+        self.undo_entries.append(entry)
+        self.undo_ages.append(self.budget.next_age())
+        self.nbytes += entry.nbytes
+        self.nbytes -= sum(e.nbytes for e in self.redo_entries)
+        self.redo_entries.clear()
+        self.redo_ages.clear()
+        self.budget.trim()
+
+    def drop_oldest(self) -> int:
+        """
+        Forget the oldest undo entry, e.g. to keep within the budget
+
+        Returns:
+            memory freed in bytes as *int*
+        """
+        self.undo_ages.popleft()
+        nbytes = self.undo_entries.popleft().nbytes
+        self.nbytes -= nbytes
+        return nbytes
+
+    def undo(self, layers: LayerStack) -> LayerStack | None:
+        """
+        Revert the latest change
+
+        Arguments:
+            layers -- current *LayerStack*
+
+        Returns:
+            the *LayerStack* to show, a new object if the whole stack was replaced, or *None* if there is nothing to undo
+        """
+        self.end_stroke()
+        if not self.undo_entries:
+            return None
+        entry = self.undo_entries.pop()
+        self.redo_entries.append(entry)
+        self.redo_ages.append(self.undo_ages.pop())
+        return self._apply(layers, entry, undo=True)
+
+    def redo(self, layers: LayerStack) -> LayerStack | None:
+        """
+        Reapply the latest undone change
+
+        Arguments:
+            layers -- current *LayerStack*
+
+        Returns:
+            the *LayerStack* to show, a new object if the whole stack was replaced, or *None* if there is nothing to redo
+        """
+        self.end_stroke()
+        if not self.redo_entries:
+            return None
+        entry = self.redo_entries.pop()
+        self.undo_entries.append(entry)
+        self.undo_ages.append(self.redo_ages.pop())
+        return self._apply(layers, entry, undo=False)
+
+    def _apply(self, layers: LayerStack, entry: CellsEntry | LayersEntry, undo: bool) -> LayerStack:
+        if isinstance(entry, LayersEntry):
+            if self.journal is not None:
+                self.journal.changed()
+            return decode_layers(entry.old if undo else entry.new)
+
+        layer = layers.find(entry.layer_id)
+        if layer is None: # journal no longer matches the layers
+            self.clear()
+            return layers
+        canvas = layer.canvas
+        np.put(canvas.data, entry.indices, entry.old if undo else entry.new)
+        if self.journal is not None:
+            self.journal.cells(layers, entry.layer_id, entry.indices, entry.old if undo else entry.new)
+        xs, ys = np.unravel_index(entry.indices, canvas.data.shape)
+        canvas.mark_dirty_cells(xs, ys)
+        return layers
+
+    def clear(self) -> None:
+        """
+        Forget all history
+        """
+        self._stroke = []
+        self.undo_entries.clear()
+        self.redo_entries.clear()
+        self.undo_ages.clear()
+        self.redo_ages.clear()
+        self.nbytes = 0
@@ -0,0 +1,62 @@
+"""
+Constant time hit testing for regular grids of tiles
+"""
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class GridHitTest:
+    """
+    Maps a screen position to a tile in a regular grid using arithmetic instead of scanning tiles
+
+    Tiles are laid out row by row starting at (x, y). Each tile is tile_width x tile_height
+    and the next tile starts x_pitch to the right or y_pitch below, so any pitch larger
+    than the tile leaves a gap that does not belong to any tile
+    """
+    x: int
+    y: int
+    tile_width: int
+    tile_height: int
+    x_pitch: int
+    y_pitch: int
+    n_columns: int
+    n_rows: int
+    n_tiles: int | None = None # set when the last row is only partially filled
+
+    def cell_at(self, pos: tuple[float, float]) -> tuple[int, int] | None:
+        """
+        Get the (column, row) of the tile under pos, same edges as pygame.Rect.collidepoint
+
+        Arguments:
+            pos -- screen position (x, y) as *tuple[float, float]*
+
+        Returns:
+            column and row of the tile as *tuple[int, int]* or *None* if pos is not on a tile
+        """
+        px, py = int(pos[0]), int(pos[1])
+        if px < self.x or py < self.y:
+            return None
+
+        column, x_in_tile = divmod(px - self.x, self.x_pitch)
+        row, y_in_tile = divmod(py - self.y, self.y_pitch)
+        if column >= self.n_columns or row >= self.n_rows or x_in_tile >= self.tile_width or y_in_tile >= self.tile_height:
+            return None
+        if self.n_tiles is not None and row * self.n_columns + column >= self.n_tiles:
+            return None
+
+        return column, row
+
+    def index_at(self, pos: tuple[float, float]) -> int | None:
+        """
+        Get the row major index of the tile under pos
+
+        Arguments:
+            pos -- screen position (x, y) as *tuple[float, float]*
+
+        Returns:
+            index of the tile as *int* or *None* if pos is not on a tile
+        """
+        cell = self.cell_at(pos)
+        if cell is None:
+            return None
+        return cell[1] * self.n_columns + cell[0]
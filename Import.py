@@ -0,0 +1,182 @@
+"""
+Import images onto the drawing board, mapping every pixel to the nearest palette colour
+
+The nearest colour is looked up in a table covering the RGB cube at a few bits per channel,
+built once per palette and cached on disk, so quantizing an image is a single gather
+"""
+import hashlib
+import os
+from functools import lru_cache
+
+import numpy as np
+
+from Canvas import Canvas
+from Color import PALETTE_RGB_ARRAY, TRANSPARENT_INDEX
+
+# bits per channel of the lookup table, 2 ** (3 * bits) entries of one byte
+LUT_BITS = 6
+# pixels less opaque than this are left unpainted
+ALPHA_THRESHOLD = 128
+# lookup table value of bins holding several palette colours, searched exactly
+LUT_AMBIGUOUS = 254
+
+
+def palette_key(bits: int = LUT_BITS) -> str:
+    """
+    Key of the lookup table, changes with the palette colours and the bits per channel
+
+    Keyword Arguments:
+        bits -- bits per channel, 1 to 8 (default: {LUT_BITS})
+
+    Returns:
+        hex digest as *str*
+    """
+    return hashlib.sha1(PALETTE_RGB_ARRAY.tobytes() + bytes([bits])).hexdigest()[:16]
+
+
+def build_palette_lut(bits: int = LUT_BITS, chunk: int = 32768) -> np.ndarray:
+    """
+    Nearest palette colour of the centre of every bin of the RGB cube
+
+    Bins holding a palette colour map to it, so drawings in palette colours import unchanged.
+    Bins holding several are LUT_AMBIGUOUS
+
+    Arguments:
+        bits -- bits per channel, 1 to 8 (default: {LUT_BITS})
+        chunk -- bins compared with the palette at a time (default: {32768})
+
+    Raises:
+        ValueError: if bits is out of range
+
+    Returns:
+        palette indices as flat *np.ndarray* of uint8, indexed by r << 2 * bits | g << bits | b
+    """
+    if not 1 <= bits <= 8:
+        raise ValueError(f'Bits per channel must be between 1 and 8, got {bits}')
+    shift = 8 - bits
+    levels = (np.arange(2 ** bits) << shift) + ((1 << shift) >> 1)
+    rgb = np.stack(np.meshgrid(levels, levels, levels, indexing='ij'), axis=-1).reshape(-1, 3).astype(np.float32)
+
+    # |c - p|^2 = |c|^2 - 2 c.p + |p|^2, the first term is the same for every palette colour
+    palette = PALETTE_RGB_ARRAY.astype(np.float32)
+    weights, norms = -2 * palette.T, (palette ** 2).sum(axis=1)
+    lut = np.empty(len(rgb), dtype=np.uint8)
+    for start in range(0, len(rgb), chunk):
+        lut[start:start + chunk] = (rgb[start:start + chunk] @ weights + norms).argmin(axis=1)
+
+    bins = _bins(PALETTE_RGB_ARRAY, bits)
+    counts = np.bincount(bins, minlength=len(lut))
+    lut[bins] = np.arange(len(bins))
+    lut[counts > 1] = LUT_AMBIGUOUS
+    return lut
+
+
+def _bins(pixels: np.ndarray, bits: int) -> np.ndarray:
+    shift = 8 - bits
+    rgb = pixels[..., :3] >> shift
+    return (rgb[..., 0].astype(np.intp) << 2 * bits) | (rgb[..., 1].astype(np.intp) << bits) | rgb[..., 2]
+
+
+@lru_cache(maxsize=None)
+def palette_lut(bits: int = LUT_BITS, cache_dir: str | None = None) -> np.ndarray:
+    """
+    Lookup table from build_palette_lut, built once per process and palette
+
+    Arguments:
+        bits -- bits per channel, 1 to 8 (default: {LUT_BITS})
+        cache_dir -- folder to keep the table in between runs, only in memory if *None* (default: {None})
+
+    Returns:
+        read only *np.ndarray* of uint8
+    """
+    path = os.path.join(cache_dir, f'palette_lut_{palette_key(bits)}.npy') if cache_dir is not None else None
+    lut = None
+    if path is not None and os.path.exists(path):
+        try:
+            lut = np.load(path, allow_pickle=False)
+        except (OSError, ValueError):
+            lut = None
+        # a truncated or foreign file is built again
+        if lut is not None and (lut.shape != (2 ** (3 * bits),) or lut.dtype != np.uint8
+                                or lut[lut != LUT_AMBIGUOUS].max() >= len(PALETTE_RGB_ARRAY)):
+            lut = None
+
+    if lut is None:
+        lut = build_palette_lut(bits)
+        if path is not None:
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+                tmp_path = f'{path}.tmp'
+                with open(tmp_path, 'wb') as f:
+                    np.save(f, lut)
+                os.replace(tmp_path, path)
+            except OSError:
+                pass # the cache only saves time, the table is still returned
+    lut.flags.writeable = False
+    return lut
+
+
+def quantize(pixels: np.ndarray, lut: np.ndarray, bits: int = LUT_BITS) -> np.ndarray:
+    """
+    Map pixels to the nearest palette colours
+
+    Arguments:
+        pixels -- RGB or RGBA *np.ndarray* of uint8, channels last
+        lut -- table from palette_lut for the same bits
+
+    Keyword Arguments:
+        bits -- bits per channel of lut (default: {LUT_BITS})
+
+    Returns:
+        palette indices as *np.ndarray* of uint8 in the shape of pixels without channels,
+        TRANSPARENT_INDEX where RGBA pixels are mostly transparent
+    """
+    indices = lut[_bins(pixels, bits)]
+    ambiguous = indices == LUT_AMBIGUOUS
+    if ambiguous.any():
+        rgb = pixels[ambiguous][:, :3].astype(np.int32)
+        indices[ambiguous] = ((rgb[:, None, :] - PALETTE_RGB_ARRAY.astype(np.int32)) ** 2).sum(axis=2).argmin(axis=1)
+    if pixels.shape[-1] == 4:
+        indices[pixels[..., 3] < ALPHA_THRESHOLD] = TRANSPARENT_INDEX
+    return indices
+
+
+def import_image(path: str, size: int, fit: bool = True, cache_dir: str | None = None, bits: int = LUT_BITS) -> Canvas:
+    """
+    Read an image file as palette indices on a transparent canvas, e.g. for a new layer
+
+    Arguments:
+        path -- image file in any format Pillow reads as *str*
+        size -- number of cells on one side of the drawing board as *int*
+
+    Keyword Arguments:
+        fit -- shrink larger images to fit the board, averaging the pixels of each cell.
+               Otherwise they are cropped at the top left (default: {True})
+        cache_dir -- folder of the cached lookup table, see palette_lut (default: {None})
+        bits -- bits per channel of the lookup table (default: {LUT_BITS})
+
+    Raises:
+        OSError: if the file cannot be read as an image
+
+    Returns:
+        *Canvas* with the image centred, transparent where the image does not reach
+    """
+    from PIL import Image # pylint: disable=import-outside-toplevel
+
+    with Image.open(path) as image:
+        if fit:
+            # JPEG decoders can shrink while decoding, much faster for photos
+            image.draft('RGB', (size, size))
+        image = image.convert('RGBA')
+    width, height = image.size
+    if fit and max(width, height) > size:
+        ratio = size / max(width, height)
+        width, height = max(1, round(width * ratio)), max(1, round(height * ratio))
+        image = image.resize((width, height), Image.Resampling.BOX)
+    width, height = min(width, size), min(height, size)
+
+    indices = quantize(np.asarray(image)[:height, :width], palette_lut(bits, cache_dir), bits)
+    data = np.full((size, size), TRANSPARENT_INDEX, dtype=np.uint8)
+    x, y = (size - width) // 2, (size - height) // 2
+    data[x:x + width, y:y + height] = indices.T
+    return Canvas(size, data, TRANSPARENT_INDEX)
@@ -0,0 +1,380 @@
+"""
+Stack of drawing layers, composited over white paper with NumPy
+"""
+from dataclasses import dataclass, field
+from itertools import count
+
+import numpy as np
+
+from Canvas import Canvas
+from Color import PALETTE_RGBA_LUT, TRANSPARENT_INDEX, WHITE_INDEX
+
+_layer_ids = count()
+
+
+@dataclass(eq=False)
+class Layer:
+    """
+    Canvas of one layer with its visibility and opacity
+
+    layer_id is kept by copies and by undo, so history entries find the layer again
+    """
+    canvas: Canvas
+    visible: bool = True
+    opacity: float = 1.0
+    layer_id: int = field(default_factory=lambda: next(_layer_ids))
+
+    def copy(self) -> 'Layer':
+        """
+        Copy of the layer that does not share data
+        """
+        return Layer(self.canvas.copy(), self.visible, self.opacity, self.layer_id)
+
+    def snapshot(self) -> 'Layer':
+        """
+        Read only copy of the layer, safe to hand to a background thread
+        """
+        return Layer(self.canvas.snapshot(), self.visible, self.opacity, self.layer_id)
+
+
+def _layer_colors(layer: Layer, region: tuple[slice, slice],
+                  lut: np.ndarray = PALETTE_RGBA_LUT) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Colour and opacity of the cells of a layer in a region
+
+    Returns:
+        RGB as uint8 and alpha between 0 and 1 as float32, both indexed [x, y, channel]
+    """
+    rgba = lut[layer.canvas.data[region]]
+    return rgba[..., :3], rgba[..., 3:] * np.float32(layer.opacity / 255)
+
+
+class LayerStack:
+    """
+    Layers of the same size, bottom first, one of which is active and painted on
+
+    The composite of the visible layers over white paper is cached as an RGB array indexed
+    [x, y], and only the regions that changed since the last update are composited again.
+
+    The layers below the active one are cached as a single RGB image, and the layers above it
+    as a premultiplied colour plus the fraction of the colour beneath they let through. Painting
+    on the active layer then costs the same however many layers there are. The caches are only
+    rebuilt when another layer changes or another layer becomes active
+    """
+    def __init__(self, layers: list[Layer], active: int = 0) -> None:
+        if not layers:
+            raise ValueError('A layer stack needs at least one layer')
+        if len({layer.canvas.size for layer in layers}) != 1:
+            raise ValueError('All layers of a stack must have the same size')
+        self.layers = layers
+        self.active = min(max(active, 0), len(layers) - 1)
+        # allocated on the first update, so copies and snapshots stay cheap
+        self.composite: np.ndarray | None = None
+        self._below: np.ndarray | None = None
+        self._above: np.ndarray | None = None
+        self._above_through: np.ndarray | None = None
+        # regions of the below and above caches to rebuild, and of the composite to redo
+        self._stale: list[tuple[int, int, int, int]] = []
+        self._changed: list[tuple[int, int, int, int]] = []
+        # counts the updates that changed the composite, e.g. to tell whether an image of the stack is current
+        self.version = 0
+
+    @classmethod
+    def from_canvas(cls, canvas: Canvas) -> 'LayerStack':
+        """
+        Stack with a single layer
+
+        Arguments:
+            canvas -- *Canvas* of the layer
+
+        Returns:
+            *LayerStack*
+        """
+        return cls([Layer(canvas)])
+
+    @property
+    def size(self) -> int:
+        """
+        Number of cells on one side of every layer
+        """
+        return self.layers[0].canvas.size
+
+    @property
+    def active_layer(self) -> Layer:
+        """
+        Layer that is painted on
+        """
+        return self.layers[self.active]
+
+    @property
+    def canvas(self) -> Canvas:
+        """
+        Canvas of the active layer
+        """
+        return self.layers[self.active].canvas
+
+    @property
+    def dirty(self) -> bool:
+        """
+        Whether the composite is out of date
+        """
+        return self.composite is None or bool(self._changed) or any(layer.canvas.dirty for layer in self.layers)
+
+    @property
+    def opaque(self) -> bool:
+        """
+        Whether every visible layer is fully opaque, so the stack flattens to palette indices
+        """
+        return all(layer.opacity >= 1 for layer in self.layers if layer.visible and layer.opacity)
+
+    def find(self, layer_id: int) -> Layer | None:
+        """
+        Get a layer by its layer_id
+
+        Arguments:
+            layer_id -- id of the layer as *int*
+
+        Returns:
+            *Layer* or *None* if the stack has no such layer
+        """
+        return next((layer for layer in self.layers if layer.layer_id == layer_id), None)
+
+    def add_layer(self, canvas: Canvas | None = None) -> Layer:
+        """
+        Add a layer above the active one and make it active
+
+        Keyword Arguments:
+            canvas -- painted *Canvas* of the layer, e.g. an imported image, a transparent one if *None* (default: {None})
+
+        Raises:
+            ValueError: if canvas does not match the size of the stack
+
+        Returns:
+            the new *Layer*
+        """
+        if canvas is None:
+            canvas = Canvas(self.size, blank_index=TRANSPARENT_INDEX)
+            canvas.pop_dirty() # nothing painted yet, the composite does not change
+        elif canvas.size != self.size:
+            raise ValueError(f'Canvas size {canvas.size} does not match layer size {self.size}')
+        layer = Layer(canvas)
+        self.layers.insert(self.active + 1, layer)
+        self.active += 1
+        self._restack(changed=False)
+        return layer
+
+    def remove_layer(self) -> Layer | None:
+        """
+        Remove the active layer, the one below it becomes active
+
+        Returns:
+            the removed *Layer*, or *None* if it is the only layer
+        """
+        if len(self.layers) == 1:
+            return None
+        layer = self.layers.pop(self.active)
+        self.active = max(0, self.active - 1)
+        self._restack(changed=True)
+        return layer
+
+    def select(self, index: int) -> bool:
+        """
+        Make another layer active
+
+        Arguments:
+            index -- position of the layer, clamped to the stack
+
+        Returns:
+            *True* if the active layer changed
+        """
+        index = min(max(index, 0), len(self.layers) - 1)
+        if index == self.active:
+            return False
+        self.active = index
+        self._restack(changed=False)
+        return True
+
+    def set_visible(self, visible: bool) -> None:
+        """
+        Show or hide the active layer
+
+        Arguments:
+            visible -- *True* to show the layer
+        """
+        self.active_layer.visible = visible
+        self._restack(changed=True)
+
+    def set_opacity(self, opacity: float) -> None:
+        """
+        Set the opacity of the active layer
+
+        Arguments:
+            opacity -- between 0 (invisible) and 1 (opaque), clamped
+        """
+        self.active_layer.opacity = min(max(opacity, 0.0), 1.0)
+        self._restack(changed=True)
+
+    def _restack(self, changed: bool) -> None:
+        full = (0, 0, self.size, self.size)
+        self._stale = [full]
+        if changed:
+            self._changed = [full]
+
+    def update(self) -> list[tuple[int, int, int, int]]:
+        """
+        Composite the regions changed since the last update
+
+        Returns:
+            regions of composite that changed as (x, y, width, height) in cells
+        """
+        full = (0, 0, self.size, self.size)
+        if self.composite is None:
+            self.composite = np.empty((self.size, self.size, 3), dtype=np.uint8)
+            self._changed = [full]
+        if self._below is None:
+            self._below = np.empty((self.size, self.size, 3), dtype=np.float32)
+            self._above = np.empty((self.size, self.size, 3), dtype=np.float32)
+            self._above_through = np.empty((self.size, self.size, 1), dtype=np.float32)
+            self._stale = [full]
+
+        # changes to the other layers go into the caches, changes to the active one only into the composite
+        others = [rect for i, layer in enumerate(self.layers) if i != self.active for rect in layer.canvas.pop_dirty()]
+        stale = self._clip(self._stale + others)
+        changed = self._clip(self._changed + others + self.canvas.pop_dirty())
+        self._stale, self._changed = [], []
+
+        for rect in [full] if full in stale else stale:
+            self._cache(rect)
+        changed = [full] if full in changed else changed
+        for rect in changed:
+            self._composite(rect)
+        if changed:
+            self.version += 1
+        return changed
+
+    def release_caches(self) -> None:
+        """
+        Free the caches of the layers below and above the active one, e.g. while the stack is not
+        being edited. The composite is kept and the caches are rebuilt on the next update
+        """
+        self._below = self._above = self._above_through = None
+
+    def _clip(self, rects: list[tuple[int, int, int, int]]) -> list[tuple[int, int, int, int]]:
+        clipped = []
+        for x, y, width, height in rects:
+            x0, y0 = max(x, 0), max(y, 0)
+            x1, y1 = min(x + width, self.size), min(y + height, self.size)
+            if x1 > x0 and y1 > y0:
+                clipped.append((x0, y0, x1 - x0, y1 - y0))
+        return clipped
+
+    def _cache(self, rect: tuple[int, int, int, int]) -> None:
+        x, y, width, height = rect
+        region = (slice(x, x + width), slice(y, y + height))
+
+        below = self._below[region]
+        below.fill(255)
+        for layer in self.layers[:self.active]:
+            if layer.visible and layer.opacity:
+                rgb, alpha = _layer_colors(layer, region)
+                below += (rgb - below) * alpha
+
+        above, through = self._above[region], self._above_through[region]
+        above.fill(0)
+        through.fill(1)
+        for layer in self.layers[self.active + 1:]:
+            if layer.visible and layer.opacity:
+                rgb, alpha = _layer_colors(layer, region)
+                above *= 1 - alpha
+                above += rgb * alpha
+                through *= 1 - alpha
+
+    def _composite(self, rect: tuple[int, int, int, int]) -> None:
+        x, y, width, height = rect
+        region = (slice(x, x + width), slice(y, y + height))
+        color = self._below[region]
+        if self.active_layer.visible and self.active_layer.opacity:
+            rgb, alpha = _layer_colors(self.active_layer, region)
+            color = color + (rgb - color) * alpha
+        self.composite[region] = np.rint(self._above[region] + self._above_through[region] * color)
+
+    def flatten(self) -> Canvas | None:
+        """
+        Canvas of the topmost painted cells of the visible layers, possible when they are all opaque
+
+        Returns:
+            *Canvas* with transparent cells where no visible layer is painted, or *None* if a
+            visible layer is partly transparent and blends colours outside the palette
+        """
+        if not self.opaque:
+            return None
+        visible = [layer for layer in self.layers if layer.visible and layer.opacity]
+        if len(visible) == 1:
+            return visible[0].canvas
+        return Canvas(self.size, self.flat_indices(), TRANSPARENT_INDEX)
+
+    def flat_indices(self, region: tuple[slice, slice] = (slice(None), slice(None))) -> np.ndarray:
+        """
+        Palette indices of the topmost painted cells of the visible layers in a region, see flatten
+
+        Keyword Arguments:
+            region -- cells as slices of the canvas data indexed [x, y] (default: {all cells})
+
+        Returns:
+            *np.ndarray* of uint8, shared with the layer when only one is visible, so read only
+        """
+        visible = [layer for layer in self.layers if layer.visible and layer.opacity]
+        if len(visible) == 1:
+            return visible[0].canvas.data[region]
+        data = np.full(self.layers[0].canvas.data[region].shape, TRANSPARENT_INDEX, dtype=np.uint8)
+        for layer in visible:
+            cells = layer.canvas.data[region]
+            np.copyto(data, cells, where=cells != TRANSPARENT_INDEX)
+        return data
+
+    def blend(self, transparent: bool = True, region: tuple[slice, slice] = (slice(None), slice(None))) -> np.ndarray:
+        """
+        Blend the visible layers into one image, for exporting stacks that do not flatten
+
+        Keyword Arguments:
+            transparent -- make white and unpainted cells transparent and return RGBA, otherwise
+                           blend over white paper and return RGB (default: {True})
+            region -- cells to blend as slices of the canvas data indexed [x, y] (default: {all cells})
+
+        Returns:
+            image as *np.ndarray* of uint8 indexed [x, y, channel]
+        """
+        lut = PALETTE_RGBA_LUT
+        if transparent: # white cells are transparent in exported images
+            lut = lut.copy()
+            lut[WHITE_INDEX, 3] = 0
+
+        shape = self.layers[0].canvas.data[region].shape
+        color = np.zeros(shape + (3,), dtype=np.float32)
+        through = np.ones(shape + (1,), dtype=np.float32)
+        for layer in self.layers:
+            if layer.visible and layer.opacity:
+                rgb, alpha = _layer_colors(layer, region, lut)
+                color *= 1 - alpha
+                color += rgb * alpha
+                through *= 1 - alpha
+
+        if not transparent:
+            return np.rint(color + through * 255).astype(np.uint8)
+        alpha = 1 - through
+        image = np.empty(shape + (4,), dtype=np.uint8)
+        image[..., :3] = np.rint(np.clip(color / np.maximum(alpha, 1e-6), 0, 255))
+        image[..., 3:] = np.rint(alpha * 255)
+        return image
+
+    def copy(self) -> 'LayerStack':
+        """
+        Copy of the stack that does not share data, layers keep their layer_id
+        """
+        return LayerStack([layer.copy() for layer in self.layers], self.active)
+
+    def snapshot(self) -> 'LayerStack':
+        """
+        Read only copy of the stack, safe to hand to a background thread
+        """
+        return LayerStack([layer.snapshot() for layer in self.layers], self.active)
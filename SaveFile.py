@@ -0,0 +1,416 @@
+"""
+Versioned binary save format for the drawing
+
+Layout, little endian:
+    header  -- magic b'PXLR', format version, compression, number of layers,
+               width, height, palette version, payload size
+    layers  -- since version 2, per layer from the bottom up: flags (1 visible, 2 active,
+               4 first layer of a frame, 8 first layer of the current frame), opacity 0 to 255
+               and the palette index of blank cells
+    payload -- palette indices of every layer in canvas order, raw, run length encoded or zlib compressed
+
+The number of layers counts the layers of all frames. Version 1 files hold a single layer without
+the layer table, the number of layers is 0. Version 2 files hold a single frame.
+Raw payloads are read straight from a memory map of the file
+"""
+import os
+import pickle
+import struct
+import zlib
+from glob import escape, glob
+
+import numpy as np
+
+from Canvas import Canvas
+from Color import PALETTE, TRANSPARENT_INDEX, WHITE_INDEX
+from Layers import Layer, LayerStack
+
+MAGIC = b'PXLR'
+FORMAT_VERSION = 3
+SUPPORTED_FORMAT_VERSIONS = (1, 2, 3)
+HEADER = struct.Struct('<4sBBHIIII')
+LAYER = struct.Struct('<BBB')
+LAYER_VISIBLE = 1
+LAYER_ACTIVE = 2
+LAYER_FRAME_START = 4
+LAYER_CURRENT_FRAME = 8
+PALETTE_VERSION = zlib.crc32(','.join(PALETTE).encode())
+
+COMPRESSION_NONE = 0
+COMPRESSION_RLE = 1
+COMPRESSION_ZLIB = 2
+COMPRESSIONS = {'none': COMPRESSION_NONE, 'rle': COMPRESSION_RLE, 'zlib': COMPRESSION_ZLIB}
+
+SAVE_FILE_EXTENSION = '.pxl'
+
+
+def rle_encode(indices: np.ndarray) -> bytes:
+    """
+    Run length encode a flat array of palette indices
+
+    Arguments:
+        indices -- flat *np.ndarray* of uint8
+
+    Returns:
+        run count as uint32, then one uint8 value and one uint32 length per run, as *bytes*
+    """
+    starts = np.flatnonzero(np.diff(indices, prepend=np.int16(-1)))
+    lengths = np.diff(starts, append=indices.size).astype('<u4')
+    return struct.pack('<I', starts.size) + indices[starts].tobytes() + lengths.tobytes()
+
+
+def rle_decode(payload: bytes | memoryview, n_cells: int) -> np.ndarray:
+    """
+    Decode a payload written by rle_encode
+
+    Arguments:
+        payload -- encoded runs as *bytes*
+        n_cells -- number of cells expected as *int*
+
+    Raises:
+        ValueError: if the payload is truncated or the runs do not cover exactly n_cells
+
+    Returns:
+        flat *np.ndarray* of uint8
+    """
+    if len(payload) < 4:
+        raise ValueError('Corrupt save file: run count is truncated')
+    (n_runs,) = struct.unpack_from('<I', payload)
+    values = np.frombuffer(payload, dtype=np.uint8, count=n_runs, offset=4)
+    lengths = np.frombuffer(payload, dtype='<u4', count=n_runs, offset=4 + n_runs)
+    if lengths.sum() != n_cells:
+        raise ValueError('Corrupt save file: run lengths do not match the canvas size')
+    return np.repeat(values, lengths)
+
+
+def file_crc(path: str, chunk: int = 1024 * 1024) -> int:
+    """
+    CRC-32 of the contents of a file, e.g. to tell whether a save file changed
+
+    Arguments:
+        path -- path to the file as *str*
+
+    Keyword Arguments:
+        chunk -- bytes read at a time (default: {1 MiB})
+
+    Returns:
+        CRC-32 as *int*
+    """
+    crc = 0
+    with open(path, 'rb') as f:
+        while block := f.read(chunk):
+            crc = zlib.crc32(block, crc)
+    return crc
+
+
+def read_header(path: str) -> dict[str, int]:
+    """
+    Read and validate the header of a save file
+
+    Arguments:
+        path -- path to the save file as *str*
+
+    Raises:
+        ValueError: if the file is not a save file or was written with another palette or format version
+
+    Returns:
+        header fields as *dict[str, int]*
+    """
+    with open(path, 'rb') as f:
+        raw = f.read(HEADER.size)
+    if len(raw) < HEADER.size:
+        raise ValueError(f'{path} is not a Pixlr save file')
+    magic, version, compression, n_layers, width, height, palette_version, payload_size = HEADER.unpack(raw)
+    if magic != MAGIC:
+        raise ValueError(f'{path} is not a Pixlr save file')
+    if version not in SUPPORTED_FORMAT_VERSIONS:
+        raise ValueError(f'{path} uses unsupported format version {version}')
+    if palette_version != PALETTE_VERSION:
+        raise ValueError(f'{path} was saved with a different palette')
+    if width != height:
+        raise ValueError(f'{path} holds a {width}x{height} canvas, only square canvases are supported')
+    if not width:
+        raise ValueError(f'{path} holds an empty canvas')
+    if version >= 2 and not n_layers:
+        raise ValueError(f'{path} holds no layers')
+    return {'version': version, 'compression': compression, 'n_layers': max(n_layers, 1),
+            'width': width, 'height': height, 'payload_size': payload_size}
+
+
+def write_frames(path: str, frames: list[LayerStack], current: int = 0, compression: str = 'none') -> None:
+    """
+    Write the frames of an animation to a save file, atomically replacing any existing file
+
+    Arguments:
+        path -- path to the save file as *str*
+        frames -- the frames as *list[LayerStack]* of the same size
+
+    Keyword Arguments:
+        current -- index of the frame shown when the file is loaded (default: {0})
+        compression -- 'none', 'rle' or 'zlib' (default: {'none'})
+
+    Raises:
+        ValueError: if there are no frames or they differ in size
+    """
+    if not frames or len({layers.size for layers in frames}) != 1:
+        raise ValueError('Save files need at least one frame, all of the same size')
+    table = b''.join(LAYER.pack(LAYER_VISIBLE * layer.visible | LAYER_ACTIVE * (i == layers.active)
+                                | (LAYER_FRAME_START | LAYER_CURRENT_FRAME * (n == current)) * (i == 0),
+                                round(layer.opacity * 255), layer.canvas.blank_index)
+                     for n, layers in enumerate(frames) for i, layer in enumerate(layers.layers))
+    all_layers = [layer for layers in frames for layer in layers.layers]
+    if len(all_layers) == 1:
+        indices = np.ascontiguousarray(all_layers[0].canvas.data).ravel()
+    else:
+        indices = np.concatenate([np.ascontiguousarray(layer.canvas.data).ravel() for layer in all_layers])
+    if COMPRESSIONS[compression] == COMPRESSION_RLE:
+        payload = rle_encode(indices)
+    elif COMPRESSIONS[compression] == COMPRESSION_ZLIB:
+        payload = zlib.compress(indices.tobytes())
+    else:
+        payload = indices.tobytes()
+
+    size = frames[0].size
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, COMPRESSIONS[compression], len(all_layers),
+                         size, size, PALETTE_VERSION, len(payload))
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        f.write(table)
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+
+def write_layers(path: str, layers: LayerStack, compression: str = 'none') -> None:
+    """
+    Write the layers to a save file, atomically replacing any existing file
+
+    Arguments:
+        path -- path to the save file as *str*
+        layers -- the drawing as *LayerStack*
+
+    Keyword Arguments:
+        compression -- 'none', 'rle' or 'zlib' (default: {'none'})
+    """
+    write_frames(path, [layers], 0, compression)
+
+
+def write_canvas(path: str, canvas: Canvas, compression: str = 'none') -> None:
+    """
+    Write a single canvas to a save file, atomically replacing any existing file
+
+    Arguments:
+        path -- path to the save file as *str*
+        canvas -- the drawing as *Canvas*
+
+    Keyword Arguments:
+        compression -- 'none', 'rle' or 'zlib' (default: {'none'})
+    """
+    write_layers(path, LayerStack.from_canvas(canvas), compression)
+
+
+def check_indices(indices: np.ndarray) -> None:
+    """
+    Raise ValueError if any cell is neither a palette index nor transparent
+
+    Arguments:
+        indices -- cells as *np.ndarray* of uint8
+
+    Raises:
+        ValueError: if a cell is out of range
+    """
+    invalid = (indices >= len(PALETTE)) & (indices != TRANSPARENT_INDEX)
+    if invalid.any():
+        raise ValueError('Corrupt save file: palette index out of range')
+
+
+def read_frames(path: str, copy: bool = True, check: bool = True) -> tuple[list[LayerStack], int]:
+    """
+    Read the frames of an animation from a save file through a memory map
+
+    Arguments:
+        path -- path to the save file as *str*
+
+    Keyword Arguments:
+        copy -- copy raw payloads into memory. If *False* the layers are backed by a copy on write
+                map of the file, which is not copied at all but keeps the file mapped (default: {True})
+        check -- check that every cell is a palette index or transparent. If *False* uncopied raw
+                 payloads are only read where the cells are used, and the caller checks those
+                 cells with check_indices (default: {True})
+
+    Raises:
+        ValueError: if the file is not a valid save file
+
+    Returns:
+        the frames as *list[LayerStack]* and the index of the current frame
+    """
+    header = read_header(path)
+    size, n_layers = header['width'], header['n_layers']
+    offset = HEADER.size
+    table = [(LAYER_VISIBLE, 255, WHITE_INDEX)] # version 1 files hold one plain canvas
+    if header['version'] >= 2:
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            raw = f.read(LAYER.size * n_layers)
+        if len(raw) != LAYER.size * n_layers:
+            raise ValueError('Corrupt save file: layer table is truncated')
+        table = list(LAYER.iter_unpack(raw))
+        check_indices(np.array([blank_index for _, _, blank_index in table]))
+        offset += len(raw)
+
+    n_cells = n_layers * size * size
+    if header['compression'] == COMPRESSION_NONE:
+        if header['payload_size'] != n_cells:
+            raise ValueError('Corrupt save file: payload does not match the canvas size')
+        data = np.memmap(path, dtype=np.uint8, mode='c', offset=offset, shape=(n_layers, size, size))
+        if check:
+            check_indices(data)
+        data = np.array(data) if copy else data
+    else:
+        payload = np.memmap(path, dtype=np.uint8, mode='r', offset=offset, shape=(header['payload_size'],))
+        if header['compression'] == COMPRESSION_RLE:
+            indices = rle_decode(memoryview(payload), n_cells)
+        elif header['compression'] == COMPRESSION_ZLIB:
+            try:
+                indices = np.frombuffer(zlib.decompress(payload), dtype=np.uint8)
+            except zlib.error as e:
+                raise ValueError(f'Corrupt save file: {e}') from e
+            if indices.size != n_cells:
+                raise ValueError('Corrupt save file: payload does not match the canvas size')
+        else:
+            raise ValueError(f'{path} uses unknown compression {header["compression"]}')
+        if check:
+            check_indices(indices)
+        data = indices.reshape(n_layers, size, size).copy()
+
+    # files before version 3 hold a single frame without frame flags
+    if header['version'] < 3:
+        table[0] = (table[0][0] | LAYER_FRAME_START, *table[0][1:])
+    if not table[0][0] & LAYER_FRAME_START:
+        raise ValueError('Corrupt save file: layer table does not start with a frame')
+
+    frames: list[LayerStack] = []
+    current = 0
+    layers: list[Layer] = []
+    active = 0
+    for i, (flags, opacity, blank_index) in enumerate(table):
+        if flags & LAYER_FRAME_START and layers:
+            frames.append(LayerStack(layers, active))
+            layers, active = [], 0
+        if flags & LAYER_CURRENT_FRAME:
+            current = len(frames)
+        if flags & LAYER_ACTIVE:
+            active = len(layers)
+        layers.append(Layer(Canvas(size, data[i], blank_index), bool(flags & LAYER_VISIBLE), opacity / 255))
+    frames.append(LayerStack(layers, active))
+    return frames, current
+
+
+def read_layers(path: str, copy: bool = True, check: bool = True) -> LayerStack:
+    """
+    Read the layers of the current frame from a save file through a memory map
+
+    Arguments:
+        path -- path to the save file as *str*
+
+    Keyword Arguments:
+        copy -- copy raw payloads into memory, see read_frames (default: {True})
+        check -- check every cell, see read_frames (default: {True})
+
+    Raises:
+        ValueError: if the file is not a valid save file
+
+    Returns:
+        *LayerStack*
+    """
+    frames, current = read_frames(path, copy, check)
+    return frames[current]
+
+
+def read_canvas(path: str, copy: bool = True) -> Canvas:
+    """
+    Read the active layer of a save file through a memory map, e.g. a file written by write_canvas
+
+    Arguments:
+        path -- path to the save file as *str*
+
+    Keyword Arguments:
+        copy -- copy raw payloads into memory, see read_layers (default: {True})
+
+    Raises:
+        ValueError: if the file is not a valid save file
+
+    Returns:
+        *Canvas*
+    """
+    return read_layers(path, copy).canvas
+
+
+def get_save_slot_path(save_slot: int) -> str:
+    """
+    Path of the save file for *save_slot*
+
+    Arguments:
+        save_slot -- index of the save slot as *int*
+
+    Returns:
+        file path as *str*
+    """
+    return f'save_{save_slot}{SAVE_FILE_EXTENSION}'
+
+
+def read_pickle_slot(path: str) -> Canvas:
+    """
+    Read a save_{n}.pkl slot written by older versions
+
+    Only read slots written by Pixlr itself, unpickling untrusted files is unsafe
+
+    Arguments:
+        path -- path to the pickle file as *str*
+
+    Raises:
+        ValueError: if the slot is empty, truncated or does not hold a square board of palette colours
+
+    Returns:
+        *Canvas*
+    """
+    try:
+        with open(path, 'rb') as f:
+            colors = pickle.load(f)
+        if len(colors) == 0:
+            raise ValueError(f'{path} holds an empty board')
+        canvas = Canvas(int(len(colors) ** 0.5))
+        canvas.load_colors(colors)
+    except (EOFError, pickle.UnpicklingError, AttributeError, ImportError, KeyError, TypeError) as e:
+        raise ValueError(f'{path} is not a Pixlr save slot: {e!r}') from e
+    return canvas
+
+
+def migrate_pickle_slots(directory: str = '.', compression: str = 'none') -> list[str]:
+    """
+    Convert save_{n}.pkl slots written by older versions into the binary format, once
+
+    The pickle files are kept, renamed with a .migrated suffix, so they are not converted again.
+    Only run this on slots written by Pixlr itself, unpickling untrusted files is unsafe
+
+    Keyword Arguments:
+        directory -- folder holding the save slots (default: {'.'})
+        compression -- compression of the new save files (default: {'none'})
+
+    Returns:
+        paths of the save files written as *list[str]*
+    """
+    migrated = []
+    for pkl_path in sorted(glob(os.path.join(escape(directory), 'save_*.pkl'))):
+        path = pkl_path[:-len('.pkl')] + SAVE_FILE_EXTENSION
+        if os.path.exists(path):
+            continue
+        try:
+            canvas = read_pickle_slot(pkl_path)
+        except ValueError: # broken or not a board, leave it for the user to inspect
+            continue
+        write_canvas(path, canvas, compression)
+        os.replace(pkl_path, f'{pkl_path}.migrated')
+        migrated.append(path)
+    return migrated
+
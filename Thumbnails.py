@@ -0,0 +1,120 @@
+"""
+Small previews of save files, cached on disk next to other files that only save time
+
+A thumbnail is a PNG tagged with its size and the size, modification time and CRC-32 of the
+save file it shows. It is reused while the size and time match, or while the contents match
+after the file was touched, and is only rendered again from the save file otherwise
+"""
+import hashlib
+import os
+
+import numpy as np
+
+from Canvas import Canvas
+from Layers import Layer, LayerStack
+from SaveFile import check_indices, file_crc, read_layers
+
+THUMBNAIL_TAG = 'pixlr-source'
+
+
+def thumbnail_path(save_path: str, cache_dir: str) -> str:
+    """
+    Path of the cached thumbnail of a save file
+
+    Arguments:
+        save_path -- path to the save file as *str*
+        cache_dir -- folder of the cached thumbnails as *str*
+
+    Returns:
+        file path as *str*
+    """
+    name = hashlib.sha1(os.path.abspath(save_path).encode()).hexdigest()[:16]
+    return os.path.join(cache_dir, f'thumbnail_{name}.png')
+
+
+def render_thumbnail(save_path: str, size: int = 32) -> np.ndarray:
+    """
+    Render the current frame of a save file over white paper, sampling every few cells of large drawings
+
+    Arguments:
+        save_path -- path to the save file as *str*
+
+    Keyword Arguments:
+        size -- largest width and height in pixels (default: {32})
+
+    Raises:
+        ValueError: if the file is not a valid save file
+
+    Returns:
+        RGB *np.ndarray* of uint8 indexed [x, y, channel], one pixel per sampled cell
+    """
+    # only the sampled cells of raw save files are read from the memory map, and only they are checked
+    layers = read_layers(save_path, copy=False, check=False)
+    step = -(-layers.size // size)
+    if step > 1:
+        layers = LayerStack([Layer(Canvas(-(-layers.size // step), np.ascontiguousarray(layer.canvas.data[::step, ::step]),
+                                          layer.canvas.blank_index), layer.visible, layer.opacity)
+                             for layer in layers.layers], layers.active)
+    for layer in layers.layers:
+        check_indices(layer.canvas.data)
+    return layers.blend(transparent=False)
+
+
+def load_thumbnail(save_path: str, cache_dir: str, size: int = 32) -> np.ndarray | None:
+    """
+    Get the thumbnail of a save file from the cache, rendering and caching it if it is out of date
+
+    Arguments:
+        save_path -- path to the save file as *str*
+        cache_dir -- folder of the cached thumbnails as *str*
+
+    Keyword Arguments:
+        size -- largest width and height in pixels (default: {32})
+
+    Raises:
+        ValueError: if the save file is not valid
+
+    Returns:
+        RGB *np.ndarray* of uint8 indexed [x, y, channel], or *None* if nothing is saved there
+    """
+    try:
+        stat = os.stat(save_path)
+    except FileNotFoundError:
+        return None
+    from PIL import Image # pylint: disable=import-outside-toplevel
+
+    path = thumbnail_path(save_path, cache_dir)
+
+    crc = None
+    try:
+        with Image.open(path) as image:
+            thumbnail_size, file_size, mtime_ns, cached_crc = (int(field) for field in image.text[THUMBNAIL_TAG].split(':'))
+            if thumbnail_size == size and file_size == stat.st_size:
+                if mtime_ns == stat.st_mtime_ns:
+                    return np.asarray(image.convert('RGB')).swapaxes(0, 1)
+                # touched or copied without changing, e.g. restored from a backup
+                crc = file_crc(save_path)
+                if crc == cached_crc:
+                    pixels = np.asarray(image.convert('RGB')).swapaxes(0, 1)
+                    _write_thumbnail(path, pixels, size, stat, crc)
+                    return pixels
+    except (OSError, KeyError, ValueError):
+        pass # missing or unreadable, render it again
+
+    pixels = render_thumbnail(save_path, size)
+    _write_thumbnail(path, pixels, size, stat, crc if crc is not None else file_crc(save_path))
+    return pixels
+
+
+def _write_thumbnail(path: str, pixels: np.ndarray, size: int, stat: os.stat_result, crc: int) -> None:
+    from PIL import Image, PngImagePlugin # pylint: disable=import-outside-toplevel
+
+    info = PngImagePlugin.PngInfo()
+    info.add_text(THUMBNAIL_TAG, f'{size}:{stat.st_size}:{stat.st_mtime_ns}:{crc}')
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.tmp'
+        Image.fromarray(np.ascontiguousarray(pixels.swapaxes(0, 1)), 'RGB').save(tmp_path, 'PNG', pnginfo=info)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass # the cache only saves time
@@ -1,5 +1,6 @@
 import pygame 
 from Color import Color
+from FontCache import render_text
 
 class Tile(pygame.Rect):
     def __init__(self, x, y, width, height, color):
@@ -15,49 +16,54 @@ class ColorTile(Tile):
     def __init__(self, x, y, width, height, color, text_color=None):
         super().__init__(x, y, width, height, color)
         self.text_color = text_color
-        self.font = pygame.font.SysFont(None, 36)
+        self.font_size = 36
 
     def draw(self, surface, selected_color) -> None:
         if self.color.name == 'WHITE':
-            pygame.draw.rect(surface, Color.BLACK, self)
-            pygame.draw.rect(surface, self.color, self.inflate(-2, -2))
+            pygame.draw.rect(surface, Color.BLACK.mapped(surface), self)
+            pygame.draw.rect(surface, self.color.mapped(surface), self.inflate(-2, -2))
         else:
-            pygame.draw.rect(surface, self.color, self)
+            pygame.draw.rect(surface, self.color.mapped(surface), self)
         if self.text_color:
-            text_surf = self.font.render(
-                self.color.name, True, self.text_color)
+            text_surf = render_text(self.color.name, self.font_size, self.text_color)
             text_rect = text_surf.get_rect(center=self.center)
             surface.blit(text_surf, text_rect)
 
         if selected_color == self.color:
-            pygame.draw.rect(surface, Color.BLACK, self.inflate(4, 4), 2)
+            self.draw_selection(surface)
+
+    def draw_selection(self, surface) -> None:
+        pygame.draw.rect(surface, Color.BLACK.mapped(surface), self.inflate(4, 4), 2)
 
 
 class DrawingTile(Tile):
-    def __init__(self, x, y, width, height, color=Color.WHITE, text_color=None):
+    def __init__(self, x, y, width, height, color=Color.WHITE, cell=(0, 0)):
         super().__init__(x, y, width, height, color)
-        self.text_color = text_color
-        self.font = pygame.font.SysFont(None, 36)
-
-    def draw(self, surface, capture=False) -> None:
-        if capture:
-            pygame.draw.rect(surface, self.color, self)
-        else:
-            pygame.draw.rect(surface, Color.LIGHT_METAL, self)
-            pygame.draw.rect(surface, self.color, self.inflate(-2, -2))
-
+        self.cell = cell
 
 
 class Button(Tile):
+    font_size = 16
+
     def __init__(self, x, y, width, height, color, text_color, text):
         super().__init__(x, y, width, height, color)
         self.text_color = text_color
         self.text = text
-        self.font = pygame.font.SysFont(None, 16)
+        self.thumbnail: pygame.Surface | None = None # drawn at the left, e.g. a preview of a save slot
 
     def draw(self, surface) -> None:
         if self.text_color and self.text:
-            pygame.draw.rect(surface, self.color, self, 1)
-            text_surf = self.font.render(self.text, True, self.text_color)
-            text_rect = text_surf.get_rect(center=self.center)
+            pygame.draw.rect(surface, self.color.mapped(surface), self, 1)
+            text_area = pygame.Rect(self)
+            if self.thumbnail is not None:
+                side = min(self.height, self.width // 2) - 6
+                if side > 0:
+                    thumbnail_rect = pygame.Rect(self.x + 3, self.y + 3, side, side)
+                    thumbnail_rect.centery = self.centery
+                    surface.blit(pygame.transform.scale(self.thumbnail, (side, side)), thumbnail_rect)
+                    pygame.draw.rect(surface, self.color.mapped(surface), thumbnail_rect.inflate(2, 2), 1)
+                    text_area.width -= thumbnail_rect.right - self.x
+                    text_area.left = thumbnail_rect.right
+            text_surf = render_text(self.text, self.font_size, self.text_color)
+            text_rect = text_surf.get_rect(center=text_area.center)
             surface.blit(text_surf, text_rect)
\ No newline at end of file
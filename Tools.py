@@ -0,0 +1,142 @@
+"""
+Vectorized canvas editing tools
+"""
+from enum import StrEnum
+
+import numpy as np
+
+
+class Tool(StrEnum):
+    """
+    Drawing tools, in the order they are cycled through
+    """
+    PEN = 'Pen'
+    ERASER = 'Eraser'
+    FILL = 'Fill'
+    FILL_8 = 'Fill (8-connected)'
+    REPLACE = 'Replace colour'
+
+    def next(self) -> 'Tool':
+        """
+        Tool after this one, wrapping around to the first
+        """
+        tools = list(Tool)
+        return tools[(tools.index(self) + 1) % len(tools)]
+
+
+def rasterize_polyline(xs: np.ndarray, ys: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Cells covered by a polyline through cell coordinates, 8-connected like Bresenham lines
+
+    All segments are rasterized at once, so the cost scales with the length of the line
+    rather than the number of points
+
+    Arguments:
+        xs -- columns of the points as *np.ndarray* of int
+        ys -- rows of the points as *np.ndarray* of int
+
+    Returns:
+        columns and rows of the cells along the line as *tuple[np.ndarray, np.ndarray]*
+    """
+    xs, ys = np.asarray(xs, dtype=np.int64), np.asarray(ys, dtype=np.int64)
+    dx, dy = np.diff(xs), np.diff(ys)
+    steps = np.maximum(np.abs(dx), np.abs(dy))
+
+    # one sample per step of every segment, t runs from 0 to steps - 1 within each segment
+    segment, t = _ranges(steps)
+    fraction = t / np.maximum(steps[segment], 1)
+
+    line_xs = np.append(xs[segment] + np.floor(fraction * dx[segment] + 0.5).astype(np.int64), xs[-1])
+    line_ys = np.append(ys[segment] + np.floor(fraction * dy[segment] + 0.5).astype(np.int64), ys[-1])
+    return line_xs, line_ys
+
+
+def _ranges(counts: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Flatten ranges of the given lengths
+
+    Returns:
+        owning range and position within it for every element, as *tuple[np.ndarray, np.ndarray]*
+    """
+    owner = np.repeat(np.arange(counts.size), counts)
+    return owner, np.arange(owner.size) - np.repeat(np.cumsum(counts) - counts, counts)
+
+
+def _column_runs(mask: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Runs of True cells along each column of a mask indexed [x, y]
+
+    Returns:
+        x, first y and last y + 1 of every run, ordered by x then y
+    """
+    starts = mask.copy()
+    starts[:, 1:] &= ~mask[:, :-1]
+    ends = mask.copy()
+    ends[:, :-1] &= ~mask[:, 1:]
+    run_xs, y0 = np.divmod(np.flatnonzero(starts), mask.shape[1])
+    return run_xs, y0, np.flatnonzero(ends) % mask.shape[1] + 1
+
+
+def flood_fill_cells(data: np.ndarray, cell: tuple[int, int], connectivity: int = 4) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Cells of the connected region with the same palette index as cell
+
+    Scanline fill over runs: the matching cells of every column are split into runs at once,
+    then the region grows from the run under cell a whole frontier at a time, finding the runs
+    touching the frontier in neighbouring columns with binary searches. There is no recursion
+    and no per cell Python work
+
+    Arguments:
+        data -- palette indices as *np.ndarray* indexed [x, y]
+        cell -- (x, y) the region starts from
+
+    Keyword Arguments:
+        connectivity -- 4 to join cells by their sides, 8 to also join them by their corners (default: {4})
+
+    Raises:
+        ValueError: if connectivity is not 4 or 8
+
+    Returns:
+        columns and rows of the region as *tuple[np.ndarray, np.ndarray]*
+    """
+    if connectivity not in (4, 8):
+        raise ValueError(f'connectivity must be 4 or 8, not {connectivity}')
+    run_xs, y0, y1 = _column_runs(data == data[cell])
+
+    # runs sorted by (x, y) as single keys, y shifted so that y0 - 1 and y1 + 1 stay in the column
+    stride = data.shape[1] + 3
+    start_keys = run_xs * stride + y0 + 1
+    end_keys = run_xs * stride + y1 + 1
+    reach = 1 if connectivity == 8 else 0
+
+    seed = np.searchsorted(start_keys, [cell[0] * stride + cell[1] + 1], side='right') - 1
+    in_region = np.zeros(run_xs.size, dtype=bool)
+    in_region[seed] = True
+    frontier = seed
+    while frontier.size:
+        # neighbours in the columns either side end after y0 - reach and start before y1 + reach
+        column = np.concatenate((run_xs[frontier] - 1, run_xs[frontier] + 1)) * stride
+        first = np.searchsorted(end_keys, column + np.tile(y0[frontier], 2) + 1 - reach, side='right')
+        last = np.searchsorted(start_keys, column + np.tile(y1[frontier], 2) + 1 + reach, side='left')
+        owner, offset = _ranges(np.maximum(last - first, 0))
+        frontier = first[owner] + offset
+        frontier = np.unique(frontier[~in_region[frontier]])
+        in_region[frontier] = True
+
+    # expand the runs back into cells
+    run, offset = _ranges((y1 - y0)[in_region])
+    return run_xs[in_region][run], y0[in_region][run] + offset
+
+
+def matching_cells(data: np.ndarray, cell: tuple[int, int]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Every cell with the same palette index as cell, connected or not
+
+    Arguments:
+        data -- palette indices as *np.ndarray* indexed [x, y]
+        cell -- (x, y) of a cell with the colour to match
+
+    Returns:
+        columns and rows of the matching cells as *tuple[np.ndarray, np.ndarray]*
+    """
+    return np.nonzero(data == data[cell])
@@ -0,0 +1,173 @@
+"""
+Zoomable and pannable view of the canvas on the drawing area
+"""
+import pygame
+
+from HitTest import GridHitTest
+
+
+class Viewport:
+    """
+    Maps canvas cells to screen pixels for a zoom level (cell_size) and pan offset
+
+    The board is drawn inside the drawing area, centred horizontally. When the zoomed board
+    is larger than the area only the cells overlapping board_rect are visible
+    """
+    min_cell_size: int = 1
+    max_cell_size: int = 64
+
+    def __init__(self, area: pygame.Rect, canvas_size: int, cell_size: int) -> None:
+        self.area = pygame.Rect(area)
+        self.canvas_size = canvas_size
+        self.default_cell_size = cell_size
+        self.cell_size = cell_size
+        self.offset_x = 0
+        self.offset_y = 0
+        self.update()
+
+    def update(self) -> None:
+        """
+        Recompute board_rect and hit testing after a zoom, pan or layout change
+        """
+        board_size = self.canvas_size * self.cell_size
+        width = min(board_size, self.area.width)
+        height = min(board_size, self.area.height)
+        self.offset_x = max(0, min(self.offset_x, board_size - width))
+        self.offset_y = max(0, min(self.offset_y, board_size - height))
+
+        self.board_rect = pygame.Rect(self.area.x + (self.area.width - width) // 2, self.area.y, width, height)
+        self.origin = (self.board_rect.x - self.offset_x, self.board_rect.y - self.offset_y)
+        self.hit_test = GridHitTest(
+            x=self.origin[0],
+            y=self.origin[1],
+            tile_width=self.cell_size,
+            tile_height=self.cell_size,
+            x_pitch=self.cell_size,
+            y_pitch=self.cell_size,
+            n_columns=self.canvas_size,
+            n_rows=self.canvas_size)
+
+    def set_area(self, area: pygame.Rect, cell_size: int) -> None:
+        """
+        Move the view to a new drawing area, e.g. after a window resize, keeping zoom and pan
+
+        Arguments:
+            area -- new drawing area as *pygame.Rect*
+            cell_size -- cell size in pixels that fits the board into the new area as *int*
+        """
+        scale = cell_size / self.default_cell_size
+        self.area = pygame.Rect(area)
+        self.default_cell_size = cell_size
+        self.cell_size = max(self.min_cell_size, min(self.max_cell_size, round(self.cell_size * scale)))
+        self.offset_x = round(self.offset_x * scale)
+        self.offset_y = round(self.offset_y * scale)
+        self.update()
+
+    def cell_at(self, pos: tuple[float, float]) -> tuple[int, int] | None:
+        """
+        Get the visible cell under pos
+
+        Arguments:
+            pos -- screen position (x, y) as *tuple[float, float]*
+
+        Returns:
+            (x, y) of the cell as *tuple[int, int]* or *None*
+        """
+        if not self.board_rect.collidepoint(pos):
+            return None
+        return self.hit_test.cell_at(pos)
+
+    def cell_coords(self, pos: tuple[float, float]) -> tuple[int, int]:
+        """
+        Cell coordinates of a screen position, without checking that the cell exists or is visible
+
+        Arguments:
+            pos -- screen position (x, y) as *tuple[float, float]*
+
+        Returns:
+            (x, y) of the cell as *tuple[int, int]*
+        """
+        return (int(pos[0]) - self.origin[0]) // self.cell_size, (int(pos[1]) - self.origin[1]) // self.cell_size
+
+    def cells_rect(self, x: int, y: int, width: int, height: int) -> pygame.Rect:
+        """
+        Visible screen region covered by a block of cells
+
+        Arguments:
+            x -- first column as *int*
+            y -- first row as *int*
+            width -- number of columns as *int*
+            height -- number of rows as *int*
+
+        Returns:
+            *pygame.Rect* clipped to board_rect, empty if the cells are not visible
+        """
+        return pygame.Rect(self.origin[0] + x * self.cell_size,
+                           self.origin[1] + y * self.cell_size,
+                           width * self.cell_size,
+                           height * self.cell_size).clip(self.board_rect)
+
+    def visible_cells(self, rect: pygame.Rect | None = None) -> tuple[int, int, int, int]:
+        """
+        Block of cells overlapping a screen region and the board
+
+        Keyword Arguments:
+            rect -- screen region, the whole board if *None* (default: {None})
+
+        Returns:
+            (x, y, width, height) in cells, width or height is 0 if nothing is visible
+        """
+        rect = self.board_rect.clip(rect) if rect is not None else self.board_rect
+        if not rect:
+            return 0, 0, 0, 0
+        x0 = (rect.left - self.origin[0]) // self.cell_size
+        y0 = (rect.top - self.origin[1]) // self.cell_size
+        x1 = (rect.right - 1 - self.origin[0]) // self.cell_size + 1
+        y1 = (rect.bottom - 1 - self.origin[1]) // self.cell_size + 1
+        return x0, y0, x1 - x0, y1 - y0
+
+    def zoom(self, steps: int, anchor: tuple[int, int]) -> bool:
+        """
+        Double or halve the cell size per step, keeping the cell under anchor in place when possible
+
+        Arguments:
+            steps -- positive to zoom in, negative to zoom out
+            anchor -- screen position (x, y) to zoom around, e.g. the cursor
+
+        Returns:
+            *True* if the zoom level changed
+        """
+        cell_size = self.cell_size * 2 ** steps if steps > 0 else self.cell_size // 2 ** -steps
+        cell_size = max(self.min_cell_size, min(self.max_cell_size, cell_size))
+        if cell_size == self.cell_size:
+            return False
+
+        # board pixel under the anchor, scaled to the new cell size
+        anchor_x = min(max(anchor[0], self.board_rect.left), self.board_rect.right) - self.origin[0]
+        anchor_y = min(max(anchor[1], self.board_rect.top), self.board_rect.bottom) - self.origin[1]
+        anchor_x, anchor_y = anchor_x * cell_size // self.cell_size, anchor_y * cell_size // self.cell_size
+        self.cell_size = cell_size
+        self.update()
+
+        # board_rect may have moved, e.g. a small board growing to fill the area
+        self.offset_x = anchor_x - (anchor[0] - self.board_rect.x)
+        self.offset_y = anchor_y - (anchor[1] - self.board_rect.y)
+        self.update()
+        return True
+
+    def pan(self, dx: int, dy: int) -> bool:
+        """
+        Move the view over the board
+
+        Arguments:
+            dx -- screen pixels to move right as *int*
+            dy -- screen pixels to move down as *int*
+
+        Returns:
+            *True* if the view moved
+        """
+        offset = (self.offset_x, self.offset_y)
+        self.offset_x += dx
+        self.offset_y += dy
+        self.update()
+        return offset != (self.offset_x, self.offset_y)
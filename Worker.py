@@ -0,0 +1,76 @@
+"""
+Background worker for disk I/O and image encoding
+"""
+import queue
+import threading
+from collections.abc import Callable, Hashable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+
+class BackgroundWorker:
+    """
+    Runs jobs on a single background thread so the main loop keeps drawing
+
+    Jobs are identified by a key. Submitting a key that is still waiting to run replaces
+    its arguments instead of queuing another job, so repeated requests coalesce to the latest.
+    Results are collected on the main thread with poll(). The optional notify callable is
+    called from the worker thread after each job, e.g. to wake up a loop waiting for events
+    """
+    def __init__(self, notify: Callable[[], None] | None = None) -> None:
+        self._notify = notify
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pixlr-worker')
+        self._lock = threading.Lock()
+        self._pending: dict[Hashable, tuple[Callable, tuple]] = {}
+        self._done: queue.SimpleQueue[tuple[Hashable, Any, Exception | None]] = queue.SimpleQueue()
+
+    def submit(self, key: Hashable, func: Callable, *args) -> bool:
+        """
+        Run func(*args) in the background
+
+        Arguments:
+            key -- identifies the job, e.g. ('save', slot)
+            func -- callable to run, must not touch pygame display state
+
+        Returns:
+            *True* if the job was merged into one already waiting with the same key
+        """
+        with self._lock:
+            coalesced = key in self._pending
+            self._pending[key] = (func, args)
+            if not coalesced:
+                self._executor.submit(self._run, key)
+        return coalesced
+
+    def _run(self, key: Hashable) -> None:
+        with self._lock:
+            func, args = self._pending.pop(key)
+        try:
+            result = func(*args)
+        except Exception as e: # pylint: disable=broad-exception-caught
+            self._done.put((key, None, e))
+        else:
+            self._done.put((key, result, None))
+        finally:
+            if self._notify is not None:
+                self._notify()
+
+    def poll(self) -> list[tuple[Hashable, Any, Exception | None]]:
+        """
+        Collect the jobs finished since the last call, to be called from the main loop
+
+        Returns:
+            (key, result, error) per finished job, error is *None* on success
+        """
+        finished = []
+        while True:
+            try:
+                finished.append(self._done.get_nowait())
+            except queue.Empty:
+                return finished
+
+    def shutdown(self) -> None:
+        """
+        Finish the submitted jobs and stop the worker thread
+        """
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,827 @@
+"""
+Benchmarks for Pixlr
+
+Runs headless, so it also works on CI machines without a display, and prints the
+results as JSON, e.g.
+
+    python benchmark.py --output benchmark.json
+    python benchmark.py --quick
+
+Exits with status 1 when the app takes longer than --startup-budget to draw its first frame
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import pickle
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1') # keep stdout clean for the JSON
+
+import numpy as np  # pylint: disable=wrong-import-position
+import pygame  # pylint: disable=wrong-import-position
+from PIL import Image  # pylint: disable=wrong-import-position
+
+from Autosave import Autosave, recover  # pylint: disable=wrong-import-position
+from Canvas import Canvas  # pylint: disable=wrong-import-position
+from Color import PALETTE, PALETTE_RGB_ARRAY, Color  # pylint: disable=wrong-import-position
+from Export import export_gif, export_png, export_sprite_sheet  # pylint: disable=wrong-import-position
+from GameConfig import GameConfig  # pylint: disable=wrong-import-position
+from GameUI import GameUI  # pylint: disable=wrong-import-position
+from History import History  # pylint: disable=wrong-import-position
+from Import import build_palette_lut, import_image, palette_lut, quantize  # pylint: disable=wrong-import-position
+from Layers import LayerStack  # pylint: disable=wrong-import-position
+from main import load_work, resize_window, save_captured_canvas, save_work  # pylint: disable=wrong-import-position
+from SaveFile import COMPRESSIONS, read_canvas, write_canvas, write_layers  # pylint: disable=wrong-import-position
+from Thumbnails import load_thumbnail, render_thumbnail  # pylint: disable=wrong-import-position
+
+# longest time from launching the app to its first frame on screen, in seconds
+STARTUP_BUDGET_S = 1.0
+# runs the app in a fresh interpreter and prints when the window showed, i.e. was first flipped, and
+# when the first frame was drawn
+FIRST_FRAME_SCRIPT = """
+import os, sys, time
+import pygame
+flip, update = pygame.display.flip, pygame.display.update
+times = {}
+def timed_flip(*args):
+    flip(*args)
+    times.setdefault('window', time.time())
+def timed_update(*args):
+    update(*args)
+    times['first_frame'] = time.time()
+    print(times.get('window', times['first_frame']), times['first_frame'])
+    sys.stdout.flush()
+    os._exit(0)
+pygame.display.flip, pygame.display.update = timed_flip, timed_update
+import main
+main.main()
+"""
+
+
+def legacy_add_alpha_channel_and_save_captured_drawing(surface: pygame.Surface, path: str) -> None:
+    """
+    Capture implementation prior to the vectorized export path, kept as a baseline
+
+    Arguments:
+        surface -- *pygame.Surface* object - image to be saved
+        path -- file path as *str* including file name and extension (png)
+    """
+    buffer = io.BytesIO()
+    pygame.image.save(surface, buffer, 'PNG')
+    buffer.seek(0)
+
+    img = Image.open(buffer).convert('RGBA')
+
+    data = img.getdata()
+    new_data = []
+
+    for pixel in data:
+        if pixel[0] == 255 and pixel[1] == 255 and pixel[2] == 255:
+            new_data.append((255, 255, 255, 0))
+        else:
+            new_data.append(pixel)
+
+    img.putdata(new_data)
+    img.save(path, 'PNG')
+
+
+def surfarray_add_alpha_channel_and_save_captured_drawing(surface: pygame.Surface, path: str) -> None:
+    """
+    Capture implementation prior to exporting straight from the canvas, kept as a baseline
+
+    White pixels are made transparent with a single mask over the surface pixels
+
+    Arguments:
+        surface -- *pygame.Surface* object - image to be saved
+        path -- file path as *str* including file name and extension (png)
+    """
+    rgb = pygame.surfarray.array3d(surface).transpose(1, 0, 2)
+    rgba = np.empty(rgb.shape[:2] + (4,), dtype=np.uint8)
+    rgba[..., :3] = rgb
+    rgba[..., 3] = np.where((rgb == 255).all(axis=2), 0, 255)
+    Image.fromarray(rgba, 'RGBA').save(path, 'PNG')
+
+
+def time_call(func, *args, repeat: int = 3) -> float:
+    """
+    Best wall time of *repeat* calls
+
+    Arguments:
+        func -- callable to time
+
+    Keyword Arguments:
+        repeat -- number of calls (default: {3})
+
+    Returns:
+        best time in seconds as *float*
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def time_frames(func, *args, frames: int = 30) -> dict[str, float]:
+    """
+    Per call wall time statistics over *frames* calls, e.g. one call per frame
+
+    Arguments:
+        func -- callable to time
+
+    Keyword Arguments:
+        frames -- number of calls (default: {30})
+
+    Returns:
+        median, 99th percentile and max in seconds as *dict[str, float]*
+    """
+    times = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        func(*args)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return {
+        'median_s': statistics.median(times),
+        'p99_s': times[min(len(times) - 1, int(len(times) * 0.99))],
+        'max_s': times[-1],
+    }
+
+
+def random_canvas(size: int, seed: int = 0) -> Canvas:
+    """
+    Canvas filled with random palette colors
+
+    Arguments:
+        size -- number of cells on one side as *int*
+
+    Keyword Arguments:
+        seed -- random seed (default: {0})
+
+    Returns:
+        *Canvas*
+    """
+    rng = np.random.default_rng(seed)
+    return Canvas(size, rng.integers(0, len(PALETTE), (size, size), dtype=np.uint8))
+
+
+def bench_alpha_export(grid_sizes: tuple[int, ...] = (8, 16, 22, 44), tile_size: int = 25) -> list[dict]:
+    """
+    Compare the legacy capture with the surfarray and canvas export paths
+
+    Keyword Arguments:
+        grid_sizes -- canvas sizes in cells (default: {(8, 16, 22, 44)})
+        tile_size -- pixels per cell (default: {25})
+
+    Returns:
+        one result per grid size as *list[dict]*
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'capture.png')
+        for size in grid_sizes:
+            canvas = random_canvas(size)
+            surface = pygame.surfarray.make_surface(canvas.to_rgba(tile_size)[..., :3].transpose(1, 0, 2))
+            results.append({
+                'grid_size': size,
+                'pixels': surface.get_width() * surface.get_height(),
+                'legacy_s': time_call(legacy_add_alpha_channel_and_save_captured_drawing, surface, path),
+                'surfarray_s': time_call(surfarray_add_alpha_channel_and_save_captured_drawing, surface, path),
+                'canvas_s': time_call(save_captured_canvas, canvas, path, tile_size),
+            })
+    return results
+
+
+def bench_export(grid_sizes: tuple[int, ...] = (16, 128, 1024), scales: tuple[int, ...] = (1, 8, 32),
+                 max_pixels: int = 64 * 1024 * 1024) -> list[dict]:
+    """
+    Time scaled PNG export from the canvas in RGBA and indexed mode
+
+    Keyword Arguments:
+        grid_sizes -- canvas sizes in cells (default: {(16, 128, 1024)})
+        scales -- pixels per cell (default: {(1, 8, 32)})
+        max_pixels -- skip outputs larger than this (default: {64 Mi})
+
+    Returns:
+        one result per grid size, scale and mode as *list[dict]*
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'export.png')
+        for size in grid_sizes:
+            canvas = sprite_canvas(size)
+            for scale in scales:
+                if (size * scale) ** 2 > max_pixels:
+                    continue
+                for indexed in (False, True):
+                    results.append({
+                        'grid_size': size,
+                        'scale': scale,
+                        'mode': 'indexed' if indexed else 'rgba',
+                        'export_s': time_call(export_png, canvas, path, scale, indexed, repeat=1),
+                        'bytes': os.path.getsize(path),
+                    })
+    return results
+
+
+def legacy_save_work(canvas: Canvas, path: str) -> None:
+    """
+    Pickle save format prior to the binary save files, kept as a baseline
+
+    Arguments:
+        canvas -- the drawing as *Canvas*
+        path -- file path as *str*
+    """
+    with open(path, 'wb') as f:
+        pickle.dump(canvas.to_colors(), f)
+
+
+def legacy_load_work(path: str) -> Canvas:
+    """
+    Load a pickle save file into a canvas, as the loop used to
+
+    Arguments:
+        path -- file path as *str*
+
+    Returns:
+        *Canvas*
+    """
+    with open(path, 'rb') as f:
+        colors = pickle.load(f)
+    canvas = Canvas(int(len(colors) ** 0.5))
+    canvas.load_colors(colors)
+    return canvas
+
+
+def sprite_canvas(size: int) -> Canvas:
+    """
+    Canvas resembling pixel art, mostly white with a few solid blocks
+
+    Arguments:
+        size -- number of cells on one side as *int*
+
+    Returns:
+        *Canvas*
+    """
+    canvas = random_canvas(size)
+    canvas.clear()
+    for i, color in enumerate(PALETTE[:8]):
+        canvas.fill(color, (i * size // 10, i * size // 12, size // 4, size // 5))
+    return canvas
+
+
+def bench_persistence(grid_sizes: tuple[int, ...] = (16, 128, 1024)) -> list[dict]:
+    """
+    Compare save/load time and file size of the pickle slots with the binary format
+
+    Keyword Arguments:
+        grid_sizes -- canvas sizes in cells (default: {(16, 128, 1024)})
+
+    Returns:
+        one result per grid size and format as *list[dict]*
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in grid_sizes:
+            canvas = sprite_canvas(size)
+            path = os.path.join(tmp, 'slot.pkl')
+            results.append({
+                'grid_size': size,
+                'format': 'pickle',
+                'save_s': time_call(legacy_save_work, canvas, path),
+                'load_s': time_call(legacy_load_work, path),
+                'bytes': os.path.getsize(path),
+            })
+            for compression in COMPRESSIONS:
+                path = os.path.join(tmp, f'slot_{compression}.pxl')
+                results.append({
+                    'grid_size': size,
+                    'format': compression,
+                    'save_s': time_call(write_canvas, path, canvas, compression),
+                    'load_s': time_call(read_canvas, path),
+                    'bytes': os.path.getsize(path),
+                })
+    return results
+
+
+def make_ui(app_width: int, grid_size: int) -> GameUI:
+    """
+    Build the UI for a window width and grid size, as the app does at startup
+
+    Arguments:
+        app_width -- window width as *int*
+        grid_size -- number of cells on one side of the drawing board as *int*
+
+    Returns:
+        *GameUI*
+    """
+    game_config = GameConfig.reset(app_width)
+    game_config.set_grid_size(grid_size)
+    return GameUI(game_config)
+
+
+def bench_ui(grid_sizes: tuple[int, ...] = (16, 128, 1024), app_widths: tuple[int, ...] = (665, 800, 1004),
+             frames: int = 30) -> list[dict]:
+    """
+    Time building the UI, switching the drawing board between grid sizes and drawing frames
+
+    Frames are timed as full redraws, as frames where one stroke of cells changed, and as idle
+    frames where nothing changed
+
+    Keyword Arguments:
+        grid_sizes -- canvas sizes in cells (default: {(16, 128, 1024)})
+        app_widths -- window widths in pixels (default: {(665, 800, 1004)})
+        frames -- frames timed per case (default: {30})
+
+    Returns:
+        one result per app width and grid size as *list[dict]*
+    """
+    results = []
+    for app_width in app_widths:
+        for size in grid_sizes:
+            construct_s = time_call(make_ui, app_width, size)
+            ui = make_ui(app_width, size)
+            canvas = sprite_canvas(size)
+            color = Color.from_index(0)
+            cells = iter(range(frames * 2))
+
+            def full_frame():
+                ui.invalidate()
+                ui.draw(color)
+
+            def stroke_frame():
+                i = next(cells)
+                ui.canvas.fill(color, (i % size, i * 7 % size, 3, 3))
+                ui.draw(color)
+
+            def switch_board(other_size=16 if size != 16 else 22):
+                ui.game_config.set_grid_size(other_size)
+                ui.reset_drawing_board()
+                ui.game_config.set_grid_size(size)
+                ui.reset_drawing_board(LayerStack.from_canvas(canvas))
+
+            results.append({
+                'app_width': ui.game_config.app_width,
+                'grid_size': size,
+                'construct_s': construct_s,
+                # switching to another grid size and back
+                'reset_drawing_board_s': time_call(switch_board) / 2,
+                'draw_full': time_frames(full_frame, frames=frames),
+                'draw_stroke': time_frames(stroke_frame, frames=frames),
+                'draw_idle': time_frames(ui.draw, color, frames=frames),
+            })
+    return results
+
+
+def bench_layers(grid_sizes: tuple[int, ...] = (16, 128, 1024), layer_counts: tuple[int, ...] = (1, 4, 16),
+                 frames: int = 30) -> list[dict]:
+    """
+    Time compositing layers, to check that painting costs the same however many layers there are
+
+    Frames paint a small block on the middle layer and composite it. Restacking rebuilds the
+    caches of the layers below and above after another layer becomes active
+
+    Keyword Arguments:
+        grid_sizes -- canvas sizes in cells (default: {(16, 128, 1024)})
+        layer_counts -- numbers of layers (default: {(1, 4, 16)})
+        frames -- frames timed per case (default: {30})
+
+    Returns:
+        one result per grid size and number of layers as *list[dict]*
+    """
+    results = []
+    for size in grid_sizes:
+        for n_layers in layer_counts:
+            layers = LayerStack.from_canvas(sprite_canvas(size))
+            for i in range(n_layers - 1):
+                layers.add_layer().canvas.fill(PALETTE[i % len(PALETTE)], (i, i, size // 2, size // 2))
+                layers.active_layer.opacity = 0.5
+            layers.update()
+            middle = n_layers // 2
+            cells = iter(range(frames * 2))
+
+            def stroke_frame():
+                i = next(cells)
+                layers.canvas.fill(Color.from_index(0), (i % size, i * 7 % size, 3, 3))
+                layers.update()
+
+            def restack():
+                layers.select(middle + 1 if layers.active == middle else middle)
+                layers.update()
+
+            layers.select(middle)
+            layers.update()
+            results.append({
+                'grid_size': size,
+                'layers': n_layers,
+                'restack_s': time_call(restack),
+                'composite_stroke': time_frames(stroke_frame, frames=frames),
+            })
+    return results
+
+
+def bench_animation(grid_sizes: tuple[int, ...] = (16, 128, 1024), frame_counts: tuple[int, ...] = (4, 16),
+                    frames: int = 30) -> list[dict]:
+    """
+    Time playing and exporting animations, with the peak memory Python allocates while exporting
+
+    Playback shows each frame on the board in turn. The first loop composites every frame once,
+    the loops after it only blit the cached frame images
+
+    Keyword Arguments:
+        grid_sizes -- canvas sizes in cells (default: {(16, 128, 1024)})
+        frame_counts -- numbers of animation frames (default: {(4, 16)})
+        frames -- playback steps timed per case (default: {30})
+
+    Returns:
+        one result per grid size and number of frames as *list[dict]*
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in grid_sizes:
+            for n_frames in frame_counts:
+                ui = make_ui(800, size)
+                ui.reset_drawing_board(LayerStack.from_canvas(sprite_canvas(size)))
+                ui.draw(Color.WHITE)
+                for i in range(n_frames - 1):
+                    ui.add_frame()
+                    ui.canvas.fill(Color.from_index(i % len(PALETTE)), (i, i, size // 4, size // 4))
+                    ui.draw(Color.WHITE)
+                steps = iter(range(n_frames + frames))
+
+                def play_step():
+                    ui.set_preview(ui.timeline.frames[next(steps) % n_frames])
+                    ui.draw(Color.WHITE)
+
+                first_loop = time_call(lambda: [play_step() for _ in range(n_frames)], repeat=1)
+                result = {
+                    'grid_size': size,
+                    'frames': n_frames,
+                    'first_loop_s': first_loop,
+                    'play_step': time_frames(play_step, frames=frames),
+                }
+
+                snapshot = ui.timeline.snapshot()
+                scale = max(1, min(8, 256 // size))
+                for name, export, path in (('gif', export_gif, 'animation.gif'),
+                                           ('sprite_sheet', export_sprite_sheet, 'animation.png')):
+                    path = os.path.join(tmp, path)
+                    tracemalloc.start()
+                    start = time.perf_counter()
+                    export(snapshot, path, scale)
+                    seconds = time.perf_counter() - start
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                    result[name] = {'scale': scale, 'seconds': seconds, 'peak_bytes': peak, 'bytes': os.path.getsize(path)}
+                results.append(result)
+    return results
+
+
+def bench_import(grid_sizes: tuple[int, ...] = (16, 128, 1024), image_size: int = 2048) -> dict:
+    """
+    Time building the palette lookup table and importing images through it
+
+    Keyword Arguments:
+        grid_sizes -- board sizes the image is shrunk to (default: {(16, 128, 1024)})
+        image_size -- width and height of the imported image in pixels (default: {2048})
+
+    Returns:
+        table times, quantizing throughput against a per pixel nearest colour search, and
+        import times per grid size as *dict*
+    """
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 256, (image_size, image_size, 3), dtype=np.uint8)
+    sample = pixels[:64].reshape(-1, 3).astype(np.int32)
+    palette = PALETTE_RGB_ARRAY.astype(np.int32)
+
+    def nearest_search():
+        ((sample[:, None, :] - palette[None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'image.png')
+        Image.fromarray(pixels).save(path)
+        build_s = time_call(build_palette_lut, repeat=1)
+        palette_lut.cache_clear()
+        palette_lut(cache_dir=tmp) # writes the table to the cache
+        cached_load_s = time_call(lambda: (palette_lut.cache_clear(), palette_lut(cache_dir=tmp)))
+        lut = palette_lut(cache_dir=tmp)
+        results = {
+            'lut_build_s': build_s,
+            'lut_cached_load_s': cached_load_s,
+            'quantize_pixels_per_s': pixels.shape[0] * pixels.shape[1] / time_call(quantize, pixels, lut),
+            'nearest_search_pixels_per_s': len(sample) / time_call(nearest_search),
+            'import': [{'grid_size': size, 'seconds': time_call(import_image, path, size, True, tmp)} for size in grid_sizes],
+        }
+        palette_lut.cache_clear()
+    return results
+
+
+def bench_autosave(grid_sizes: tuple[int, ...] = (16, 128, 1024), strokes: int = 200, cells_per_stroke: int = 50) -> list[dict]:
+    """
+    Time journaling painted cells, compacting them into a snapshot and recovering after a crash
+
+    Keyword Arguments:
+        grid_sizes -- canvas sizes in cells (default: {(16, 128, 1024)})
+        strokes -- strokes painted and journaled per grid size (default: {200})
+        cells_per_stroke -- cells painted per stroke (default: {50})
+
+    Returns:
+        one result per grid size as *list[dict]*
+    """
+    results = []
+    rng = np.random.default_rng(0)
+    for size in grid_sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            autosave = Autosave(tmp, compact_bytes=2 ** 62) # timed separately
+            frames = [LayerStack.from_canvas(sprite_canvas(size))]
+            history = History(journal=autosave)
+            autosave.compact(*autosave.start_compaction(frames, 0))
+            autosave.compaction_done()
+
+            flush_s = []
+            for i in range(strokes):
+                xs, ys = rng.integers(0, size, cells_per_stroke), rng.integers(0, size, cells_per_stroke)
+                history.paint_cells(frames[0], xs, ys, Color.from_index(i % len(PALETTE)))
+                start = time.perf_counter()
+                autosave.flush()
+                flush_s.append(time.perf_counter() - start)
+                history.end_stroke()
+
+            results.append({
+                'grid_size': size,
+                'flush_median_s': statistics.median(flush_s),
+                'flush_max_s': max(flush_s),
+                'journal_bytes': autosave.journal_bytes,
+                'recover_s': time_call(recover, tmp),
+                'compact_s': time_call(lambda: autosave.compact(*autosave.start_compaction(frames, 0))),
+            })
+            autosave.discard()
+    return results
+
+
+def bench_thumbnails(grid_sizes: tuple[int, ...] = (16, 128, 1024), layer_count: int = 4, size: int = 32) -> list[dict]:
+    """
+    Time rendering save slot thumbnails against loading them from the cache
+
+    Keyword Arguments:
+        grid_sizes -- canvas sizes in cells (default: {(16, 128, 1024)})
+        layer_count -- layers in the save file (default: {4})
+        size -- largest side of the thumbnails in pixels (default: {32})
+
+    Returns:
+        one result per grid size as *list[dict]*
+    """
+    results = []
+    for grid_size in grid_sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'save.pxl')
+            layers = LayerStack.from_canvas(sprite_canvas(grid_size))
+            for i in range(1, layer_count):
+                layers.add_layer(random_canvas(grid_size, seed=i))
+            write_layers(path, layers)
+            load_thumbnail(path, tmp, size) # writes the thumbnail to the cache
+            results.append({
+                'grid_size': grid_size,
+                'render_s': time_call(render_thumbnail, path, size),
+                'cached_load_s': time_call(load_thumbnail, path, tmp, size),
+            })
+    return results
+
+
+def bench_resize(app_widths: tuple[int, ...] = (665, 800, 1004), frames: int = 10) -> list[dict]:
+    """
+    Time handling VIDEORESIZE events, switching from the previous width to each width
+
+    Keyword Arguments:
+        app_widths -- window widths in pixels (default: {(665, 800, 1004)})
+        frames -- resizes timed per width (default: {10})
+
+    Returns:
+        one result per app width as *list[dict]*
+    """
+    results = []
+    ui = make_ui(app_widths[-1], 16)
+    for app_width in app_widths:
+        previous_width = ui.game_config.app_width
+
+        def resize():
+            resize_window(ui, previous_width, 0)
+            resize_window(ui, app_width, 0)
+            ui.draw(Color.WHITE)
+
+        timing = time_frames(resize, frames=frames)
+        results.append({
+            'app_width': app_width,
+            'from_width': previous_width,
+            # one resize is half of a round trip
+            **{key: value / 2 for key, value in timing.items()},
+        })
+    return results
+
+
+def bench_save_load(grid_sizes: tuple[int, ...] = (16, 128, 1024)) -> list[dict]:
+    """
+    Time saving to and loading from a save slot, as the app does
+
+    Keyword Arguments:
+        grid_sizes -- canvas sizes in cells (default: {(16, 128, 1024)})
+
+    Returns:
+        one result per grid size as *list[dict]*
+    """
+    results = []
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp) # save slots are written to the working directory
+        try:
+            for size in grid_sizes:
+                canvas = sprite_canvas(size)
+                results.append({
+                    'grid_size': size,
+                    'save_s': time_call(save_work, [LayerStack.from_canvas(canvas)], 0, 0),
+                    'load_s': time_call(load_work, 0),
+                })
+        finally:
+            os.chdir(cwd)
+    return results
+
+
+def startup_env() -> dict[str, str]:
+    """
+    Environment to run the app in a fresh interpreter, headless and importing from this folder
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [os.path.dirname(os.path.abspath(__file__)), env.get('PYTHONPATH')]))
+    return env
+
+
+def parse_importtime(stderr: str, module: str = 'main') -> tuple[float, list[dict]]:
+    """
+    Read the output of python -X importtime
+
+    Arguments:
+        stderr -- output of the interpreter as *str*
+
+    Keyword Arguments:
+        module -- module imported at the top level (default: {'main'})
+
+    Returns:
+        seconds to import module, and the modules it imports directly, slowest first
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        entries.append((len(name) - len(name.lstrip()), name.strip(), int(cumulative) / 1e6))
+
+    # children are listed before the module that imports them
+    end = next(i for i in range(len(entries) - 1, -1, -1) if entries[i][:2] == (1, module))
+    children = []
+    for depth, name, seconds in reversed(entries[:end]):
+        if depth == 1:
+            break
+        if depth == 3:
+            children.append({'module': name, 'seconds': seconds})
+    return entries[end][2], sorted(children, key=lambda child: child['seconds'], reverse=True)
+
+
+def bench_startup(runs: int = 3, budget_s: float = STARTUP_BUDGET_S) -> dict:
+    """
+    Time a cold start of the app in fresh interpreters: importing main, showing the window and
+    drawing the first frame
+
+    Keyword Arguments:
+        runs -- app launches timed (default: {3})
+        budget_s -- longest time to the first frame in seconds (default: {STARTUP_BUDGET_S})
+
+    Returns:
+        median times, the slowest imports of main and whether startup is within budget as *dict*
+    """
+    env = startup_env()
+    window_s, first_frame_s = [], []
+    with tempfile.TemporaryDirectory() as tmp:
+        # save slots and autosave files of the launched app go to the working directory
+        imports = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import main'], cwd=tmp, env=env,
+                                 capture_output=True, text=True, check=True)
+        for _ in range(runs):
+            start = time.time()
+            app = subprocess.run([sys.executable, '-c', FIRST_FRAME_SCRIPT], cwd=tmp, env=env,
+                                 capture_output=True, text=True, check=True)
+            window, first_frame = (float(field) for field in app.stdout.split()[-2:])
+            window_s.append(window - start)
+            first_frame_s.append(first_frame - start)
+
+    import_s, slowest = parse_importtime(imports.stderr)
+    return {
+        'import_main_s': import_s,
+        'slowest_imports': slowest[:8],
+        # Pillow is only needed to capture, export animations and import images
+        'pil_imported': 'PIL' in {line.rsplit('|', 1)[-1].strip() for line in imports.stderr.splitlines()},
+        'window_s': statistics.median(window_s),
+        'first_frame_s': statistics.median(first_frame_s),
+        'budget_s': budget_s,
+        'within_budget': statistics.median(first_frame_s) <= budget_s,
+    }
+
+
+def environment() -> dict[str, str]:
+    """
+    Versions and machine the benchmarks ran on, to compare results across releases
+
+    Returns:
+        *dict[str, str]*
+    """
+    return {
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'pygame': pygame.version.ver,
+        'numpy': np.__version__,
+        'sdl_videodriver': os.environ.get('SDL_VIDEODRIVER', ''),
+    }
+
+
+def run_benchmarks(grid_sizes: tuple[int, ...], app_widths: tuple[int, ...], frames: int,
+                   startup_budget_s: float = STARTUP_BUDGET_S) -> dict:
+    """
+    Run all benchmarks
+
+    Arguments:
+        grid_sizes -- canvas sizes in cells
+        app_widths -- window widths in pixels
+        frames -- frames timed per drawing case
+
+    Keyword Arguments:
+        startup_budget_s -- longest time to the first frame in seconds (default: {STARTUP_BUDGET_S})
+
+    Returns:
+        results keyed by benchmark, with the environment under 'environment', as *dict*
+    """
+    pygame.init()  # pylint: disable=no-member
+    # the app prints to stdout, keep it out of the JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        results = {
+            'environment': environment(),
+            'startup': bench_startup(budget_s=startup_budget_s),
+            'ui': bench_ui(grid_sizes, app_widths, frames),
+            'resize': bench_resize(app_widths, max(1, frames // 3)),
+            'layers': bench_layers(grid_sizes, frames=frames),
+            'animation': bench_animation(grid_sizes, frames=frames),
+            'import': bench_import(grid_sizes),
+            'autosave': bench_autosave(grid_sizes),
+            'thumbnails': bench_thumbnails(grid_sizes),
+            'alpha_export': bench_alpha_export(tuple(size for size in grid_sizes if size <= 64)),
+            'export': bench_export(grid_sizes),
+            'persistence': bench_persistence(grid_sizes),
+            'save_load': bench_save_load(grid_sizes),
+        }
+    pygame.quit()  # pylint: disable=no-member
+    return results
+
+
+def main() -> None:
+    """
+    Run the benchmarks and write the results as JSON
+    """
+    parser = argparse.ArgumentParser(description='Headless Pixlr benchmarks')
+    parser.add_argument('--grid-sizes', type=int, nargs='+', default=[16, 128, 1024], help='canvas sizes in cells')
+    parser.add_argument('--app-widths', type=int, nargs='+', default=[665, 800, 1004], help='window widths in pixels')
+    parser.add_argument('--frames', type=int, default=30, help='frames timed per drawing case')
+    parser.add_argument('--quick', action='store_true', help='one small sweep, e.g. as a smoke test')
+    parser.add_argument('--startup-budget', type=float, default=STARTUP_BUDGET_S,
+                        help='seconds to the first frame, exits with status 1 when startup is slower')
+    parser.add_argument('--output', help='JSON file to write, stdout if omitted')
+    args = parser.parse_args()
+
+    if args.quick:
+        args.grid_sizes, args.app_widths, args.frames = [16, 128], [665, 1004], 5
+    results = run_benchmarks(tuple(args.grid_sizes), tuple(args.app_widths), args.frames, args.startup_budget)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    startup = results['startup']
+    if not startup['within_budget']:
+        print(f"Startup took {startup['first_frame_s']:.3f} s, over the budget of {startup['budget_s']:.3f} s", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""
+Convert save files to PNG images without opening a window
+
+Converts in parallel across a process pool and reports throughput, e.g.
+
+    python convert.py saves/ --output-dir images --scale 8
+    python convert.py --slots 0 1 2 --indexed
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from glob import escape, glob
+
+from Export import MAX_SCALE, MIN_SCALE, export_png
+from Layers import LayerStack
+from SaveFile import SAVE_FILE_EXTENSION, get_save_slot_path, read_layers, read_pickle_slot
+
+
+def find_save_files(inputs: list[str]) -> list[str]:
+    """
+    Expand files, directories and glob patterns into save file paths
+
+    Arguments:
+        inputs -- paths as given on the command line
+
+    Returns:
+        sorted paths without duplicates as *list[str]*
+    """
+    paths = set()
+    for path in inputs:
+        if os.path.isdir(path):
+            for extension in (SAVE_FILE_EXTENSION, '.pkl'):
+                paths.update(glob(os.path.join(escape(path), f'*{extension}')))
+        elif os.path.exists(path):
+            paths.add(path)
+        else:
+            paths.update(glob(path))
+    return sorted(paths)
+
+
+def convert_file(path: str, output_dir: str, scale: int, indexed: bool) -> tuple[str, str, int, int]:
+    """
+    Convert one save file to a PNG image named after it, the current frame for animations
+
+    Arguments:
+        path -- save file, .pxl or a legacy .pkl slot
+        output_dir -- folder for the image as *str*
+        scale -- width and height of each cell in pixels as *int*
+        indexed -- save palette indices instead of RGBA, unless layers are partly transparent
+
+    Returns:
+        save file path, image path, number of cells and image size in bytes
+    """
+    if path.endswith('.pkl'):
+        layers = LayerStack.from_canvas(read_pickle_slot(path))
+    else:
+        layers = read_layers(path, copy=False)
+    name = os.path.splitext(os.path.basename(path))[0]
+    image_path = export_png(layers, os.path.join(output_dir, f'{name}.png'), scale, indexed=indexed)
+    return path, image_path, layers.size * layers.size, os.path.getsize(image_path)
+
+
+def _convert_file_or_error(args: tuple) -> tuple[str, str, int, int] | tuple[str, Exception]:
+    """
+    convert_file for the process pool, returning errors so one bad file does not stop the others
+    """
+    try:
+        return convert_file(*args)
+    except (OSError, ValueError) as e:
+        return args[0], e
+
+
+def convert_all(paths: list[str], output_dir: str, scale: int = 1, indexed: bool = False,
+                workers: int | None = None) -> dict:
+    """
+    Convert save files to PNG images across a process pool
+
+    Arguments:
+        paths -- save files as *list[str]*
+        output_dir -- folder for the images as *str*
+
+    Keyword Arguments:
+        scale -- width and height of each cell in pixels (default: {1})
+        indexed -- save palette indices instead of RGBA (default: {False})
+        workers -- number of processes, one per CPU if *None*, 1 converts in this process (default: {None})
+
+    Returns:
+        counts, errors and throughput as *dict*
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = [(path, output_dir, scale, indexed) for path in paths]
+    workers = workers or os.cpu_count() or 1
+
+    start = time.perf_counter()
+    if workers == 1 or len(jobs) <= 1:
+        results = list(map(_convert_file_or_error, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_convert_file_or_error, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+    seconds = time.perf_counter() - start
+
+    converted = [result for result in results if len(result) == 4]
+    n_cells = sum(result[2] for result in converted)
+    n_bytes = sum(result[3] for result in converted)
+    return {
+        'converted': len(converted),
+        'errors': [(result[0], str(result[1])) for result in results if len(result) == 2],
+        'cells': n_cells,
+        'bytes': n_bytes,
+        'seconds': seconds,
+        'files_per_s': len(converted) / seconds if seconds else 0.0,
+        'cells_per_s': n_cells / seconds if seconds else 0.0,
+        'workers': workers,
+    }
+
+
+def main() -> int:
+    """
+    Command line entry point
+
+    Returns:
+        exit code, 1 if any file failed to convert
+    """
+    parser = argparse.ArgumentParser(description='Convert Pixlr save files to PNG images')
+    parser.add_argument('inputs', nargs='*', help='save files, folders or glob patterns')
+    parser.add_argument('--slots', type=int, nargs='+', default=[], help='save slots in the working directory')
+    parser.add_argument('--output-dir', default='.', help='folder for the images (default: working directory)')
+    parser.add_argument('--scale', type=int, default=1, choices=range(MIN_SCALE, MAX_SCALE + 1), metavar=f'{{{MIN_SCALE}..{MAX_SCALE}}}',
+                        help='pixels per cell (default: 1)')
+    parser.add_argument('--indexed', action='store_true', help='write palette PNGs, much smaller than RGBA')
+    parser.add_argument('--workers', type=int, help='number of processes (default: one per CPU)')
+    args = parser.parse_args()
+
+    paths = find_save_files(args.inputs + [get_save_slot_path(slot) for slot in args.slots])
+    if not paths:
+        parser.error('no save files found')
+
+    report = convert_all(paths, args.output_dir, args.scale, args.indexed, args.workers)
+    for path, error in report['errors']:
+        print(f'{path}: {error}', file=sys.stderr)
+    print(f'Converted {report["converted"]} of {len(paths)} files in {report["seconds"]:.2f} s with {report["workers"]} workers: '
+          f'{report["files_per_s"]:.1f} files/s, {report["cells_per_s"] / 1e6:.2f} M cells/s, {report["bytes"] / 1e6:.2f} MB written')
+    return 1 if report['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,238 +1,403 @@
 """
 A pixel art designing app
 """
-import pickle
-import io
+import os
 from datetime import datetime
 
+import numpy as np
 import pygame
-from PIL import Image
 from Color import Color
-from Tiles import ColorTile, DrawingTile, Button
+from Canvas import Canvas
+from Tiles import ColorTile, DrawingTile
 from GameConfig import GameConfig
+from Animation import Timeline
+from Autosave import Autosave, recover
 from GameUI import GameUI
-
-
-def add_alpha_channel_and_save_captured_drawing(surface: pygame.Surface, path: str) -> None:
+from History import History
+from Import import import_image
+from Layers import LayerStack
+from Worker import BackgroundWorker
+from FrameTimer import FrameTimer, write_timings_csv
+from Export import export_gif, export_png, export_scale, export_sprite_sheet
+from SaveFile import get_save_slot_path, migrate_pickle_slots, read_frames, write_frames
+from Thumbnails import load_thumbnail
+from Tools import Tool, flood_fill_cells, matching_cells, rasterize_polyline
+
+
+def save_captured_canvas(canvas: Canvas | LayerStack, path: str, scale: int = 1, indexed: bool = False) -> str:
     """
-    Take a pygame.Surface object, add alpha channel and save it to a png image file
+    Save the canvas or its layers straight to a png image file, with white and unpainted cells made transparent
 
     Arguments:
-        surface -- *pygame.Surface* object - image to be saved
+        canvas -- the drawing as *Canvas* or *LayerStack*
         path -- file path as *str* including file name and extension (png)
+
+    Keyword Arguments:
+        scale -- width and height of each cell in pixels, 1 to 32 (default: {1})
+        indexed -- save palette indices instead of RGBA, for smaller files (default: {False})
+
+    Returns:
+        path of the saved image as *str*
     """
-    buffer = io.BytesIO()
-    pygame.image.save(surface, buffer, 'PNG')
-    buffer.seek(0)
+    return export_png(canvas, path, scale, indexed=indexed)
 
-    img = Image.open(buffer).convert('RGBA')
 
-    data = img.getdata()
-    new_data = []
+def export_animation(frames: list[LayerStack], path: str, scale: int = 1, fps: int = 8, indexed: bool = False) -> str:
+    """
+    Save the frames as a looping GIF and, next to it, as a PNG sprite sheet with the frames in a row
 
-    for pixel in data:
-        if pixel[0] == 255 and pixel[1] == 255 and pixel[2] == 255:
-            new_data.append((255, 255, 255, 0))
-        else:
-            new_data.append(pixel)
+    Arguments:
+        frames -- frames of the animation in order as *list[LayerStack]*
+        path -- file path of the GIF as *str* including file name and extension (gif)
 
-    img.putdata(new_data)
-    img.save(path, 'PNG')
+    Keyword Arguments:
+        scale -- width and height of each cell in pixels, 1 to 32 (default: {1})
+        fps -- frames per second (default: {8})
+        indexed -- save the sprite sheet as palette indices, for smaller files (default: {False})
 
+    Returns:
+        path of the saved GIF as *str*
+    """
+    export_gif(frames, path, scale, delay_ms=1000 // fps)
+    export_sprite_sheet(frames, f'{os.path.splitext(path)[0]}_sheet.png', scale, indexed=indexed)
+    return path
 
 
-def get_hover_tile(tiles: list[ColorTile] | list[DrawingTile], cursor_pos: tuple[float, float]) -> ColorTile | DrawingTile | None:
+def get_hover_tile(ui: GameUI, cursor_pos: tuple[float, float]) -> ColorTile | DrawingTile | None:
     """
-    Takes Tiles and a cursor position (x, y) as argument to determine which tile the cursor is hovering over
+    Takes the UI and a cursor position (x, y) as argument to determine which tile the cursor is hovering over
 
     Arguments:
-        tiles -- list of tiles as *list[ColorTile]* or *list[DrawingTile]*
+        ui -- *GameUI* holding the palette and drawing board
         cursor_pos -- cursor position as *tuple[float, float]*,
             for example, user can pass in event.pos from event.type == pygame.MOUSEMOTION
             where event is an event in pygame.event.get()
 
     Returns:
-        t -- tile where cursor is hovering over
+        tile where cursor is hovering over
     """
-    for t in tiles:
-        if t.collidepoint(cursor_pos):
-            return t
-    return None
+    return ui.get_hover_color_tile(cursor_pos) or ui.get_hover_drawing_tile(cursor_pos)
 
 
-def get_save_filename() -> str:
+def resize_window(ui: GameUI, app_width: int, active_save_slot: int) -> bool:
     """
-    Generate a filename based on current time
+    Lay the UI out again for a new window width, keeping the drawing and grid size
+
+    Arguments:
+        ui -- *GameUI* to lay out
+        app_width -- new window width as *int*
+        active_save_slot -- index of the highlighted save slot as *int*
 
     Returns:
-        filename to be used for saving a drawing as str
+        *True* if the layout changed, *False* if only the window size was restored
     """
-    now = datetime.now()
-    return f'drawing_{now.strftime("%Y%m%d_%H%M%S")}.png'
-
-
-def get_capture_rect(game_config: GameConfig) -> pygame.Rect:
+    game_config = GameConfig.reset(app_width, drawing_board_size=ui.game_config.drawing_board_size)
+    if game_config.app_width == ui.game_config.app_width:
+        # e.g. the width was clamped to the same layout, or only the height was dragged
+        if ui.screen.get_size() != (game_config.app_width, game_config.app_height):
+            ui.reset_window(game_config)
+        return False
+
+    ui.reset_window(game_config)
+    ui.reset_instruction_pane()
+    ui.reset_change_grid_size_label()
+    ui.reset_color_label()
+    ui.reset_msg_label()
+    ui.reset_timeline_label()
+    ui.reset_palette()
+    ui.reset_drawing_board()
+    ui.reset_save_slots(active_save_slot)
+    return True
+
+
+def get_save_filename(prefix: str = 'drawing', extension: str = 'png') -> str:
     """
-    Compute pygame.Rect for the drawing board area for capturing the drawing
+    Generate a filename based on current time
 
-    Arguments:
-        drawing_board_size -- number of tiles on one side of the square drawing board as *int*
+    Keyword Arguments:
+        prefix -- start of the filename (default: {'drawing'})
+        extension -- file extension (default: {'png'})
 
     Returns:
-        a *pygame.Rect* object representing the position of the drawing board
+        filename to be used for saving a drawing as str
     """
-    min_x = int(
-        (game_config.app_width - game_config.drawing_board_size * game_config.drawing_tile_size) / 2)
-    min_y = 150
-
-    capture_width = game_config.drawing_board_size * game_config.drawing_tile_size
-    capture_height = game_config.drawing_board_size * game_config.drawing_tile_size
-
-    return pygame.Rect(
-        min_x, min_y, capture_width, capture_height)
+    now = datetime.now()
+    return f'{prefix}_{now.strftime("%Y%m%d_%H%M%S")}.{extension}'
 
 
-def get_clicked_colour(event_pos: tuple[int, int], palette: list[ColorTile]) -> Color | None:
+def get_clicked_colour(event_pos: tuple[int, int], ui: GameUI) -> Color | None:
     """
     Get the selected colour from the colour palette based on event_pos, e.g. pygame.MOUSEBUTTONDOWN event
 
     Arguments:
         event_pos -- position of event (x, y) as *tuple[int, int]*, e.g. position of mouse click
-        palette -- tiles in the color palette as *list[ColorTile]*
+        ui -- *GameUI* holding the color palette
 
     Returns:
         The select colour as *Color* class or *None*
     """
-    for ct in palette:
-        if ct.is_clicked(event_pos):
-            return ct.color
+    if color_tile := ui.get_hover_color_tile(event_pos):
+        return color_tile.color
     return None
 
 
-def get_clicked_save_slot(event_pos: tuple[int, int], save_slots: list[Button]) -> int | None:
+def get_clicked_save_slot(event_pos: tuple[int, int], ui: GameUI) -> int | None:
     """
     Get the selected save slot based on event_pos, e.g. pygame.MOUSEBUTTONDOWN event
 
     Arguments:
         event_pos -- position of event (x, y) as *tuple[int, int]*, e.g. position of mouse click
-        save_slots -- the save slots as *list[Button]*
+        ui -- *GameUI* holding the save slots
 
     Returns:
         the save slot index or None
     """
-    for sl in save_slots:
-        if sl.is_clicked(event_pos):
-            return int(sl.text.split(' ')[1])
-    return None
+    return ui.get_hover_save_slot(event_pos)
 
 
-def save_work(drawing_board: list[DrawingTile], save_slot: int) -> None:
+def save_work(frames: list[LayerStack], current: int, save_slot: int) -> None:
     """
     Save the work in progress in *save_slot*
 
     Arguments:
-        drawing_board -- the tiles in the drawing board as *list[DrawingTile]*
+        frames -- the drawing as *list[LayerStack]*, one per animation frame
+        current -- index of the frame being edited as *int*
         save_slot -- index of the save slot to be used
     """
-    drawing_tile_colors = [dt.color for dt in drawing_board]
-    with open(f'save_{save_slot}.pkl', 'wb') as f:
-        pickle.dump(drawing_tile_colors, f)
+    write_frames(get_save_slot_path(save_slot), frames, current)
 
 
-def load_work(save_slot: int):
+def load_work(save_slot: int) -> tuple[list[LayerStack], int]:
     """
-    loading from pkl file for the *save_slot*
+    Load the work saved in *save_slot*
 
     Arguments:
         save_slot -- index of the save_slot as *int*
 
+    Raises:
+        FileNotFoundError: if nothing is saved in the slot
+        ValueError: if the save file is invalid
+
     Returns:
-        Pickle load data
+        the saved frames as *list[LayerStack]* and the index of the frame being edited
+    """
+    return read_frames(get_save_slot_path(save_slot))
+
+
+def show_layers(ui: GameUI, layers: LayerStack) -> None:
+    """
+    Show layers on the drawing board, switching the grid size to match them
+
+    Arguments:
+        ui -- *GameUI* to show the layers on
+        layers -- *LayerStack* to show, e.g. loaded from a save slot
+    """
+    ui.game_config.set_grid_size(layers.size)
+    ui.reset_change_grid_size_label()
+    ui.reset_drawing_board(layers)
+
+
+def show_timeline(ui: GameUI, timeline: Timeline) -> None:
+    """
+    Show the frames of an animation, switching the grid size to match them
+
+    Arguments:
+        ui -- *GameUI* to show the frames on
+        timeline -- *Timeline* to show, e.g. loaded from a save slot
+    """
+    ui.game_config.set_grid_size(timeline.size)
+    ui.reset_change_grid_size_label()
+    ui.reset_timeline(timeline)
+
+
+def paint_stroke(ui: GameUI, history: History, stroke_cells: list[tuple[int, int]], color: Color, tool: Tool) -> None:
     """
-    with open(f'save_{save_slot}.pkl', 'rb') as f:
-        return pickle.load(f)
+    Paint the cells along a stroke in one go, joining consecutive cursor positions with straight lines
 
+    Arguments:
+        ui -- *GameUI* holding the layers and viewport
+        history -- *History* recording the stroke
+        stroke_cells -- cell coordinates under the cursor in order, may lie outside the board
+        color -- *Color* to paint with
+        tool -- Tool.PEN to paint with color, Tool.ERASER to make the cells transparent
+    """
+    xs, ys = rasterize_polyline(*np.array(stroke_cells).T)
+    x0, y0, width, height = ui.viewport.visible_cells()
+    visible = (xs >= x0) & (xs < x0 + width) & (ys >= y0) & (ys < y0 + height)
+    if visible.any():
+        history.paint_cells(ui.layers, xs[visible], ys[visible], None if tool == Tool.ERASER else color)
+
+
+def fill_region(ui: GameUI, history: History, cell: tuple[int, int], color: Color, tool: Tool) -> None:
+    """
+    Bucket fill from a cell of the active layer as a single undo step
 
-def clear_image(drawing_board: list[DrawingTile]) -> list[DrawingTile]:
+    Arguments:
+        ui -- *GameUI* holding the layers
+        history -- *History* recording the fill
+        cell -- (x, y) of the clicked cell
+        color -- *Color* to fill with
+        tool -- Tool.FILL or Tool.FILL_8 for the connected region, Tool.REPLACE for every cell of the same colour
     """
-    Clear the drawing board
+    if tool == Tool.REPLACE:
+        xs, ys = matching_cells(ui.canvas.data, cell)
+    else:
+        xs, ys = flood_fill_cells(ui.canvas.data, cell, connectivity=8 if tool == Tool.FILL_8 else 4)
+    history.end_stroke()
+    history.paint_cells(ui.layers, xs, ys, color)
+    history.end_stroke()
+
+
+def clear_image(canvas: Canvas) -> Canvas:
+    """
+    Clear a layer of the drawing board
 
     Arguments:
-        drawing_board -- the drawing tiles in the drawing board as *list[DrawingTile]*
+        canvas -- the drawing as *Canvas*
 
     Returns:
-        cleared drawing board as list[drawing_board]
+        cleared canvas as *Canvas*
     """
-    for dt in drawing_board:
-        dt.color = Color.WHITE
-    return drawing_board
+    canvas.clear()
+    return canvas
 
 
 def main():
     """
     main function
     """
+    migrate_pickle_slots()
+
     game_config = GameConfig(app_width = 800)
     ui = GameUI(game_config)
 
     clock: pygame.time.Clock = pygame.time.Clock()
+    # finished jobs post an event, so an idle loop waiting for events wakes up to collect them
+    worker_done_event = pygame.event.custom_type()
+    worker = BackgroundWorker(notify=lambda: pygame.event.post(pygame.event.Event(worker_done_event)))
+    # painted cells are journaled as they change, so the work survives a crash
+    autosave = Autosave(game_config.autosave_dir, game_config.autosave_compact_bytes)
+    if (recovered := recover(game_config.autosave_dir)) is not None:
+        show_timeline(ui, Timeline(*recovered, game_config.history_max_bytes))
+        ui.reset_msg_label('Recovered your unsaved work!')
+    ui.timeline.journal = autosave
+    # previews of the save slots are requested once the first frame is on screen
+    thumbnails_requested = False
+    # per phase frame timings, Ctrl + Shift + P or PIXLR_FRAME_TIMING=1 to switch on
+    frame_timer = FrameTimer(('events', 'actions', 'draw', 'display', 'worker'),
+                             enabled=os.environ.get('PIXLR_FRAME_TIMING') == '1')
 
     active_save_slot: int = 0
     active_color: Color = Color.WHITE
+    active_tool: Tool = Tool.PEN
     running = True
     capture_drawing = False
     clearing_image = False
     saving_work = False
     loading_work = False
+    exporting_animation = False
+
+    # frame shown by the playing animation and when it was shown, None when not playing
+    playing: tuple[int, int] | None = None
+
+    # cells under the cursor while painting, collected over a frame and painted together.
+    # The first one was already painted and joins the stroke to the previous frame
+    stroke_cells: list[tuple[int, int]] = []
+
+    # width of the latest resize event and when it came in, applied once resizing pauses
+    pending_resize: tuple[int, int] | None = None
 
     while running:
-        for event in pygame.event.get():
+        # every frame keeps its own undo history
+        history = ui.timeline.history
+        frame_ms = 1000 // ui.game_config.animation_fps
+
+        # nothing to redraw, sleep until an event arrives instead of redrawing at 60 FPS
+        idle_timeout = ui.game_config.idle_timeout_ms
+        if pending_resize is not None:
+            idle_timeout = max(1, ui.game_config.resize_debounce_ms - (pygame.time.get_ticks() - pending_resize[1]))
+        if playing is not None:
+            idle_timeout = max(1, min(idle_timeout, frame_ms - (pygame.time.get_ticks() - playing[1])))
+        events = [] if ui.needs_redraw else [pygame.event.wait(idle_timeout)]
+
+        frame_timer.start_frame()
+        hover_pos: tuple[int, int] | None = None
+        for event in events + pygame.event.get():
+            # paint what was collected so far before anything else touches the canvas
+            if len(stroke_cells) > 1 and event.type in (pygame.VIDEORESIZE, pygame.KEYDOWN): # pylint: disable=no-member
+                paint_stroke(ui, history, stroke_cells, active_color, active_tool)
+                stroke_cells = stroke_cells[-1:]
+
+            # clicking or any other key stops the animation, back to the frame being edited
+            if playing is not None and (event.type == pygame.MOUSEBUTTONDOWN or # pylint: disable=no-member
+                                        (event.type == pygame.KEYDOWN and event.key != pygame.K_SPACE)): # pylint: disable=no-member
+                playing = None
+                ui.set_preview(None)
+
             if event.type == pygame.QUIT: # pylint: disable=no-member
                 running = False
 
+            # dragging the window edge sends many resizes, only the last one is applied
             elif event.type == pygame.VIDEORESIZE: # pylint: disable=no-member
-                app_width, _ = event.w, event.h
-                ui.reset_window(GameConfig.reset(app_width))
-                ui.reset_instruction_pane()
-                ui.reset_change_grid_size_label()
-                ui.reset_color_label()
-                ui.reset_msg_label()
-                ui.reset_palette()
-                ui.reset_drawing_board(ui.drawing_board)
-                ui.reset_save_slots(active_save_slot)
+                pending_resize = (event.w, pygame.time.get_ticks())
+
+            # zoom the drawing board around the cursor
+            elif event.type == pygame.MOUSEWHEEL: # pylint: disable=no-member
+                ui.zoom(event.y, pygame.mouse.get_pos())
+
+            # pan the drawing board by dragging with the right mouse button
+            elif event.type == pygame.MOUSEMOTION and event.buttons[2]: # pylint: disable=no-member
+                ui.pan(-event.rel[0], -event.rel[1])
 
             # select colour or colouring in
-            elif event.type == pygame.MOUSEBUTTONDOWN or pygame.mouse.get_pressed()[0]: # pylint: disable=no-member
-                # select colour
-                if clicked_color := get_clicked_colour(event.pos, ui.palette):
+            elif (event.type == pygame.MOUSEBUTTONDOWN and event.button == 1) or (event.type == pygame.MOUSEMOTION and event.buttons[0]): # pylint: disable=no-member
+                # select colour, cells collected before are painted with the previous one
+                if clicked_color := get_clicked_colour(event.pos, ui):
+                    if len(stroke_cells) > 1:
+                        paint_stroke(ui, history, stroke_cells, active_color, active_tool)
+                        stroke_cells = stroke_cells[-1:]
                     active_color = clicked_color
 
-                # colour in
-                for dt in ui.drawing_board:
-                    if dt.is_clicked(event.pos):
-                        dt.color = active_color
-                        break
+                # fill the region under the cursor
+                if active_tool not in (Tool.PEN, Tool.ERASER):
+                    if event.type == pygame.MOUSEBUTTONDOWN and (cell := ui.viewport.cell_at(event.pos)) is not None: # pylint: disable=no-member
+                        fill_region(ui, history, cell, active_color, active_tool)
+
+                # colour in, a new stroke starts on button down
+                else:
+                    cell = ui.viewport.cell_coords(event.pos)
+                    if event.type == pygame.MOUSEBUTTONDOWN or not stroke_cells: # pylint: disable=no-member
+                        if len(stroke_cells) > 1:
+                            paint_stroke(ui, history, stroke_cells, active_color, active_tool)
+                        history.end_stroke()
+                        stroke_cells = [cell, cell]
+                    elif cell != stroke_cells[-1]:
+                        stroke_cells.append(cell)
 
                 # select save slot
-                clicked_save_slot = get_clicked_save_slot(event.pos, ui.save_slots)
+                clicked_save_slot = get_clicked_save_slot(event.pos, ui)
                 if clicked_save_slot is not None:
                     active_save_slot = clicked_save_slot
                     ui.reset_save_slots(active_save_slot)
 
                 ui.reset_msg_label()
 
-            elif event.type == pygame.MOUSEMOTION: # pylint: disable=no-member
-                hover_tile: ColorTile | DrawingTile | None = None
-                # check if mouse is hovering over color palette tiles
-                if color_tile := get_hover_tile(ui.palette, event.pos):
-                    hover_tile = color_tile
+            # finish the stroke as one undo step
+            elif event.type == pygame.MOUSEBUTTONUP and event.button == 1: # pylint: disable=no-member
+                if len(stroke_cells) > 1:
+                    paint_stroke(ui, history, stroke_cells, active_color, active_tool)
+                history.end_stroke()
+                stroke_cells = []
 
-                # check if mouse is hovering over drawing tiles
-                elif drawing_tile := get_hover_tile(ui.drawing_board, event.pos):
-                    hover_tile = drawing_tile
+            elif event.type == pygame.MOUSEMOTION: # pylint: disable=no-member
+                # only the latest position matters for the hover label
+                hover_pos = event.pos
 
-                # update color label with hover tile color
-                ui.reset_color_label(hover_tile)
+            # import an image dropped on the window as a new layer
+            elif event.type == pygame.DROPFILE: # pylint: disable=no-member
+                worker.submit(('import', event.file), import_image, event.file, ui.layers.size, True,
+                              ui.game_config.cache_dir)
+                ui.reset_msg_label('Importing image...')
 
             elif event.type == pygame.KEYDOWN: # pylint: disable=no-member
                 # mod key set up
@@ -242,10 +407,30 @@ def main():
 
                 # change grid size
                 if event.key == pygame.K_g and ctrl_shift: # pylint: disable=no-member
-                    ui.game_config.next_grid_size()
-                    ui.reset_change_grid_size_label()
-                    ui.reset_drawing_board()
-                    keydown_match_message = 'Grid changed!'
+                    if len(ui.timeline.frames) > 1:
+                        keydown_match_message = 'Cannot change the grid of an animation!'
+                    else:
+                        previous_layers = ui.layers
+                        ui.game_config.next_grid_size()
+                        ui.reset_change_grid_size_label()
+                        ui.reset_drawing_board()
+                        history.commit_layers(previous_layers, ui.layers)
+                        keydown_match_message = 'Grid changed!'
+
+                # undo: Ctrl + Z, redo: Ctrl + Y or Ctrl + Shift + Z
+                elif event.key in (pygame.K_z, pygame.K_y) and (ctrl or ctrl_shift): # pylint: disable=no-member
+                    undo = event.key == pygame.K_z and ctrl # pylint: disable=no-member
+                    restored_layers = history.undo(ui.layers) if undo else history.redo(ui.layers)
+                    if restored_layers is None:
+                        keydown_match_message = 'Nothing to undo!' if undo else 'Nothing to redo!'
+                    elif restored_layers.size != ui.timeline.size and len(ui.timeline.frames) > 1:
+                        # a grid change from before the frames were added, put it back
+                        _ = history.redo(restored_layers) if undo else history.undo(restored_layers)
+                        keydown_match_message = 'Cannot change the grid of an animation!'
+                    else:
+                        if restored_layers is not ui.layers:
+                            show_layers(ui, restored_layers)
+                        keydown_match_message = 'Undone!' if undo else 'Redone!'
 
                 # save image
                 elif event.key == pygame.K_s and ctrl: # only ctrl and not other modifiers # pylint: disable=no-member
@@ -262,72 +447,249 @@ def main():
                     keydown_match_message = 'Loading your work...'
                     loading_work = True
 
-                # clearing the grid
+                # switch between pen, eraser, fill and replace
+                elif event.key == pygame.K_b and ctrl: # pylint: disable=no-member
+                    active_tool = active_tool.next()
+                    keydown_match_message = f'Tool: {active_tool}'
+
+                # add a transparent layer above the active one
+                elif event.key == pygame.K_l and ctrl: # pylint: disable=no-member
+                    previous_layers = ui.layers.copy()
+                    ui.layers.add_layer()
+                    history.commit_layers(previous_layers, ui.layers)
+                    ui.reset_timeline_label()
+                    keydown_match_message = 'Layer added!'
+
+                # delete the active layer
+                elif event.key == pygame.K_d and ctrl: # pylint: disable=no-member
+                    previous_layers = ui.layers.copy()
+                    if ui.layers.remove_layer() is None:
+                        keydown_match_message = 'Cannot delete the only layer!'
+                    else:
+                        history.commit_layers(previous_layers, ui.layers)
+                        ui.reset_timeline_label()
+                        keydown_match_message = 'Layer deleted!'
+
+                # show or hide the active layer
+                elif event.key == pygame.K_h and ctrl: # pylint: disable=no-member
+                    previous_layers = ui.layers.copy()
+                    ui.layers.set_visible(not ui.layers.active_layer.visible)
+                    history.commit_layers(previous_layers, ui.layers)
+                    ui.reset_timeline_label()
+
+                # step the opacity of the active layer down, from 25% back to 100%
+                elif event.key == pygame.K_o and ctrl: # pylint: disable=no-member
+                    previous_layers = ui.layers.copy()
+                    opacity = ui.layers.active_layer.opacity - 0.25
+                    ui.layers.set_opacity(opacity if opacity > 0 else 1.0)
+                    history.commit_layers(previous_layers, ui.layers)
+                    ui.reset_timeline_label()
+
+                # select the layer above or below
+                elif event.key in (pygame.K_UP, pygame.K_DOWN) and ctrl: # pylint: disable=no-member
+                    ui.layers.select(ui.layers.active + (1 if event.key == pygame.K_UP else -1)) # pylint: disable=no-member
+                    ui.reset_timeline_label()
+
+                # add a copy of the current frame after it
+                elif event.key == pygame.K_f and ctrl: # pylint: disable=no-member
+                    ui.add_frame()
+                    history = ui.timeline.history
+                    keydown_match_message = 'Frame added!'
+
+                # delete the current frame
+                elif event.key == pygame.K_d and ctrl_shift: # pylint: disable=no-member
+                    if ui.remove_frame() is None:
+                        keydown_match_message = 'Cannot delete the only frame!'
+                    else:
+                        history = ui.timeline.history
+                        keydown_match_message = 'Frame deleted!'
+
+                # show the previous or next frame
+                elif event.key in (pygame.K_LEFT, pygame.K_RIGHT) and ctrl: # pylint: disable=no-member
+                    ui.select_frame(ui.timeline.current + (1 if event.key == pygame.K_RIGHT else -1)) # pylint: disable=no-member
+                    history = ui.timeline.history
+
+                # show the previous frame faintly over the current one
+                elif event.key == pygame.K_o and ctrl_shift: # pylint: disable=no-member
+                    keydown_match_message = 'Onion skin on' if ui.toggle_onion_skin() else 'Onion skin off'
+
+                # play or stop the animation
+                elif event.key == pygame.K_SPACE and ctrl: # pylint: disable=no-member
+                    if playing is not None:
+                        playing = None
+                        ui.set_preview(None)
+                    elif len(ui.timeline.frames) > 1:
+                        playing = (ui.timeline.current, pygame.time.get_ticks())
+                        ui.set_preview(ui.layers)
+                        keydown_match_message = 'Playing, press any key to stop'
+                    else:
+                        keydown_match_message = 'Add frames to play an animation!'
+
+                # export the animation as a GIF and a sprite sheet
+                elif event.key == pygame.K_e and ctrl: # pylint: disable=no-member
+                    keydown_match_message = 'Exporting animation...'
+                    exporting_animation = True
+
+                # clearing the active layer
                 elif event.key == pygame.K_k and ctrl_shift: # pylint: disable=no-member
                     keydown_match_message = 'Clearing image...'
                     clearing_image = True
 
+                # frame timing overlay
+                elif event.key == pygame.K_p and ctrl_shift: # pylint: disable=no-member
+                    keydown_match_message = 'Frame timing on' if frame_timer.toggle() else 'Frame timing off'
+                    ui.reset_overlay(frame_timer.summary() if frame_timer.enabled else None)
+
+                # write the frame timings in the buffer to a csv file
+                elif event.key == pygame.K_t and ctrl_shift and frame_timer.enabled: # pylint: disable=no-member
+                    keydown_match_message = 'Saving frame timings...'
+                    worker.submit(('timings',), write_timings_csv, get_save_filename('frame_times', 'csv'),
+                                  frame_timer.phases, frame_timer.timings())
+
                 if keydown_match_message != '': # if keydown matches above, print message on ui.screen
                     ui.reset_msg_label(keydown_match_message)
 
+        # paint the stroke collected this frame in one go
+        if len(stroke_cells) > 1:
+            paint_stroke(ui, history, stroke_cells, active_color, active_tool)
+            stroke_cells = stroke_cells[-1:]
+
+        # step the animation, the frames are composited once and then only blitted
+        if playing is not None and pygame.time.get_ticks() - playing[1] >= frame_ms:
+            index = (playing[0] + 1) % len(ui.timeline.frames)
+            playing = (index, pygame.time.get_ticks())
+            ui.set_preview(ui.timeline.frames[index])
+
+        # apply the latest window size once resizing pauses
+        if pending_resize is not None and pygame.time.get_ticks() - pending_resize[1] >= ui.game_config.resize_debounce_ms:
+            resize_window(ui, pending_resize[0], active_save_slot)
+            pending_resize = None
+
+        if hover_pos is not None:
+            # check if mouse is hovering over color palette tiles or drawing tiles
+            hover_tile = get_hover_tile(ui, hover_pos)
+
+            # update color label with hover tile color
+            ui.reset_color_label(hover_tile)
+
+        frame_timer.mark('events')
+
         # taking actions after registering matched keydown
+        # disk I/O and png encoding run in the background on a snapshot of the canvas
         action_complete_message: str = ''
 
-
         if saving_work:
-            save_work(ui.drawing_board, active_save_slot)
-            action_complete_message = 'Your work is saved!'
+            worker.submit(('save', active_save_slot), save_work, ui.timeline.snapshot(), ui.timeline.current, active_save_slot)
             saving_work = False
 
-
         if loading_work:
-            # load from pkl file
-            try:
-                saved_tile_colors = load_work(active_save_slot)
-                action_complete_message = 'Your work is loaded!'
-            except FileNotFoundError:
-                action_complete_message = 'Nothing saved in slot {active_save_slot}'
-            except UnboundLocalError:
-                action_complete_message = 'Save slot is empty!'
-            try:
-                ui.reset_drawing_board(tile_colors = saved_tile_colors)
-                if ui.game_config.drawing_board_size != int(len(saved_tile_colors)**0.5):
-                    action_complete_message = f'Incorrect grid size! Change grid size to {int(len(saved_tile_colors)**0.5)}'
-            except UnboundLocalError:
-                action_complete_message = 'Save slot is empty!'
-            except IndexError:
-                action_complete_message = f'Incorrect grid size! Change grid size to {int(len(saved_tile_colors)**0.5)}'
-
+            worker.submit(('load', active_save_slot), load_work, active_save_slot)
             loading_work = False
 
+        if capture_drawing:
+            save_filename = get_save_filename() # generate save filename based on datetime
+            # rendered from the canvas at a fixed size, whatever the window size or zoom
+            scale = export_scale(ui.layers.size, ui.game_config.export_size)
+            worker.submit(('capture',), save_captured_canvas, ui.layers.snapshot(), save_filename, scale, ui.game_config.export_indexed)
+            capture_drawing = False
+
+        if exporting_animation:
+            scale = export_scale(ui.timeline.size, ui.game_config.export_size)
+            worker.submit(('animation',), export_animation, ui.timeline.snapshot(), get_save_filename('animation', 'gif'),
+                          scale, ui.game_config.animation_fps, ui.game_config.export_indexed)
+            exporting_animation = False
+
         if clearing_image:
-            clear_image(ui.drawing_board)
+            previous_layers = ui.layers.copy()
+            clear_image(ui.canvas)
+            history.commit_layers(previous_layers, ui.layers)
             # print('Image cleared!')
             action_complete_message = 'Image cleared!'
             clearing_image = False
 
-        ui.screen.fill((255, 255, 255))
-
-        ui.draw(active_color, capture_drawing)
-
-        pygame.display.update()
-
-        # Saving image to png needs to be after display.update()
-        # because we need to remove the grid and just save the drawing
-        if capture_drawing:
-            # get drawing surface
-            drawing_surface = ui.screen.subsurface(get_capture_rect(game_config)).copy()
-            save_filename = get_save_filename()
-            add_alpha_channel_and_save_captured_drawing(drawing_surface, save_filename) # generate save filename based on datetime
-            action_complete_message = f'Image saved to {save_filename}!'
-            capture_drawing = False
+        # append the cells painted this frame to the journal, snapshot everything after other changes
+        if (journal_error := autosave.flush()) is not None:
+            action_complete_message = f'Autosave failed: {journal_error}'
+        if autosave.needs_compaction and not autosave.compacting and not autosave.failed:
+            worker.submit(('autosave',), autosave.compact, *autosave.start_compaction(ui.timeline.frames, ui.timeline.current))
+
+        frame_timer.mark('actions')
+
+        # redraw and flip only the regions that changed
+        dirty_rects = ui.draw(active_color)
+        frame_timer.mark('draw')
+        pygame.display.update(dirty_rects)
+        frame_timer.mark('display')
+
+        # previews of the save slots come from the cache, only out of date ones are rendered
+        if not thumbnails_requested:
+            for slot in range(ui.game_config.n_save_slots):
+                worker.submit(('thumbnail', slot), load_thumbnail, get_save_slot_path(slot), ui.game_config.cache_dir,
+                              ui.game_config.thumbnail_size)
+            thumbnails_requested = True
+
+        # report background jobs finished since the last frame
+        for (job, *job_args), result, error in worker.poll():
+            if job == 'save':
+                action_complete_message = 'Your work is saved!' if error is None else f'Saving failed: {error}'
+                if error is None:
+                    worker.submit(('thumbnail', job_args[0]), load_thumbnail, get_save_slot_path(job_args[0]),
+                                  ui.game_config.cache_dir, ui.game_config.thumbnail_size)
+            elif job == 'thumbnail':
+                # a slot that cannot be read shows no preview, loading it reports why
+                ui.set_save_slot_thumbnail(job_args[0], result if error is None else None)
+            elif job == 'capture':
+                action_complete_message = f'Image saved to {result}!' if error is None else f'Capture failed: {error}'
+            elif job == 'animation':
+                action_complete_message = f'Animation saved to {result}!' if error is None else f'Export failed: {error}'
+            elif job == 'autosave':
+                autosave.compaction_done(error)
+                if error is not None:
+                    action_complete_message = f'Autosave failed: {error}'
+            elif job == 'import':
+                name = os.path.basename(job_args[0])
+                if error is not None:
+                    action_complete_message = f'Cannot import {name}: {error}'
+                elif result.size != ui.layers.size:
+                    action_complete_message = f'Grid changed while importing {name}, drop it again'
+                else:
+                    previous_layers = ui.layers.copy()
+                    ui.layers.add_layer(result)
+                    history.commit_layers(previous_layers, ui.layers)
+                    ui.reset_timeline_label()
+                    action_complete_message = f'{name} imported as a new layer!'
+            elif job == 'timings':
+                action_complete_message = f'Frame timings saved to {result}!' if error is None else f'Saving frame timings failed: {error}'
+            elif job == 'load':
+                if isinstance(error, FileNotFoundError):
+                    action_complete_message = f'Nothing saved in slot {job_args[0]}'
+                elif error is not None:
+                    action_complete_message = f'Cannot load slot {job_args[0]}: {error}'
+                else:
+                    # save files know their size, so switch the grid to match
+                    frames, current = result
+                    playing = None
+                    if len(frames) == 1 and len(ui.timeline.frames) == 1:
+                        # a single drawing replaces the current one as an undoable step
+                        history.commit_layers(ui.layers, frames[0])
+                        ui.set_preview(None)
+                        show_layers(ui, frames[0])
+                    else:
+                        show_timeline(ui, Timeline(frames, current, ui.game_config.history_max_bytes, autosave))
+                    action_complete_message = 'Your work is loaded!'
 
         # update message after taking action
         if action_complete_message != '':
             ui.reset_msg_label(action_complete_message)
 
+        frame_timer.mark('worker')
+        if frame_timer.enabled and frame_timer.n_frames % 30 == 0:
+            ui.reset_overlay(frame_timer.summary())
+
         clock.tick(60)
 
+    worker.shutdown() # let pending saves finish
+    autosave.discard() # closed normally, nothing to recover
     pygame.quit()  # pylint: disable=no-member
 
 
@@ -0,0 +1,136 @@
+"""
+Tests of the autosave snapshot, the replay of its journal and recovery after a crash
+"""
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from Autosave import JOURNAL_HEADER, RECORD, Autosave, encode_record, recover, replay_journal
+from Canvas import Canvas
+from Color import Color
+from History import History
+from Layers import LayerStack
+from SaveFile import file_crc, read_frames
+
+
+class AutosaveTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory() # pylint: disable=consider-using-with
+        self.addCleanup(self.tmp.cleanup)
+        self.autosave = Autosave(self.tmp.name)
+        self.addCleanup(self.autosave.discard)
+        self.frames = [LayerStack.from_canvas(Canvas(8)) for _ in range(2)]
+        self.frames[1].add_layer()
+        self.compact()
+
+    def compact(self) -> None:
+        self.autosave.compact(*self.autosave.start_compaction(self.frames, 1))
+        self.autosave.compaction_done()
+
+    def paint(self, layers: LayerStack, xs: list[int], ys: list[int], color: Color) -> None:
+        history = History(journal=self.autosave)
+        history.paint_cells(layers, np.array(xs), np.array(ys), color)
+        history.end_stroke()
+        self.autosave.flush()
+
+    def snapshot(self) -> tuple[list[LayerStack], tuple[int, int]]:
+        path = self.autosave.snapshot_path
+        return read_frames(path)[0], (os.path.getsize(path), file_crc(path))
+
+    def assert_recovered(self, frames: list[LayerStack]) -> None:
+        recovered = recover(self.tmp.name)
+        self.assertIsNotNone(recovered)
+        recovered_frames, current = recovered
+        self.assertEqual(current, 1)
+        self.assertEqual([len(frame.layers) for frame in recovered_frames], [len(frame.layers) for frame in frames])
+        for frame, recovered_frame in zip(frames, recovered_frames):
+            for layer, recovered_layer in zip(frame.layers, recovered_frame.layers):
+                self.assertTrue((layer.canvas.data == recovered_layer.canvas.data).all())
+
+    def test_recovers_painted_cells(self) -> None:
+        self.paint(self.frames[0], [0, 1, 2], [3, 3, 3], Color.RED)
+        self.paint(self.frames[1], [7], [7], Color.NAVY)
+        self.paint(self.frames[0], [1], [3], Color.GOLD)
+
+        self.assertEqual(replay_journal(self.autosave.journal_path, *self.snapshot()), 3)
+        self.assert_recovered(self.frames)
+
+    def test_recovers_undo(self) -> None:
+        history = History(journal=self.autosave)
+        history.paint_cells(self.frames[0], np.array([4]), np.array([4]), Color.RED)
+        history.end_stroke()
+        history.undo(self.frames[0])
+        self.autosave.flush()
+
+        self.assert_recovered(self.frames)
+        self.assertEqual(recover(self.tmp.name)[0][0].canvas.data[4, 4], Color.WHITE.palette_index)
+
+    def test_compaction_empties_the_journal(self) -> None:
+        self.paint(self.frames[0], [0], [0], Color.RED)
+        self.compact()
+
+        self.assertEqual(os.path.getsize(self.autosave.journal_path), JOURNAL_HEADER.size)
+        self.assert_recovered(self.frames)
+
+    def test_ignores_torn_tail(self) -> None:
+        self.paint(self.frames[0], [0], [0], Color.RED)
+        expected = [frame.copy() for frame in self.frames]
+        self.paint(self.frames[0], [1, 2], [0, 0], Color.NAVY)
+        for cut in range(1, RECORD.size + 2 * 5 + 4):
+            with self.subTest(cut=cut):
+                with open(self.autosave.journal_path, 'rb') as f:
+                    data = f.read()
+                with open(f'{self.autosave.journal_path}.torn', 'wb') as f:
+                    f.write(data[:-cut])
+                frames, snapshot = self.snapshot()
+                self.assertEqual(replay_journal(f'{self.autosave.journal_path}.torn', frames, snapshot), 1)
+                self.assertTrue((frames[0].canvas.data == expected[0].canvas.data).all())
+
+    def test_stops_at_corrupt_record(self) -> None:
+        self.paint(self.frames[0], [0], [0], Color.RED)
+        self.paint(self.frames[0], [1], [0], Color.NAVY)
+        self.paint(self.frames[0], [2], [0], Color.GOLD)
+        with open(self.autosave.journal_path, 'r+b') as f:
+            # the cell index of the second record
+            f.seek(JOURNAL_HEADER.size + len(encode_record(0, 0, np.zeros(1), 0)) + RECORD.size)
+            f.write(b'\x03')
+
+        frames, snapshot = self.snapshot()
+        self.assertEqual(replay_journal(self.autosave.journal_path, frames, snapshot), 1)
+        self.assertEqual(frames[0].canvas.data[0, 0], Color.RED.palette_index)
+        self.assertTrue((frames[0].canvas.data.flat[1:] == Color.WHITE.palette_index).all())
+
+    def test_ignores_journal_of_another_snapshot(self) -> None:
+        self.paint(self.frames[0], [0], [0], Color.RED)
+        frames, (size, crc) = self.snapshot()
+
+        self.assertEqual(replay_journal(self.autosave.journal_path, frames, (size, crc ^ 1)), 0)
+        self.assertEqual(replay_journal(self.autosave.journal_path, frames, (size + 1, crc)), 0)
+        self.assertTrue((frames[0].canvas.data == Color.WHITE.palette_index).all())
+
+    def test_write_error_stops_autosaving(self) -> None:
+        # the autosave folder went away, e.g. an unmounted drive
+        self.autosave.journal_path = os.path.join(self.tmp.name, 'missing', 'autosave.journal')
+        history = History(journal=self.autosave)
+        history.paint_cells(self.frames[0], np.array([1]), np.array([0]), Color.NAVY)
+        history.end_stroke()
+
+        self.assertIsInstance(self.autosave.flush(), OSError)
+        self.assertTrue(self.autosave.failed)
+        history.paint_cells(self.frames[0], np.array([2]), np.array([0]), Color.GOLD)
+        self.assertIsNone(self.autosave.flush())
+        self.autosave.discard()
+
+    def test_discard_removes_files(self) -> None:
+        self.paint(self.frames[0], [0], [0], Color.RED)
+        self.autosave.discard()
+
+        self.assertFalse(os.path.exists(self.autosave.snapshot_path))
+        self.assertFalse(os.path.exists(self.autosave.journal_path))
+        self.assertIsNone(recover(self.tmp.name))
+
+
+if __name__ == '__main__':
+    unittest.main()
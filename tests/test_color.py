@@ -0,0 +1,35 @@
+"""
+Tests of the palette tables precomputed for Color
+"""
+import os
+import unittest
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+import pygame  # pylint: disable=wrong-import-position
+
+from Color import PALETTE, PALETTE_RGB, Color, mapped_palette  # pylint: disable=wrong-import-position
+
+
+class ColorTest(unittest.TestCase):
+    def test_index_round_trip(self) -> None:
+        for i, color in enumerate(PALETTE):
+            self.assertEqual(color.palette_index, i)
+            self.assertIs(Color.from_index(i), color)
+            self.assertEqual(f'#{color.rgb[0]:02X}{color.rgb[1]:02X}{color.rgb[2]:02X}', color)
+
+    def test_mapped_palette_matches_surface(self) -> None:
+        formats = {'rgb16': (0, 16), 'rgb24': (0, 24), 'rgb32': (0, 32), 'rgba32': (pygame.SRCALPHA, 32)}
+        for name, (flags, depth) in formats.items():
+            with self.subTest(name):
+                surface = pygame.Surface((1, 1), flags, depth)
+                mapped = mapped_palette(surface)
+                self.assertFalse(mapped.flags.writeable)
+                for i, rgb in enumerate(PALETTE_RGB):
+                    surface.set_at((0, 0), rgb)
+                    self.assertEqual(surface.get_at_mapped((0, 0)) & 0xFFFFFFFF, mapped[i])
+                self.assertEqual(Color.RED.mapped(surface), mapped[Color.RED.palette_index])
+                self.assertIs(mapped_palette(pygame.Surface((2, 2), flags, depth)), mapped)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+"""
+Tests of the command line converter from save files to PNG images
+"""
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from Canvas import Canvas
+from convert import convert_all
+from SaveFile import write_canvas
+
+CONVERT_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'convert.py')
+
+
+class ConvertTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory() # pylint: disable=consider-using-with
+        self.addCleanup(self.tmp.cleanup)
+        self.output_dir = os.path.join(self.tmp.name, 'images')
+
+    def write_file(self, name: str, data: bytes) -> str:
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_converts_save_files_and_slots(self) -> None:
+        pxl_path = os.path.join(self.tmp.name, 'save_0.pxl')
+        write_canvas(pxl_path, Canvas(4))
+        pkl_path = self.write_file('save_1.pkl', pickle.dumps(Canvas(4).to_colors()))
+
+        report = convert_all([pxl_path, pkl_path], self.output_dir, workers=1)
+
+        self.assertEqual((report['converted'], report['errors']), (2, []))
+        self.assertTrue(os.path.exists(os.path.join(self.output_dir, 'save_0.png')))
+        self.assertTrue(os.path.exists(os.path.join(self.output_dir, 'save_1.png')))
+
+    def test_reports_empty_slot(self) -> None:
+        path = self.write_file('save_0.pkl', pickle.dumps([]))
+
+        report = convert_all([path], self.output_dir, workers=1)
+        self.assertEqual(report['converted'], 0)
+        self.assertEqual([error_path for error_path, _ in report['errors']], [path])
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, 'save_0.png')))
+
+        result = subprocess.run([sys.executable, CONVERT_SCRIPT, path, '--output-dir', self.output_dir, '--workers', '1'],
+                                capture_output=True, text=True, check=False)
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn(path, result.stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
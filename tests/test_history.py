@@ -0,0 +1,82 @@
+"""
+Tests of the undo/redo journal and the memory cap shared by the frames of a timeline
+"""
+import unittest
+
+import numpy as np
+
+from Animation import Timeline
+from Canvas import Canvas
+from Color import Color
+from History import History
+from Layers import LayerStack
+
+
+def paint_stroke(history: History, layers: LayerStack, n_cells: int, color: Color) -> None:
+    xs, ys = np.divmod(np.arange(n_cells), layers.size)
+    history.paint_cells(layers, xs, ys, color)
+    history.end_stroke()
+
+
+class HistoryTest(unittest.TestCase):
+    def test_undo_redo(self) -> None:
+        layers = LayerStack.from_canvas(Canvas(8))
+        history = History()
+        paint_stroke(history, layers, 10, Color.RED)
+        painted = layers.canvas.data.copy()
+
+        history.undo(layers)
+        self.assertTrue((layers.canvas.data == Color.WHITE.palette_index).all())
+        history.redo(layers)
+        self.assertTrue((layers.canvas.data == painted).all())
+
+    def test_drops_oldest_entries_past_the_cap(self) -> None:
+        layers = LayerStack.from_canvas(Canvas(8))
+        stroke_bytes = 10 * 6 # uint32 index, old and new byte per cell
+        history = History(max_bytes=3 * stroke_bytes)
+        for color in (Color.RED, Color.NAVY, Color.GOLD, Color.BLACK):
+            paint_stroke(history, layers, 10, color)
+
+        self.assertEqual(len(history.undo_entries), 3)
+        self.assertLessEqual(history.nbytes, 3 * stroke_bytes)
+
+
+class TimelineBudgetTest(unittest.TestCase):
+    def test_cap_is_shared_by_all_frames(self) -> None:
+        stroke_bytes = 10 * 6
+        timeline = Timeline([LayerStack.from_canvas(Canvas(8)) for _ in range(4)], history_max_bytes=3 * stroke_bytes)
+        for frame in range(4):
+            timeline.select(frame)
+            paint_stroke(timeline.history, timeline.layers, 10, Color.RED)
+
+        self.assertLessEqual(timeline.budget.nbytes, 3 * stroke_bytes)
+        # the stroke on the first frame is the oldest, so it was dropped
+        self.assertEqual([len(history.undo_entries) for history in timeline.histories], [0, 1, 1, 1])
+
+    def test_undone_entries_keep_their_age(self) -> None:
+        stroke_bytes = 10 * 6
+        timeline = Timeline([LayerStack.from_canvas(Canvas(8)) for _ in range(2)], history_max_bytes=2 * stroke_bytes)
+        paint_stroke(timeline.history, timeline.layers, 10, Color.RED)
+        timeline.select(1)
+        paint_stroke(timeline.history, timeline.layers, 10, Color.RED)
+        timeline.select(0)
+        timeline.history.undo(timeline.layers)
+        timeline.history.redo(timeline.layers)
+        timeline.select(1)
+        paint_stroke(timeline.history, timeline.layers, 10, Color.NAVY)
+
+        # the first stroke of frame 0 is still the oldest after undo and redo
+        self.assertEqual([len(history.undo_entries) for history in timeline.histories], [0, 2])
+
+    def test_removed_frames_free_their_history(self) -> None:
+        timeline = Timeline([LayerStack.from_canvas(Canvas(8))])
+        timeline.add_frame()
+        paint_stroke(timeline.history, timeline.layers, 10, Color.RED)
+        timeline.remove_frame()
+
+        self.assertEqual(len(timeline.budget.histories), 1)
+        self.assertEqual(timeline.budget.nbytes, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
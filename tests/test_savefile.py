@@ -0,0 +1,175 @@
+"""
+Tests of the binary save format and the migration of pickle save slots
+"""
+import os
+import pickle
+import struct
+import tempfile
+import unittest
+import zlib
+
+import numpy as np
+
+from Canvas import Canvas
+from Color import PALETTE, TRANSPARENT_INDEX, Color
+from Layers import Layer, LayerStack
+from SaveFile import (COMPRESSIONS, HEADER, MAGIC, PALETTE_VERSION, SAVE_FILE_EXTENSION, migrate_pickle_slots,
+                      read_canvas, read_frames, read_header, read_pickle_slot, rle_decode, rle_encode, write_canvas,
+                      write_frames)
+
+
+def random_frames(n_frames: int, n_layers: int, size: int, seed: int = 0) -> list[LayerStack]:
+    rng = np.random.default_rng(seed)
+    frames = []
+    for _ in range(n_frames):
+        layers = [Layer(Canvas(size, rng.integers(0, len(PALETTE), (size, size), dtype=np.uint8)))]
+        for i in range(1, n_layers):
+            data = rng.integers(0, len(PALETTE), (size, size), dtype=np.uint8)
+            data[rng.random((size, size)) < 0.5] = TRANSPARENT_INDEX
+            layers.append(Layer(Canvas(size, data, TRANSPARENT_INDEX), visible=i % 2 == 1, opacity=i / n_layers))
+        frames.append(LayerStack(layers, active=n_layers - 1))
+    return frames
+
+
+class SaveFormatTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory() # pylint: disable=consider-using-with
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, 'save.pxl')
+
+    def assert_frames_equal(self, expected: list[LayerStack], actual: list[LayerStack]) -> None:
+        self.assertEqual(len(expected), len(actual))
+        for expected_frame, actual_frame in zip(expected, actual):
+            self.assertEqual(expected_frame.active, actual_frame.active)
+            self.assertEqual(len(expected_frame.layers), len(actual_frame.layers))
+            for expected_layer, actual_layer in zip(expected_frame.layers, actual_frame.layers):
+                self.assertTrue((expected_layer.canvas.data == actual_layer.canvas.data).all())
+                self.assertEqual(expected_layer.canvas.blank_index, actual_layer.canvas.blank_index)
+                self.assertEqual(expected_layer.visible, actual_layer.visible)
+                self.assertAlmostEqual(expected_layer.opacity, actual_layer.opacity, delta=1 / 255)
+
+    def test_round_trip(self) -> None:
+        for compression in COMPRESSIONS:
+            for n_frames, n_layers, size in ((1, 1, 1), (1, 1, 16), (1, 3, 16), (4, 2, 33)):
+                with self.subTest(compression=compression, frames=n_frames, layers=n_layers, size=size):
+                    frames = random_frames(n_frames, n_layers, size)
+                    write_frames(self.path, frames, n_frames - 1, compression)
+                    for copy in (True, False):
+                        actual, current = read_frames(self.path, copy)
+                        self.assertEqual(current, n_frames - 1)
+                        self.assert_frames_equal(frames, actual)
+
+    def test_canvas_round_trip(self) -> None:
+        canvas = random_frames(1, 1, 16)[0].canvas
+        for compression in COMPRESSIONS:
+            write_canvas(self.path, canvas, compression)
+            self.assertTrue((read_canvas(self.path).data == canvas.data).all())
+            self.assertEqual(read_header(self.path)['compression'], COMPRESSIONS[compression])
+
+    def test_uncopied_layers_do_not_write_to_the_file(self) -> None:
+        frames = random_frames(1, 1, 8)
+        write_frames(self.path, frames)
+        layers = read_frames(self.path, copy=False)[0][0]
+        layers.canvas.data[:] = 0
+        self.assertTrue((read_canvas(self.path).data == frames[0].canvas.data).all())
+
+    def test_reads_version_1(self) -> None:
+        data = random_frames(1, 1, 8)[0].canvas.data
+        with open(self.path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, 1, COMPRESSIONS['none'], 0, 8, 8, PALETTE_VERSION, data.size))
+            f.write(data.tobytes())
+        self.assertTrue((read_canvas(self.path).data == data).all())
+
+    def test_rle(self) -> None:
+        for indices in ([7], [1, 1, 1, 2, 2, 3], [5] * 100_000, list(range(97)) * 3):
+            indices = np.array(indices, dtype=np.uint8)
+            self.assertTrue((rle_decode(rle_encode(indices), indices.size) == indices).all())
+        with self.assertRaises(ValueError):
+            rle_decode(rle_encode(np.zeros(10, dtype=np.uint8)), 11)
+
+    def test_rejects_corrupt_files(self) -> None:
+        write_frames(self.path, random_frames(2, 2, 8), compression='none')
+        with open(self.path, 'rb') as f:
+            valid = f.read()
+        header = valid[:HEADER.size]
+        table_end = HEADER.size + 4 * 3
+
+        def with_payload(compression: str, payload: bytes) -> bytes:
+            fields = list(HEADER.unpack(header))
+            fields[2], fields[7] = COMPRESSIONS[compression], len(payload)
+            return HEADER.pack(*fields) + valid[HEADER.size:table_end] + payload
+
+        corrupt = {
+            'empty': b'',
+            'bad magic': b'XXXX' + valid[4:],
+            'future version': valid[:4] + bytes([99]) + valid[5:],
+            'other palette': valid[:16] + struct.pack('<I', PALETTE_VERSION ^ 1) + valid[20:],
+            'empty canvas': (HEADER.pack(MAGIC, 3, COMPRESSIONS['none'], 1, 0, 0, PALETTE_VERSION, 0)
+                             + valid[HEADER.size:HEADER.size + 3]),
+            'truncated table': valid[:HEADER.size + 2],
+            'truncated payload': valid[:-1],
+            'index out of range': valid[:-1] + bytes([len(PALETTE)]),
+            'short rle': with_payload('rle', rle_encode(np.zeros(10, dtype=np.uint8))),
+            'truncated rle': with_payload('rle', rle_encode(np.zeros(4 * 64, dtype=np.uint8))[:-2]),
+            'empty rle': with_payload('rle', b''),
+            'short zlib': with_payload('zlib', zlib.compress(bytes(10))),
+            'broken zlib': with_payload('zlib', b'not zlib'),
+        }
+        for name, data in corrupt.items():
+            with self.subTest(name):
+                with open(self.path, 'wb') as f:
+                    f.write(data)
+                with self.assertRaises(ValueError):
+                    read_frames(self.path)
+
+
+
+class MigratePickleSlotsTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp = tempfile.TemporaryDirectory() # pylint: disable=consider-using-with
+        self.addCleanup(self.tmp.cleanup)
+
+    def write_slot(self, name: str, data: bytes) -> str:
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def test_migrates_valid_slot(self) -> None:
+        canvas = Canvas(4)
+        canvas[1, 2] = Color.RED
+        pkl_path = self.write_slot('save_0.pkl', pickle.dumps(canvas.to_colors()))
+
+        migrated = migrate_pickle_slots(self.tmp.name)
+
+        self.assertEqual(migrated, [os.path.join(self.tmp.name, f'save_0{SAVE_FILE_EXTENSION}')])
+        self.assertTrue((read_canvas(migrated[0]).data == canvas.data).all())
+        self.assertFalse(os.path.exists(pkl_path))
+        self.assertTrue(os.path.exists(f'{pkl_path}.migrated'))
+
+    def test_skips_broken_slots(self) -> None:
+        colors = Canvas(4).to_colors()
+        broken = {
+            'save_0.pkl': b'', # empty
+            'save_1.pkl': pickle.dumps(colors)[:-5], # truncated
+            'save_2.pkl': pickle.dumps(['NOT_A_COLOR'] * 16), # colour outside the palette
+            'save_3.pkl': pickle.dumps(42), # not a board
+            'save_4.pkl': pickle.dumps(colors[:10]), # not square
+            'save_5.pkl': pickle.dumps([]), # empty board
+        }
+        paths = [self.write_slot(name, data) for name, data in broken.items()]
+        valid_path = self.write_slot('save_6.pkl', pickle.dumps(colors))
+
+        migrated = migrate_pickle_slots(self.tmp.name)
+
+        self.assertEqual(migrated, [os.path.join(self.tmp.name, f'save_6{SAVE_FILE_EXTENSION}')])
+        for path in paths:
+            self.assertTrue(os.path.exists(path), path) # left in place to inspect
+            self.assertFalse(os.path.exists(path[:-len('.pkl')] + SAVE_FILE_EXTENSION))
+            with self.assertRaises(ValueError):
+                read_pickle_slot(path)
+        self.assertFalse(os.path.exists(valid_path))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+"""
+Tests of the cell geometry of the tools, checking the flood fill against a plain breadth first search
+"""
+import unittest
+from collections import deque
+
+import numpy as np
+
+from Tools import flood_fill_cells, matching_cells, rasterize_polyline
+
+
+def reference_fill(data: np.ndarray, cell: tuple[int, int], connectivity: int) -> set[tuple[int, int]]:
+    steps = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+    if connectivity == 8:
+        steps += [(1, 1), (1, -1), (-1, 1), (-1, -1)]
+    region = {cell}
+    queue = deque([cell])
+    while queue:
+        x, y = queue.popleft()
+        for dx, dy in steps:
+            neighbour = (x + dx, y + dy)
+            if (0 <= neighbour[0] < data.shape[0] and 0 <= neighbour[1] < data.shape[1]
+                    and neighbour not in region and data[neighbour] == data[cell]):
+                region.add(neighbour)
+                queue.append(neighbour)
+    return region
+
+
+def as_cells(xs: np.ndarray, ys: np.ndarray) -> set[tuple[int, int]]:
+    return set(zip(xs.tolist(), ys.tolist()))
+
+
+class FloodFillTest(unittest.TestCase):
+    def test_matches_reference_on_random_boards(self) -> None:
+        rng = np.random.default_rng(0)
+        for trial in range(200):
+            size = int(rng.integers(1, 24))
+            # few colours make large, winding regions
+            data = rng.integers(0, int(rng.integers(1, 4)), (size, size), dtype=np.uint8)
+            cell = (int(rng.integers(0, size)), int(rng.integers(0, size)))
+            for connectivity in (4, 8):
+                with self.subTest(trial=trial, connectivity=connectivity):
+                    xs, ys = flood_fill_cells(data, cell, connectivity)
+                    self.assertEqual(len(xs), len(as_cells(xs, ys)), 'cells are returned once')
+                    self.assertEqual(as_cells(xs, ys), reference_fill(data, cell, connectivity))
+
+    def test_spiral(self) -> None:
+        size = 15
+        data = np.zeros((size, size), dtype=np.uint8)
+        # walls of a spiral corridor, so the region turns back on itself every few columns
+        for i in range(0, size // 2, 2):
+            data[i:size - i, i] = data[size - 1 - i, i:size - i] = 1
+            data[i + 2:size - i, size - 1 - i] = data[i + 2, i + 2:size - i] = 1
+        for connectivity in (4, 8):
+            xs, ys = flood_fill_cells(data, (1, 1), connectivity)
+            self.assertEqual(as_cells(xs, ys), reference_fill(data, (1, 1), connectivity))
+
+    def test_single_cell_and_full_board(self) -> None:
+        data = np.zeros((8, 8), dtype=np.uint8)
+        self.assertEqual(len(flood_fill_cells(data, (3, 4))[0]), 64)
+        data[3, 4] = 1
+        data[2:5, 3:6][[0, 0, 1, 1, 2, 2], [0, 2, 0, 2, 0, 2]] = 2
+        self.assertEqual(as_cells(*flood_fill_cells(data, (3, 4))), {(3, 4)})
+        self.assertEqual(len(flood_fill_cells(data, (0, 0), 8)[0]), 64 - 1 - 6)
+
+    def test_rejects_other_connectivity(self) -> None:
+        with self.assertRaises(ValueError):
+            flood_fill_cells(np.zeros((4, 4), dtype=np.uint8), (0, 0), 6)
+
+    def test_matching_cells_ignore_connection(self) -> None:
+        data = np.zeros((4, 4), dtype=np.uint8)
+        data[1, :] = 1
+        self.assertEqual(len(flood_fill_cells(data, (0, 0))[0]), 4)
+        self.assertEqual(len(matching_cells(data, (0, 0))[0]), 12)
+
+
+class RasterizePolylineTest(unittest.TestCase):
+    def test_line_has_no_gaps(self) -> None:
+        xs, ys = rasterize_polyline(np.array([0, 9, 2]), np.array([0, 4, 7]))
+        steps = np.abs(np.diff(np.stack([xs, ys]), axis=1)).max(axis=0)
+        self.assertTrue((steps <= 1).all())
+        self.assertEqual((xs[0], ys[0], xs[-1], ys[-1]), (0, 0, 2, 7))
+
+
+if __name__ == '__main__':
+    unittest.main()